@@ -1,58 +1,110 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, and_, or_
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Body
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
+from sqlalchemy import desc, func, and_, or_, case
 from typing import List, Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
-import hashlib
+import secrets
 
-from app.db.database import get_db
+from app.db.database import SessionLocal, get_db
 from app.db.models import User, KYCApplication, Document, Verification, AuditRecord, ConsentRecord
 from app.schemas.kyc import (
-    KYCApplicationResponse, KYCApplicationUpdate, RiskMetrics, AuditRecordResponse
+    KYCApplicationResponse, KYCApplicationUpdate, RiskMetrics, AuditRecordResponse,
+    KYCApplicationDuplicateInfo, KYCApplicationBlockchainRecord
 )
-from app.core.security import require_role
+from app.schemas.auth import UserResponse
+from app.core.security import CurrentUser, require_role, invalidate_cached_user, get_password_hash
 from app.services.audit_service import audit_service
+from app.services.blockchain_service import blockchain_service
+from app.services.review_service import record_approval, record_review_failure, write_review_records
+from app.services.ukn_service import assign_ukn
+from app.services.cache_service import cache_service, kyc_summary_key, user_kyc_id_key
+from app.core.config import settings
 from app.services.ml_service import ml_service
 
 router = APIRouter()
 
+METRICS_CACHE_KEY = "metrics:v1"
+
 
 def generate_tx_hash() -> str:
     """Generate a mock blockchain transaction hash"""
-    return f"0x{hashlib.sha256(str(datetime.now()).encode()).hexdigest()[:40]}"
+    return f"0x{secrets.token_hex(20)}"
+
+
+def _with_related(query):
+    """Eager-load the relationships serialized into KYCApplicationResponse"""
+    return query.options(
+        joinedload(KYCApplication.user).load_only(User.email),
+        selectinload(KYCApplication.documents),
+        selectinload(KYCApplication.verifications)
+    )
+
+
+def _to_response(app: KYCApplication, model=KYCApplicationResponse) -> KYCApplicationResponse:
+    """Convert an application to its response model with the owner's email"""
+    response = model.model_validate(app)
+    if app.user:
+        response.user_email = app.user.email
+    return response
+
+
+def _record_rejection(kyc_id: str, reviewer_id: str, comment: Optional[str]):
+    """
+    Write the verification and audit records for a rejection
+    Runs as a background task after the response is sent, so it opens its own session
+    """
+    db = SessionLocal()
+    try:
+        tx_hash = generate_tx_hash()
+        verification = {
+            "kyc_id": kyc_id,
+            "event_type": "rejection",
+            "details": {"reviewer_id": reviewer_id, "comment": comment},
+            "performed_by": reviewer_id,
+            "tx_hash": tx_hash
+        }
+        audit_event = audit_service.build_event(
+            entity_type="kyc_application",
+            entity_id=kyc_id,
+            event_type="rejection",
+            details={"reviewer_id": reviewer_id, "reason": comment},
+            tx_hash=tx_hash
+        )
+        write_review_records(db, [verification], [audit_event])
+    except Exception as e:
+        db.rollback()
+        print(f"Error recording rejection for {kyc_id}: {e}")
+        record_review_failure(db, kyc_id, "rejection", e)
+    finally:
+        db.close()
 
 
-@router.get("/applications", response_model=List[KYCApplicationResponse])
-async def get_all_kyc_applications(
+@router.get("/applications", response_model=List[KYCApplicationResponse], response_class=ORJSONResponse)
+def get_all_kyc_applications(
     status_filter: str = None,
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(require_role(["admin", "reviewer"])),
+    current_user: CurrentUser = Depends(require_role(["admin", "reviewer"])),
     db: Session = Depends(get_db)
 ):
     """Get all KYC applications (admin/reviewer only)"""
-    query = db.query(KYCApplication)
+    query = _with_related(db.query(KYCApplication))
     
     if status_filter:
         query = query.filter(KYCApplication.status == status_filter)
     
     applications = query.order_by(desc(KYCApplication.created_at)).offset(skip).limit(limit).all()
     
-    # Add user emails
-    results = []
-    for app in applications:
-        response = KYCApplicationResponse.from_orm(app)
-        if app.user:
-            response.user_email = app.user.email
-        results.append(response)
-    
-    return results
+    return [_to_response(app) for app in applications]
 
 
-@router.get("/applications/review-queue", response_model=List[KYCApplicationResponse])
-async def get_review_queue(
-    current_user: User = Depends(require_role(["admin", "reviewer"])),
+@router.get("/applications/review-queue", response_model=List[KYCApplicationResponse], response_class=ORJSONResponse)
+def get_review_queue(
+    skip: int = 0,
+    limit: int = 100,
+    current_user: CurrentUser = Depends(require_role(["admin", "reviewer"])),
     db: Session = Depends(get_db)
 ):
     """
@@ -62,7 +114,7 @@ async def get_review_queue(
     - Applications with risk_score >= 0.3 (medium/high risk) OR risk_score is None (not processed yet)
     - Excludes applications with risk_score < 0.3 and status VERIFIED (auto-approved)
     """
-    applications = db.query(KYCApplication).filter(
+    applications = _with_related(db.query(KYCApplication)).filter(
         KYCApplication.status.in_(["IN_REVIEW", "PROCESSING", "REQUEST_INFO", "UPLOADED", "REGISTERED", "DRAFT"]),
         or_(
             KYCApplication.risk_score.is_(None),  # Not processed yet
@@ -72,27 +124,18 @@ async def get_review_queue(
         # Order by: created_at DESC (newest first), then by risk_score DESC (high risk first)
         desc(KYCApplication.created_at),
         desc(KYCApplication.risk_score)
-    ).all()
-    
-    # Add user emails and SHAP explanations
-    results = []
-    for app in applications:
-        response = KYCApplicationResponse.from_orm(app)
-        if app.user:
-            response.user_email = app.user.email
-        results.append(response)
+    ).offset(skip).limit(limit).all()
     
-    return results
+    return [_to_response(app) for app in applications]
 
 
 @router.get("/applications/{application_id}", response_model=KYCApplicationResponse)
-async def get_kyc_application_admin(
+def get_kyc_application_admin(
     application_id: str,
-    current_user: User = Depends(require_role(["admin", "reviewer"])),
+    current_user: CurrentUser = Depends(require_role(["admin", "reviewer"])),
     db: Session = Depends(get_db)
 ):
     """Get KYC application details (admin/reviewer only)"""
-    from sqlalchemy.orm import joinedload
     
     kyc_app = db.query(KYCApplication).options(
         joinedload(KYCApplication.documents),
@@ -107,9 +150,7 @@ async def get_kyc_application_admin(
             detail="KYC application not found"
         )
     
-    response = KYCApplicationResponse.from_orm(kyc_app)
-    if kyc_app.user:
-        response.user_email = kyc_app.user.email
+    response = _to_response(kyc_app)
     
     # Calculate SHAP explanation if risk score exists
     if kyc_app.risk_score is not None:
@@ -125,7 +166,7 @@ async def get_kyc_application_admin(
     return response
 
 
-# Request models for approve/reject endpoints
+# Request models for approve/reject/create-user endpoints
 class ApproveRequest(BaseModel):
     comment: Optional[str] = None
 
@@ -134,17 +175,25 @@ class RejectRequest(BaseModel):
     comment: str
 
 
-@router.post("/applications/{application_id}/approve")
-async def approve_kyc_application(
+class CreateUserRequest(BaseModel):
+    email: str
+    password: str
+    role: str
+
+
+@router.post("/applications/{application_id}/approve", status_code=status.HTTP_202_ACCEPTED)
+def approve_kyc_application(
     application_id: str,
+    background_tasks: BackgroundTasks,
     request: Optional[ApproveRequest] = Body(default=None),
-    current_user: User = Depends(require_role(["admin", "reviewer"])),
+    current_user: CurrentUser = Depends(require_role(["admin", "reviewer"])),
     db: Session = Depends(get_db)
 ):
-    """Approve a KYC application and issue UKN"""
-    from app.services.ukn_service import generate_ukn
-    from app.services.blockchain_service import blockchain_service
-    from datetime import timedelta
+    """
+    Approve a KYC application and issue UKN
+    The status change is committed before responding; the blockchain block,
+    verification and audit records are written in a background task
+    """
     
     comment = request.comment if request else None
     
@@ -166,20 +215,18 @@ async def approve_kyc_application(
     
     # Generate UKN if not already issued
     if not kyc_app.ukn:
-        ukn = generate_ukn()
-        # Ensure uniqueness
-        while db.query(KYCApplication).filter(KYCApplication.ukn == ukn).first():
-            ukn = generate_ukn()
-        kyc_app.ukn = ukn
+        assign_ukn(db, kyc_app)
     
     # Update status to VERIFIED (not APPROVED)
+    # UTC, matching the expiry checks in the institution endpoints
+    now = datetime.utcnow()
     kyc_app.status = "VERIFIED"
     kyc_app.reviewer_comment = comment
-    kyc_app.verified_at = datetime.now()
-    kyc_app.expires_at = datetime.now() + timedelta(days=365)  # 1 year validity
-    kyc_app.updated_at = datetime.now()
+    kyc_app.verified_at = now
+    kyc_app.expires_at = now + timedelta(days=365)  # 1 year validity
+    kyc_app.updated_at = now
     
-    # Create blockchain record
+    # Blockchain record inputs
     document_hashes = {}
     for doc in kyc_app.documents:
         document_hashes[doc.doc_type] = doc.file_hash
@@ -191,65 +238,33 @@ async def approve_kyc_application(
         "verified_at": kyc_app.verified_at.isoformat()
     }
     
-    blockchain_record = blockchain_service.create_block(
+    db.commit()
+    db.refresh(kyc_app)
+    cache_service.delete(METRICS_CACHE_KEY, kyc_summary_key(kyc_app.ukn))
+    
+    background_tasks.add_task(
+        record_approval,
+        kyc_id=kyc_app.id,
         ukn=kyc_app.ukn,
         document_hashes=document_hashes,
         face_embedding_hash=kyc_app.face_embedding_hash or "",
         verification_data=verification_data,
-        issuer=current_user.id
-    )
-    
-    kyc_app.blockchain_tx_hash = blockchain_record["tx_hash"]
-    
-    # Create verification record
-    verification = Verification(
-        kyc_id=kyc_app.id,
-        event_type="verification",
-        details={
-            "reviewer_id": current_user.id,
-            "comment": comment,
-            "ukn": kyc_app.ukn,
-            "blockchain_tx_hash": blockchain_record["tx_hash"]
-        },
-        performed_by=current_user.id,
-        tx_hash=blockchain_record["tx_hash"]
-    )
-    db.add(verification)
-    
-    # Log to audit trail
-    audit_service.log_event(
-        db=db,
-        entity_type="kyc_application",
-        entity_id=kyc_app.id,
-        event_type="verification",
-        details={
-            "reviewer_id": current_user.id,
-            "risk_score": kyc_app.risk_score,
-            "ukn": kyc_app.ukn,
-            "blockchain_tx_hash": blockchain_record["tx_hash"]
-        },
-        performed_by=current_user.id,
-        tx_hash=blockchain_record["tx_hash"]
+        reviewer_id=current_user.id,
+        comment=comment
     )
     
-    db.commit()
-    db.refresh(kyc_app)
-    
-    response = KYCApplicationResponse.from_orm(kyc_app)
-    if kyc_app.user:
-        response.user_email = kyc_app.user.email
-    
-    return response
+    return _to_response(kyc_app)
 
 
-@router.post("/applications/{application_id}/reject")
-async def reject_kyc_application(
+@router.post("/applications/{application_id}/reject", status_code=status.HTTP_202_ACCEPTED)
+def reject_kyc_application(
     application_id: str,
     request: RejectRequest,
-    current_user: User = Depends(require_role(["admin", "reviewer"])),
+    background_tasks: BackgroundTasks,
+    current_user: CurrentUser = Depends(require_role(["admin", "reviewer"])),
     db: Session = Depends(get_db)
 ):
-    """Reject a KYC application"""
+    """Reject a KYC application (verification and audit records are written in the background)"""
     comment = request.comment
     kyc_app = db.query(KYCApplication).filter(
         KYCApplication.id == application_id
@@ -269,197 +284,179 @@ async def reject_kyc_application(
     
     kyc_app.status = "REJECTED"
     kyc_app.reviewer_comment = comment or "Application rejected by reviewer"
-    kyc_app.updated_at = datetime.now()
-    
-    # Create verification record
-    tx_hash = generate_tx_hash()
-    verification = Verification(
-        kyc_id=kyc_app.id,
-        event_type="rejection",
-        details={"reviewer_id": current_user.id, "comment": comment},
-        performed_by=current_user.id,
-        tx_hash=tx_hash
-    )
-    db.add(verification)
-    
-    # Log to audit trail
-    audit_service.log_event(
-        db=db,
-        entity_type="kyc_application",
-        entity_id=kyc_app.id,
-        event_type="rejection",
-        details={"reviewer_id": current_user.id, "reason": comment},
-        performed_by=current_user.id,
-        tx_hash=tx_hash
-    )
+    kyc_app.updated_at = datetime.utcnow()
     
     db.commit()
     db.refresh(kyc_app)
+    cache_service.delete(METRICS_CACHE_KEY)
     
-    response = KYCApplicationResponse.from_orm(kyc_app)
-    if kyc_app.user:
-        response.user_email = kyc_app.user.email
+    background_tasks.add_task(
+        _record_rejection, kyc_id=kyc_app.id, reviewer_id=current_user.id, comment=comment
+    )
     
-    return response
+    return _to_response(kyc_app)
 
 
 @router.get("/metrics", response_model=RiskMetrics)
-async def get_risk_metrics(
-    current_user: User = Depends(require_role(["admin", "reviewer"])),
+def get_risk_metrics(
+    current_user: CurrentUser = Depends(require_role(["admin", "reviewer"])),
     db: Session = Depends(get_db)
 ):
     """Get risk metrics for all KYC applications"""
-    total_applications = db.query(KYCApplication).count()
+    cached = cache_service.get(METRICS_CACHE_KEY)
+    if cached is not None:
+        return RiskMetrics(**cached)
+    
+    # Single pass with conditional aggregates:
+    # - auto-approved: VERIFIED status with low risk score
+    # - manual reviews: IN_REVIEW, PROCESSING, REQUEST_INFO, UPLOADED
+    total_applications, auto_approved, manual_reviews, rejected, avg_risk_result = db.query(
+        func.count(KYCApplication.id),
+        func.sum(case((and_(
+            KYCApplication.status == "VERIFIED",
+            KYCApplication.risk_score.isnot(None),
+            KYCApplication.risk_score < 0.3
+        ), 1), else_=0)),
+        func.sum(case((
+            KYCApplication.status.in_(["IN_REVIEW", "PROCESSING", "REQUEST_INFO", "UPLOADED"]), 1
+        ), else_=0)),
+        func.sum(case((KYCApplication.status == "REJECTED", 1), else_=0)),
+        func.avg(KYCApplication.risk_score)
+    ).one()
     
-    # Count auto-approved applications (VERIFIED status with low risk score)
-    auto_approved = db.query(KYCApplication).filter(
-        KYCApplication.status == "VERIFIED",
-        KYCApplication.risk_score.isnot(None),
-        KYCApplication.risk_score < 0.3
-    ).count()
-    
-    # Count applications that need manual review
-    # Includes: IN_REVIEW, PROCESSING, REQUEST_INFO, UPLOADED
-    # Excludes: auto-approved (risk_score < 0.3 and status VERIFIED)
-    manual_reviews = db.query(KYCApplication).filter(
-        KYCApplication.status.in_(["IN_REVIEW", "PROCESSING", "REQUEST_INFO", "UPLOADED"])
-    ).count()
-    
-    rejected = db.query(KYCApplication).filter(
-        KYCApplication.status == "REJECTED"
-    ).count()
-    
-    # Calculate average risk score
-    avg_risk_result = db.query(func.avg(KYCApplication.risk_score)).filter(
-        KYCApplication.risk_score.isnot(None)
-    ).scalar()
     avg_risk_score = float(avg_risk_result) if avg_risk_result else 0.0
     
     # Calculate average processing time (simplified)
     # In production, this would calculate actual time differences
     avg_processing_time = 4.2  # Default value in hours
     
-    return RiskMetrics(
+    metrics = RiskMetrics(
         total_applications=total_applications,
-        auto_approved=auto_approved,
-        manual_reviews=manual_reviews,
-        rejected=rejected,
+        auto_approved=auto_approved or 0,
+        manual_reviews=manual_reviews or 0,
+        rejected=rejected or 0,
         avg_risk_score=avg_risk_score,
         avg_processing_time=avg_processing_time
     )
+    cache_service.set(METRICS_CACHE_KEY, metrics.model_dump(), settings.METRICS_CACHE_TTL_SECONDS)
+    
+    return metrics
 
 
-@router.get("/audit-trail", response_model=List[AuditRecordResponse])
-async def get_audit_trail(
+@router.get(
+    "/audit-trail",
+    response_class=StreamingResponse,
+    responses={200: {"model": List[AuditRecordResponse], "content": {"application/json": {}}}}
+)
+def get_audit_trail(
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(require_role(["admin", "reviewer"])),
+    current_user: CurrentUser = Depends(require_role(["admin", "reviewer"])),
     db: Session = Depends(get_db)
 ):
-    """Get audit trail records"""
-    records = db.query(AuditRecord).order_by(
+    """Get audit trail records (streamed as a JSON array in batches)"""
+    query = db.query(AuditRecord).order_by(
         desc(AuditRecord.timestamp)
-    ).offset(skip).limit(limit).all()
+    ).offset(skip).limit(limit)
+    
+    def stream_records():
+        # get_db closes the session before the body is streamed; a closed
+        # Session starts a fresh transaction on reuse, so close it again here
+        try:
+            yield b"["
+            for index, record in enumerate(query.yield_per(500)):
+                if index:
+                    yield b","
+                yield AuditRecordResponse.model_validate(record).model_dump_json().encode()
+            yield b"]"
+        finally:
+            db.close()
     
-    return [AuditRecordResponse.from_orm(record) for record in records]
+    return StreamingResponse(stream_records(), media_type="application/json")
 
 
-@router.get("/face-dedupe-queue")
-async def get_face_dedupe_queue(
-    current_user: User = Depends(require_role(["admin", "reviewer"])),
+@router.get("/face-dedupe-queue", response_model=List[KYCApplicationDuplicateInfo], response_class=ORJSONResponse)
+def get_face_dedupe_queue(
+    current_user: CurrentUser = Depends(require_role(["admin", "reviewer"])),
     db: Session = Depends(get_db)
 ):
     """Get applications flagged for face deduplication review"""
-    # Find applications with potential duplicates (checking reviewer_comment for duplicate mentions)
-    applications = db.query(KYCApplication).filter(
+    # Find applications with potential duplicates (flagged during processing or carrying a face hash)
+    applications = _with_related(db.query(KYCApplication)).filter(
         or_(
-            KYCApplication.reviewer_comment.contains("duplicate"),
-            KYCApplication.reviewer_comment.contains("Duplicate"),
+            KYCApplication.flagged_duplicate == True,
             KYCApplication.face_embedding_hash.isnot(None)
         ),
         KYCApplication.status.in_(["IN_REVIEW", "PROCESSING"])
     ).order_by(desc(KYCApplication.created_at)).all()
     
+    # Count verified applications sharing each face embedding hash in one query
+    hashes = {app.face_embedding_hash for app in applications if app.face_embedding_hash}
+    duplicates = {}
+    if hashes:
+        rows = db.query(
+            KYCApplication.face_embedding_hash,
+            func.count(KYCApplication.id),
+            func.min(KYCApplication.ukn)
+        ).filter(
+            KYCApplication.face_embedding_hash.in_(hashes),
+            KYCApplication.status == "VERIFIED"
+        ).group_by(KYCApplication.face_embedding_hash).all()
+        duplicates = {face_hash: (count, ukn) for face_hash, count, ukn in rows}
+    
     results = []
     for app in applications:
-        # Check if there are other applications with same face embedding hash
-        duplicate_count = db.query(KYCApplication).filter(
-            KYCApplication.face_embedding_hash == app.face_embedding_hash,
-            KYCApplication.id != app.id,
-            KYCApplication.status == "VERIFIED"
-        ).count()
+        # Queue applications are never VERIFIED, so they are not counted against themselves
+        duplicate_count, existing_ukn = duplicates.get(app.face_embedding_hash, (0, None))
         
-        existing_ukn = None
-        if app.face_embedding_hash:
-            existing_app = db.query(KYCApplication).filter(
-                KYCApplication.face_embedding_hash == app.face_embedding_hash,
-                KYCApplication.id != app.id,
-                KYCApplication.status == "VERIFIED",
-                KYCApplication.ukn.isnot(None)
-            ).first()
-            if existing_app:
-                existing_ukn = existing_app.ukn
-        
-        response = KYCApplicationResponse.from_orm(app)
-        if app.user:
-            response.user_email = app.user.email
-        
-        results.append({
-            **response.dict(),
-            "duplicate_count": duplicate_count,
-            "existing_ukn": existing_ukn,
-            "face_embedding_hash": app.face_embedding_hash
-        })
+        response = _to_response(app, KYCApplicationDuplicateInfo)
+        response.duplicate_count = duplicate_count
+        response.existing_ukn = existing_ukn
+        results.append(response)
     
     return results
 
 
-@router.get("/blockchain-records")
-async def get_blockchain_records(
+@router.get("/blockchain-records", response_model=List[KYCApplicationBlockchainRecord], response_class=ORJSONResponse)
+def get_blockchain_records(
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(require_role(["admin", "reviewer"])),
+    current_user: CurrentUser = Depends(require_role(["admin", "reviewer"])),
     db: Session = Depends(get_db)
 ):
     """Get all blockchain records (verified KYC applications with blockchain tx hashes)"""
-    from app.services.blockchain_service import blockchain_service
     
-    applications = db.query(KYCApplication).filter(
+    applications = _with_related(db.query(KYCApplication)).filter(
         KYCApplication.status == "VERIFIED",
         KYCApplication.blockchain_tx_hash.isnot(None),
         KYCApplication.ukn.isnot(None)
     ).order_by(desc(KYCApplication.verified_at)).offset(skip).limit(limit).all()
     
+    # Fetch block data for the whole page at once
+    blocks_by_ukn = blockchain_service.get_ukn_records_batch(app.ukn for app in applications)
+    # If not found by UKN, fall back to the tx_hash
+    blocks_by_tx_hash = blockchain_service.verify_records_batch(
+        app.blockchain_tx_hash for app in applications if app.ukn not in blocks_by_ukn
+    )
+    
     results = []
     for app in applications:
-        # Get blockchain block data
-        block_data = None
-        if app.ukn:
-            block_data = blockchain_service.get_ukn_record(app.ukn)
-        # If not found by UKN, try by tx_hash
-        if not block_data and app.blockchain_tx_hash:
-            block_data = blockchain_service.verify_record(app.blockchain_tx_hash)
-        
-        response = KYCApplicationResponse.from_orm(app)
-        if app.user:
-            response.user_email = app.user.email
+        block_data = blocks_by_ukn.get(app.ukn) or blocks_by_tx_hash.get(app.blockchain_tx_hash)
         
-        results.append({
-            **response.dict(),
-            "blockchain_block": block_data
-        })
+        response = _to_response(app, KYCApplicationBlockchainRecord)
+        response.blockchain_block = block_data
+        results.append(response)
     
     return results
 
 
 @router.get("/blockchain-records/{ukn}")
-async def get_blockchain_record_by_ukn(
+def get_blockchain_record_by_ukn(
     ukn: str,
-    current_user: User = Depends(require_role(["admin", "reviewer"])),
+    current_user: CurrentUser = Depends(require_role(["admin", "reviewer"])),
     db: Session = Depends(get_db)
 ):
     """Get blockchain record for a specific UKN"""
-    from app.services.blockchain_service import blockchain_service
     
     kyc_app = db.query(KYCApplication).filter(
         KYCApplication.ukn == ukn,
@@ -488,33 +485,18 @@ async def get_blockchain_record_by_ukn(
 
 
 @router.post("/users")
-async def create_user(
-    user_data: dict,
-    current_user: User = Depends(require_role(["admin"])),  # Only admin can create users
+def create_user(
+    request: CreateUserRequest,
+    current_user: CurrentUser = Depends(require_role(["admin"])),  # Only admin can create users
     db: Session = Depends(get_db)
 ):
     """
     Create a new user (admin only)
     Admin can create reviewers, institutions, or other admins
     """
-    from pydantic import BaseModel
-    
-    class CreateUserRequest(BaseModel):
-        email: str
-        password: str
-        role: str
-    
-    try:
-        request = CreateUserRequest(**user_data)
-        email = request.email
-        password = request.password
-        role = request.role
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid request data: {str(e)}"
-        )
-    from app.core.security import get_password_hash
+    email = request.email.lower()
+    password = request.password
+    role = request.role
     
     # Validate role
     valid_roles = ["user", "reviewer", "admin", "institution"]
@@ -548,10 +530,9 @@ async def create_user(
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    db.flush()  # Assigns new_user.id for the audit record
     
-    # Log to audit trail
+    # Log to audit trail (same transaction as the user)
     audit_service.log_event(
         db=db,
         entity_type="user",
@@ -563,35 +544,39 @@ async def create_user(
             "created_by": current_user.id
         },
         performed_by=current_user.id,
-        tx_hash=None
+        tx_hash=None,
+        commit=False
     )
+    db.commit()
+    db.refresh(new_user)
     
-    from app.schemas.auth import UserResponse
     return UserResponse.from_orm(new_user)
 
 
 @router.get("/users")
-async def list_users(
+def list_users(
     role_filter: str = None,
-    current_user: User = Depends(require_role(["admin"])),  # Only admin can list users
+    skip: int = 0,
+    limit: int = 100,
+    current_user: CurrentUser = Depends(require_role(["admin"])),  # Only admin can list users
     db: Session = Depends(get_db)
 ):
     """List all users (admin only)"""
-    query = db.query(User)
+    # Only the columns in UserResponse; never load password hashes
+    query = db.query(User).options(load_only(User.id, User.email, User.role, User.created_at))
     
     if role_filter:
         query = query.filter(User.role == role_filter)
     
-    users = query.order_by(User.created_at.desc()).all()
+    users = query.order_by(User.created_at.desc()).offset(skip).limit(limit).all()
     
-    from app.schemas.auth import UserResponse
     return [UserResponse.from_orm(user) for user in users]
 
 
 @router.delete("/users/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: str,
-    current_user: User = Depends(require_role(["admin"])),  # Only admin can delete users
+    current_user: CurrentUser = Depends(require_role(["admin"])),  # Only admin can delete users
     db: Session = Depends(get_db)
 ):
     """Delete a user (admin only)"""
@@ -622,11 +607,15 @@ async def delete_user(
             "deleted_by": current_user.id
         },
         performed_by=current_user.id,
-        tx_hash=None
+        tx_hash=None,
+        commit=False
     )
     
+    # Audit record and deletion are committed together
     db.delete(user)
     db.commit()
+    invalidate_cached_user(user.email)
+    cache_service.delete(user_kyc_id_key(user.id))
     
     return {"message": "User deleted successfully"}
 
@@ -8,7 +8,7 @@ from app.db.models import User
 from app.schemas.auth import AuthResponse, UserResponse, LoginRequest, RegisterRequest
 from app.core.security import (
     verify_password, get_password_hash, create_access_token,
-    get_current_active_user
+    get_current_active_user, CurrentUser
 )
 from app.core.config import settings
 
@@ -16,12 +16,13 @@ router = APIRouter()
 
 
 @router.post("/login", response_model=AuthResponse)
-async def login(
+def login(
     login_data: LoginRequest,
     db: Session = Depends(get_db)
 ):
     """Login endpoint"""
-    user = db.query(User).filter(User.email == login_data.email).first()
+    # Emails are stored lowercased so the lookup stays on the unique index
+    user = db.query(User).filter(User.email == login_data.email.lower()).first()
     
     if not user:
         return AuthResponse(
@@ -50,12 +51,12 @@ async def login(
 
 
 @router.post("/token", response_model=AuthResponse)
-async def login_for_access_token(
+def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
     """OAuth2 compatible token endpoint"""
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = db.query(User).filter(User.email == form_data.username.lower()).first()
     
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
@@ -80,14 +81,14 @@ async def login_for_access_token(
 
 @router.get("/me", response_model=UserResponse)
 async def read_users_me(
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """Get current user information"""
     return UserResponse.from_orm(current_user)
 
 
 @router.post("/register", response_model=UserResponse)
-async def register(
+def register(
     register_data: RegisterRequest,
     db: Session = Depends(get_db)
 ):
@@ -103,8 +104,10 @@ async def register(
             detail="Only 'user' and 'institution' roles can be self-registered. Admin and reviewer accounts must be created by an administrator."
         )
     
+    email = register_data.email.lower()
+    
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == register_data.email).first()
+    existing_user = db.query(User).filter(User.email == email).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -121,7 +124,7 @@ async def register(
     # Create new user
     hashed_password = get_password_hash(register_data.password)
     new_user = User(
-        email=register_data.email,
+        email=email,
         hashed_password=hashed_password,
         role=register_data.role
     )
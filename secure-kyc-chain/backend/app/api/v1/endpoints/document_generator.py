@@ -1,26 +1,39 @@
 """Document List Generator based on user inputs"""
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, field_validator
+from typing import Any, Dict, List, Literal, Optional
+from datetime import date
 
 from app.db.database import get_db
-from app.db.models import User, KYCApplication
-from app.core.security import get_current_active_user
+from app.db.models import KYCApplication
+from app.core.security import CurrentUser, get_current_active_user
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 
 class UserInputs(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     name: str
-    date_of_birth: str  # Format: YYYY-MM-DD
-    gender: str  # MALE, FEMALE, OTHER
-    marital_status: str  # SINGLE, MARRIED, DIVORCED, WIDOWED
-    purpose: str  # EMPLOYMENT, LOAN, EDUCATION, HEALTH_INSURANCE, GENERAL, BANK_ACCOUNT, etc.
+    date_of_birth: date  # Format: YYYY-MM-DD (parsed and validated by pydantic)
+    gender: Literal["MALE", "FEMALE", "OTHER"]
+    marital_status: Literal["SINGLE", "MARRIED", "DIVORCED", "WIDOWED"]
+    purpose: Literal[
+        "EMPLOYMENT", "LOAN", "EDUCATION", "HEALTH_INSURANCE", "HEALTH", "INSURANCE", "GENERAL", "BANK_ACCOUNT"
+    ]
+    
+    @field_validator("gender", "marital_status", "purpose", mode="before")
+    @classmethod
+    def upcase(cls, v):
+        """Accept any casing; values are stored upper-cased"""
+        return v.upper() if isinstance(v, str) else v
 
 
 class DocumentRequirement(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     doc_type: str
     name: str
     mandatory: bool
@@ -28,213 +41,144 @@ class DocumentRequirement(BaseModel):
 
 
 class DocumentListResponse(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     mandatory_documents: List[DocumentRequirement]
     optional_documents: List[DocumentRequirement]
     auto_extracted_details: List[str]
     user_inputs: UserInputs
 
 
-def generate_document_list(user_inputs: UserInputs) -> DocumentListResponse:
+# Document requirement templates, built once at import (shared between requests - never mutate)
+# Identity documents the user can choose from
+_IDENTITY_OPTIONS = (
+    {"doc_type": "AADHAAR", "name": "Aadhaar Card", "mandatory": True, "description": "12-digit Aadhaar number"},
+    {"doc_type": "PASSPORT", "name": "Passport", "mandatory": True, "description": "Valid passport with photo"},
+    {"doc_type": "DRIVING_LICENSE", "name": "Driving License", "mandatory": True, "description": "Valid driving license"},
+    {"doc_type": "PAN_CARD", "name": "PAN Card", "mandatory": True, "description": "PAN card (requires address proof separately)"},
+)
+
+# Documents accepted as address proof
+_ADDRESS_OPTIONS = (
+    {"doc_type": "AADHAAR", "name": "Aadhaar Card (if not used as identity)", "mandatory": False, "description": "Contains both identity and address"},
+    {"doc_type": "PASSPORT", "name": "Passport (if not used as identity)", "mandatory": False, "description": "Contains both identity and address"},
+    {"doc_type": "DRIVING_LICENSE", "name": "Driving License (if not used as identity)", "mandatory": False, "description": "Contains both identity and address"},
+    {"doc_type": "BANK_STATEMENT", "name": "Bank Statement", "mandatory": False, "description": "Recent bank statement (last 3 months)"},
+    {"doc_type": "UTILITY_BILL", "name": "Utility Bill", "mandatory": False, "description": "Electricity/Water/Gas bill (last 3 months)"},
+)
+
+_IDENTITY_DOC = {
+    "doc_type": "IDENTITY_DOC",
+    "name": "Identity Document",
+    "mandatory": True,
+    "description": "Choose one: Aadhaar OR Passport OR Driving License OR PAN Card"
+}
+
+_ADDRESS_PROOF = {
+    "doc_type": "ADDRESS_PROOF",
+    "name": "Address Proof",
+    "mandatory": True,
+    "description": "Required if identity document doesn't contain address"
+}
+
+_MARRIAGE = {
+    "doc_type": "MARRIAGE_CERTIFICATE",
+    "name": "Marriage Certificate",
+    "mandatory": True,
+    "description": "Official marriage certificate"
+}
+
+_INCOME = {
+    "doc_type": "INCOME_PROOF",
+    "name": "Income/Employment Proof",
+    "mandatory": True,
+    "description": "Choose one: Salary Slip OR Bank Statement OR Offer Letter OR Form 16/ITR"
+}
+
+_EDUCATION = {
+    "doc_type": "EDUCATION_PROOF",
+    "name": "Education Proof",
+    "mandatory": True,
+    "description": "Highest Degree OR 12th Marksheet"
+}
+
+_MEDICAL = {
+    "doc_type": "MEDICAL_CERTIFICATE",
+    "name": "Medical Certificate",
+    "mandatory": True,
+    "description": "Basic medical certificate"
+}
+
+_SELFIE = {
+    "doc_type": "SELFIE",
+    "name": "Live Selfie Video",
+    "mandatory": True,
+    "description": "Real-time selfie for face matching and liveness check"
+}
+
+_MARITAL_TO_DOC = {"MARRIED": _MARRIAGE}
+
+# Employment/Loan -> income proof, Education -> education proof, Health/Insurance -> medical certificate
+_PURPOSE_TO_DOC = {
+    "EMPLOYMENT": _INCOME,
+    "LOAN": _INCOME,
+    "EDUCATION": _EDUCATION,
+    "HEALTH_INSURANCE": _MEDICAL,
+    "HEALTH": _MEDICAL,
+    "INSURANCE": _MEDICAL,
+}
+
+_AUTO_EXTRACTED = (
+    "Name (from identity document)",
+    "Date of Birth (from identity document)",
+    "Address (from address proof or identity document)",
+    "Photo (from identity document and selfie)",
+    "Document Number (from identity document)",
+    "Expiry Date (if applicable)"
+)
+
+
+def generate_document_list(user_inputs: UserInputs) -> Dict[str, Any]:
     """
     Generate personalized document list based on user inputs using AI logic
+    Returns plain dicts shaped like DocumentListResponse (serialized directly by orjson)
     """
-    mandatory_docs = []
-    optional_docs = []
-    auto_extracted = []
-    
-    # 1. Always ask for ONE identity document
-    identity_options = [
-        DocumentRequirement(
-            doc_type="AADHAAR",
-            name="Aadhaar Card",
-            mandatory=True,
-            description="12-digit Aadhaar number"
-        ),
-        DocumentRequirement(
-            doc_type="PASSPORT",
-            name="Passport",
-            mandatory=True,
-            description="Valid passport with photo"
-        ),
-        DocumentRequirement(
-            doc_type="DRIVING_LICENSE",
-            name="Driving License",
-            mandatory=True,
-            description="Valid driving license"
-        ),
-        DocumentRequirement(
-            doc_type="PAN_CARD",
-            name="PAN Card",
-            mandatory=True,
-            description="PAN card (requires address proof separately)"
-        )
-    ]
-    
-    # Add identity document (user will choose one)
-    mandatory_docs.append(
-        DocumentRequirement(
-            doc_type="IDENTITY_DOC",
-            name="Identity Document",
-            mandatory=True,
-            description="Choose one: Aadhaar OR Passport OR Driving License OR PAN Card"
-        )
-    )
-    
-    # 2. Address proof - only if identity doc doesn't contain address
-    # If user chooses PAN, they need address proof
-    # If they choose Aadhaar/Passport/Driving License, check if it has address
-    needs_address_proof = True  # Default to true, will be determined by chosen identity doc
-    
-    address_options = [
-        DocumentRequirement(
-            doc_type="AADHAAR",
-            name="Aadhaar Card (if not used as identity)",
-            mandatory=False,
-            description="Contains both identity and address"
-        ),
-        DocumentRequirement(
-            doc_type="PASSPORT",
-            name="Passport (if not used as identity)",
-            mandatory=False,
-            description="Contains both identity and address"
-        ),
-        DocumentRequirement(
-            doc_type="DRIVING_LICENSE",
-            name="Driving License (if not used as identity)",
-            mandatory=False,
-            description="Contains both identity and address"
-        ),
-        DocumentRequirement(
-            doc_type="BANK_STATEMENT",
-            name="Bank Statement",
-            mandatory=False,
-            description="Recent bank statement (last 3 months)"
-        ),
-        DocumentRequirement(
-            doc_type="UTILITY_BILL",
-            name="Utility Bill",
-            mandatory=False,
-            description="Electricity/Water/Gas bill (last 3 months)"
-        )
-    ]
-    
-    # Add address proof requirement (conditional)
-    if needs_address_proof:
-        mandatory_docs.append(
-            DocumentRequirement(
-                doc_type="ADDRESS_PROOF",
-                name="Address Proof",
-                mandatory=True,
-                description="Required if identity document doesn't contain address"
-            )
-        )
+    # 1. Always ask for ONE identity document (user will choose one of _IDENTITY_OPTIONS)
+    # 2. Address proof - required if the chosen identity doc doesn't contain address (e.g. PAN);
+    #    any of _ADDRESS_OPTIONS is accepted
+    mandatory_docs = [_IDENTITY_DOC, _ADDRESS_PROOF]
     
+    # Enum fields arrive upper-cased (see UserInputs.upcase)
     # 3. If Married: Add Marriage Certificate
-    if user_inputs.marital_status.upper() == "MARRIED":
-        mandatory_docs.append(
-            DocumentRequirement(
-                doc_type="MARRIAGE_CERTIFICATE",
-                name="Marriage Certificate",
-                mandatory=True,
-                description="Official marriage certificate"
-            )
-        )
+    marital_doc = _MARITAL_TO_DOC.get(user_inputs.marital_status)
+    if marital_doc:
+        mandatory_docs.append(marital_doc)
     
-    # 4. If Purpose = Employment or Loan: Income/Employment document
-    if user_inputs.purpose.upper() in ["EMPLOYMENT", "LOAN"]:
-        mandatory_docs.append(
-            DocumentRequirement(
-                doc_type="INCOME_PROOF",
-                name="Income/Employment Proof",
-                mandatory=True,
-                description="Choose one: Salary Slip OR Bank Statement OR Offer Letter OR Form 16/ITR"
-            )
-        )
-    
-    # 5. If Purpose = Education: Education proof
-    if user_inputs.purpose.upper() == "EDUCATION":
-        mandatory_docs.append(
-            DocumentRequirement(
-                doc_type="EDUCATION_PROOF",
-                name="Education Proof",
-                mandatory=True,
-                description="Highest Degree OR 12th Marksheet"
-            )
-        )
-    
-    # 6. If Purpose = Health/Insurance: Health proof
-    if user_inputs.purpose.upper() in ["HEALTH_INSURANCE", "HEALTH", "INSURANCE"]:
-        mandatory_docs.append(
-            DocumentRequirement(
-                doc_type="MEDICAL_CERTIFICATE",
-                name="Medical Certificate",
-                mandatory=True,
-                description="Basic medical certificate"
-            )
-        )
+    # 4-6. Purpose-specific proof (income, education or medical)
+    purpose_doc = _PURPOSE_TO_DOC.get(user_inputs.purpose)
+    if purpose_doc:
+        mandatory_docs.append(purpose_doc)
     
     # 7. Always include Live Selfie Video as mandatory
-    mandatory_docs.append(
-        DocumentRequirement(
-            doc_type="SELFIE",
-            name="Live Selfie Video",
-            mandatory=True,
-            description="Real-time selfie for face matching and liveness check"
-        )
-    )
+    mandatory_docs.append(_SELFIE)
     
-    # Auto-extracted details
-    auto_extracted = [
-        "Name (from identity document)",
-        "Date of Birth (from identity document)",
-        "Address (from address proof or identity document)",
-        "Photo (from identity document and selfie)",
-        "Document Number (from identity document)",
-        "Expiry Date (if applicable)"
-    ]
-    
-    return DocumentListResponse(
-        mandatory_documents=mandatory_docs,
-        optional_documents=optional_docs,
-        auto_extracted_details=auto_extracted,
-        user_inputs=user_inputs
-    )
+    return {
+        "mandatory_documents": mandatory_docs,
+        "optional_documents": [],
+        "auto_extracted_details": _AUTO_EXTRACTED,
+        "user_inputs": user_inputs.model_dump()
+    }
 
 
-@router.post("/generate-document-list", response_model=DocumentListResponse)
+@router.post("/generate-document-list", responses={200: {"model": DocumentListResponse}})
 async def generate_document_requirements(
     user_inputs: UserInputs,
-    current_user: User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """
     Generate personalized document list based on user inputs
     """
-    try:
-        # Validate date format
-        datetime.strptime(user_inputs.date_of_birth, "%Y-%m-%d")
-    except ValueError:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid date format. Use YYYY-MM-DD"
-        )
-    
-    # Validate gender
-    valid_genders = ["MALE", "FEMALE", "OTHER"]
-    if user_inputs.gender.upper() not in valid_genders:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid gender. Must be one of: {', '.join(valid_genders)}"
-        )
-    
-    # Validate marital status
-    valid_marital_statuses = ["SINGLE", "MARRIED", "DIVORCED", "WIDOWED"]
-    if user_inputs.marital_status.upper() not in valid_marital_statuses:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid marital status. Must be one of: {', '.join(valid_marital_statuses)}"
-        )
-    
     # Get or create KYC application
     kyc_app = db.query(KYCApplication).filter(
         KYCApplication.user_id == current_user.id
@@ -245,9 +189,9 @@ async def generate_document_requirements(
             user_id=current_user.id,
             status="REGISTERED"
         )
+        # The id is a client-side default, so no commit/refresh is needed here;
+        # the application is inserted with the user details in the single commit below
         db.add(kyc_app)
-        db.commit()
-        db.refresh(kyc_app)
     
     # Generate document list
     document_list = generate_document_list(user_inputs)
@@ -255,20 +199,20 @@ async def generate_document_requirements(
     # Store user inputs in application
     kyc_app.user_details = {
         "name": user_inputs.name,
-        "date_of_birth": user_inputs.date_of_birth,
+        "date_of_birth": user_inputs.date_of_birth.isoformat(),
         "gender": user_inputs.gender,
         "marital_status": user_inputs.marital_status,
         "purpose": user_inputs.purpose
     }
     db.commit()
     
-    return document_list
+    return ORJSONResponse(document_list)
 
 
 @router.get("/document-list/{application_id}", response_model=DocumentListResponse)
 async def get_document_list(
     application_id: str,
-    current_user: User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -1,25 +1,33 @@
 """Institution API endpoints for KYC lookup"""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
 from typing import Optional
 from datetime import datetime, timedelta
-import secrets
 
-from app.db.database import get_db
-from app.db.models import User, KYCApplication, ConsentRecord, Document
-from app.core.security import get_current_active_user, require_role
-from app.schemas.kyc import KYCApplicationResponse
-from pydantic import BaseModel
+from app.db.database import SessionLocal, get_db
+from app.db.models import KYCApplication, ConsentRecord, generate_id
+from app.core.security import CurrentUser, require_role
+from app.services.cache_service import cache_service, kyc_summary_key
+from app.services.ukn_service import validate_ukn_format
+from app.core.config import settings
+from pydantic import BaseModel, ConfigDict
 
 router = APIRouter()
 
 
 class UKNLookupRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     ukn: str
     purpose: str  # e.g., "bank_account_opening", "loan_application"
 
 
 class KYCSummaryResponse(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     ukn: str
     status: str
     verified_name: Optional[str] = None
@@ -32,86 +40,164 @@ class KYCSummaryResponse(BaseModel):
     blockchain_tx_hash: Optional[str] = None
 
 
-@router.get("/resolve-kyc/{ukn}", response_model=KYCSummaryResponse)
-async def resolve_kyc(
-    ukn: str,
+def _with_consent(
+    db: Session,
+    institution_id: str,
     purpose: str,
-    current_user: User = Depends(require_role(["institution", "admin"])),
-    db: Session = Depends(get_db)
+    *conditions,
+    entities=(KYCApplication, ConsentRecord)
 ):
     """
-    Resolve UKN to get KYC summary
-    Institutions use this to verify a user's KYC status
+    Query (KYCApplication, ConsentRecord) rows, outer-joined to the institution's
+    consent for the purpose, so both are fetched in one round trip (consent is None if absent)
+    Pass entities to select just the columns needed instead of full ORM rows
+    """
+    return db.query(*entities).outerjoin(
+        ConsentRecord,
+        and_(
+            ConsentRecord.kyc_id == KYCApplication.id,
+            ConsentRecord.institution_id == institution_id,
+            ConsentRecord.purpose == purpose,
+            *conditions
+        )
+    )
+
+
+# Consent checks only need these columns, not full ORM rows
+_CONSENT_COLUMNS = (
+    KYCApplication.id.label("kyc_id"),
+    ConsentRecord.id.label("consent_id"),
+    ConsentRecord.expires_at
+)
+
+
+def _persist_consent(kyc_id: str, institution_id: str, institution_email: str, purpose: str):
+    """
+    Record an institution's access to a KYC application in its own short-lived session
+    Runs as a background task after the response is sent, when get_db has already closed
+    the request session, so it is passed plain values rather than that session or ORM rows
+    Skips the insert when the institution already has a record for this application and
+    purpose (one per triple, enforced by a unique index), so repeated lookups don't write duplicates
+    """
+    with SessionLocal() as db:
+        try:
+            consent_exists = db.query(db.query(ConsentRecord.id).filter(
+                ConsentRecord.kyc_id == kyc_id,
+                ConsentRecord.institution_id == institution_id,
+                ConsentRecord.purpose == purpose
+            ).exists()).scalar()
+            if consent_exists:
+                return
+            
+            # User consent assumed for now, in production would require explicit consent
+            now = datetime.utcnow()
+            db.add(ConsentRecord(
+                kyc_id=kyc_id,
+                institution_id=institution_id,
+                institution_email=institution_email,
+                purpose=purpose,
+                consent_given=True,
+                accessed_at=now,
+                expires_at=now + timedelta(days=30)  # 30-day access token
+            ))
+            db.commit()
+        except IntegrityError:
+            # A concurrent lookup recorded it first
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            print(f"Error saving consent for {kyc_id}: {e}")
+
+
+def _resolve_kyc_summary(
+    db: Session,
+    ukn: str,
+    institution: CurrentUser,
+    purpose: str,
+    background_tasks: Optional[BackgroundTasks] = None
+) -> Response:
+    """
+    Build the KYC summary for a verified UKN as a ready-serialized JSON response
+    (skips response_model re-validation and jsonable_encoder)
+    When background_tasks is given, the institution's consent for the purpose is
+    recorded (if missing) after the response is sent
     """
     # Validate UKN format (KYC-XXXX-XXXX-XXXX = 18 chars)
-    from app.services.ukn_service import validate_ukn_format
     if not validate_ukn_format(ukn):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid UKN format"
         )
     
-    # Find KYC application by UKN
-    kyc_app = db.query(KYCApplication).filter(
+    # Serve the summary from cache; consent is still recorded per institution/purpose
+    cache_key = kyc_summary_key(ukn)
+    cached = cache_service.get(cache_key)
+    if cached is not None:
+        if background_tasks is not None:
+            background_tasks.add_task(
+                _persist_consent, cached["kyc_id"], institution.id, institution.email, purpose
+            )
+        return ORJSONResponse(cached["summary"])
+    
+    # Find KYC application by UKN along with any existing consent
+    # (documents are read below for the verified details)
+    # Expired KYCs are filtered out in the query itself
+    now = datetime.utcnow()
+    row = _with_consent(db, institution.id, purpose).options(
+        selectinload(KYCApplication.documents)
+    ).filter(
         KYCApplication.ukn == ukn,
-        KYCApplication.status == "VERIFIED"
+        KYCApplication.status == "VERIFIED",
+        or_(KYCApplication.expires_at.is_(None), KYCApplication.expires_at > now)
     ).first()
     
-    if not kyc_app:
+    if not row:
+        # Only on a miss: tell an expired KYC apart from an unknown one
+        verified_exists = db.query(db.query(KYCApplication.id).filter(
+            KYCApplication.ukn == ukn,
+            KYCApplication.status == "VERIFIED"
+        ).exists()).scalar()
+        if verified_exists:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="KYC has expired"
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="UKN not found or not verified"
         )
+    kyc_app, consent = row
     
-    # Check if KYC is expired
-    if kyc_app.expires_at and kyc_app.expires_at < datetime.utcnow():
-        raise HTTPException(
-            status_code=status.HTTP_410_GONE,
-            detail="KYC has expired"
+    # Create consent record if none exists
+    if background_tasks is not None and not consent:
+        background_tasks.add_task(
+            _persist_consent, kyc_app.id, institution.id, institution.email, purpose
         )
     
-    # Check or create consent record
-    consent = db.query(ConsentRecord).filter(
-        ConsentRecord.kyc_id == kyc_app.id,
-        ConsentRecord.institution_id == current_user.id,
-        ConsentRecord.purpose == purpose
-    ).first()
-    
-    if not consent:
-        # Create consent record (user consent assumed for now, in production would require explicit consent)
-        consent = ConsentRecord(
-            kyc_id=kyc_app.id,
-            institution_id=current_user.id,
-            purpose=purpose,
-            consent_given=True,
-            accessed_at=datetime.utcnow(),
-            expires_at=datetime.utcnow() + timedelta(days=30)  # 30-day access token
-        )
-        db.add(consent)
-        db.commit()
-    
-    # Extract verified data from documents
+    # Extract verified data from documents (first non-selfie document providing each field)
     verified_name = None
     verified_age = None
     verified_address = None
+    today = now.toordinal()
     
     for doc in kyc_app.documents:
-        if doc.doc_type != "SELFIE" and doc.extracted_data:
-            data = doc.extracted_data
-            if not verified_name and data.get("name"):
-                verified_name = data.get("name")
-            if not verified_age and data.get("dob"):
+        data = doc.extracted_data
+        if doc.doc_type == "SELFIE" or not data:
+            continue
+        verified_name = verified_name or data.get("name")
+        verified_address = verified_address or data.get("address")
+        if verified_age is None:
+            dob = data.get("dob")
+            if dob:
                 # Calculate age from DOB
                 try:
-                    dob = datetime.strptime(data.get("dob"), "%Y-%m-%d")
-                    age = (datetime.utcnow() - dob).days // 365
-                    verified_age = age
-                except:
+                    verified_age = (today - datetime.strptime(dob, "%Y-%m-%d").toordinal()) // 365
+                except (TypeError, ValueError):
                     pass
-            if not verified_address and data.get("address"):
-                verified_address = data.get("address")
+        if verified_name and verified_address and verified_age is not None:
+            break
     
-    return KYCSummaryResponse(
+    summary = KYCSummaryResponse(
         ukn=kyc_app.ukn,
         status=kyc_app.status,
         verified_name=verified_name,
@@ -123,105 +209,161 @@ async def resolve_kyc(
         face_match_score=kyc_app.face_match_score,
         blockchain_tx_hash=kyc_app.blockchain_tx_hash
     )
+    
+    # Never cache past the KYC expiry
+    ttl = settings.KYC_SUMMARY_CACHE_TTL_SECONDS
+    if kyc_app.expires_at:
+        ttl = min(ttl, int((kyc_app.expires_at - now).total_seconds()))
+    if ttl > 0:
+        cache_service.set(
+            cache_key,
+            {"kyc_id": kyc_app.id, "summary": summary.model_dump(mode="json")},
+            ttl
+        )
+    
+    return Response(content=summary.model_dump_json(), media_type="application/json")
+
+
+@router.get("/resolve-kyc/{ukn}", responses={200: {"model": KYCSummaryResponse}})
+def resolve_kyc(
+    ukn: str,
+    purpose: str,
+    background_tasks: BackgroundTasks,
+    current_user: CurrentUser = Depends(require_role(["institution", "admin"])),
+    db: Session = Depends(get_db)
+):
+    """
+    Resolve UKN to get KYC summary
+    Institutions use this to verify a user's KYC status
+    Plain def: the lookup and summary build are blocking, so FastAPI runs this in its threadpool
+    """
+    return _resolve_kyc_summary(db, ukn, current_user, purpose, background_tasks)
 
 
 @router.get("/validate-consent/{ukn}")
-async def validate_consent(
+def validate_consent(
     ukn: str,
     purpose: str,
-    current_user: User = Depends(require_role(["institution", "admin"])),
+    current_user: CurrentUser = Depends(require_role(["institution", "admin"])),
     db: Session = Depends(get_db)
 ):
     """Validate if institution has consent to access KYC data"""
-    kyc_app = db.query(KYCApplication).filter(
+    row = _with_consent(
+        db, current_user.id, purpose,
+        ConsentRecord.consent_given == True,
+        ConsentRecord.expires_at > datetime.utcnow(),
+        entities=_CONSENT_COLUMNS
+    ).filter(
         KYCApplication.ukn == ukn
     ).first()
     
-    if not kyc_app:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="UKN not found"
         )
     
-    consent = db.query(ConsentRecord).filter(
-        ConsentRecord.kyc_id == kyc_app.id,
-        ConsentRecord.institution_id == current_user.id,
-        ConsentRecord.purpose == purpose,
-        ConsentRecord.consent_given == True,
-        ConsentRecord.expires_at > datetime.utcnow()
-    ).first()
-    
     return {
-        "has_consent": consent is not None,
-        "consent_id": consent.id if consent else None,
-        "expires_at": consent.expires_at.isoformat() if consent else None
+        "has_consent": row.consent_id is not None,
+        "consent_id": row.consent_id,
+        "expires_at": row.expires_at.isoformat() if row.consent_id else None
     }
 
 
-@router.get("/get-kyc-summary/{ukn}", response_model=KYCSummaryResponse)
-async def get_kyc_summary(
+@router.get("/get-kyc-summary/{ukn}", responses={200: {"model": KYCSummaryResponse}})
+def get_kyc_summary(
     ukn: str,
-    current_user: User = Depends(require_role(["institution", "admin"])),
+    current_user: CurrentUser = Depends(require_role(["institution", "admin"])),
     db: Session = Depends(get_db)
 ):
-    """Get full KYC summary (same as resolve-kyc but with different endpoint name)"""
-    return await resolve_kyc(ukn, "general_verification", current_user, db)
+    """Get full KYC summary (same as resolve-kyc, but read-only: no consent record is created)"""
+    return _resolve_kyc_summary(db, ukn, current_user, "general_verification")
+
+
+def _request_pending_consent(
+    db: Session,
+    kyc_id: str,
+    institution: CurrentUser,
+    purpose: str,
+    existing_id: Optional[str]
+) -> str:
+    """
+    Commit a pending consent request and return its id
+    An expired or revoked record for the same purpose is reopened in place (one record per
+    application, institution and purpose); if a concurrent request inserts first, its record is returned
+    """
+    values = {
+        "institution_email": institution.email,
+        "consent_given": False,  # Pending user approval
+        "expires_at": datetime.utcnow() + timedelta(days=30)
+    }
+    
+    if existing_id:
+        db.query(ConsentRecord).filter(ConsentRecord.id == existing_id).update(values, synchronize_session=False)
+        db.commit()
+        return existing_id
+    
+    consent_id = generate_id()
+    db.add(ConsentRecord(id=consent_id, kyc_id=kyc_id, institution_id=institution.id, purpose=purpose, **values))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return db.query(ConsentRecord.id).filter(
+            ConsentRecord.kyc_id == kyc_id,
+            ConsentRecord.institution_id == institution.id,
+            ConsentRecord.purpose == purpose
+        ).scalar()
+    return consent_id
 
 
 @router.post("/request-consent/{ukn}")
-async def request_consent(
+def request_consent(
     ukn: str,
     purpose: str,
-    current_user: User = Depends(require_role(["institution", "admin"])),
+    current_user: CurrentUser = Depends(require_role(["institution", "admin"])),
     db: Session = Depends(get_db)
 ):
     """
     Institution requests consent from user to access their KYC data
     Returns a consent token that the user can approve
+    The record is committed before responding, so the returned id can be acted on immediately
     """
-    kyc_app = db.query(KYCApplication).filter(
+    # Find KYC application along with the institution's consent record for the purpose, if any
+    row = _with_consent(
+        db, current_user.id, purpose,
+        entities=(
+            *_CONSENT_COLUMNS,
+            ConsentRecord.consent_given,
+            (ConsentRecord.expires_at > datetime.utcnow()).label("active")
+        )
+    ).filter(
         KYCApplication.ukn == ukn,
         KYCApplication.status == "VERIFIED"
     ).first()
     
-    if not kyc_app:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="UKN not found or not verified"
         )
     
-    # Check if consent already exists
-    existing_consent = db.query(ConsentRecord).filter(
-        ConsentRecord.kyc_id == kyc_app.id,
-        ConsentRecord.institution_id == current_user.id,
-        ConsentRecord.purpose == purpose,
-        ConsentRecord.consent_given == True,
-        ConsentRecord.expires_at > datetime.utcnow()
-    ).first()
-    
-    if existing_consent:
+    if row.consent_id and row.active and row.consent_given:
         return {
             "message": "Consent already granted",
-            "consent_id": existing_consent.id,
-            "expires_at": existing_consent.expires_at.isoformat()
+            "consent_id": row.consent_id,
+            "expires_at": row.expires_at.isoformat()
         }
     
-    # Create pending consent request
-    consent = ConsentRecord(
-        kyc_id=kyc_app.id,
-        institution_id=current_user.id,
-        purpose=purpose,
-        consent_given=False,  # Pending user approval
-        expires_at=datetime.utcnow() + timedelta(days=30)
-    )
-    db.add(consent)
-    db.commit()
-    db.refresh(consent)
+    if row.consent_id and row.active:
+        # Repeated request: the pending one still stands
+        consent_id = row.consent_id
+    else:
+        consent_id = _request_pending_consent(db, row.kyc_id, current_user, purpose, row.consent_id)
     
     return {
         "message": "Consent request created. Waiting for user approval.",
-        "consent_id": consent.id,
+        "consent_id": consent_id,
         "purpose": purpose,
         "institution_id": current_user.id
     }
-
@@ -1,37 +1,82 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
-from datetime import datetime
-import hashlib
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, UploadFile, File, Form
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import desc, func, select, update
+from pydantic import TypeAdapter
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import secrets
 import os
 
 from app.db.database import get_db
-from app.db.models import User, KYCApplication, Document, Verification
+from app.db.models import User, KYCApplication, Document, Verification, ConsentRecord, generate_id
 from app.schemas.kyc import (
     KYCApplicationResponse, DocumentResponse, VerificationResponse,
-    KYCApplicationCreate, KYCApplicationUpdate
+    KYCApplicationCreate, KYCApplicationUpdate, ConsentResponse, ValidationResult
 )
-from app.core.security import get_current_active_user
+from app.core.config import settings
+from app.core.http_cache import etag_json_response
+from app.core.security import CurrentUser, get_current_active_user
 from app.services.document_service import document_service
 from app.services.ml_service import ml_service
-from app.services.audit_service import audit_service
+from app.services.audit_service import audit_service, payload_hash
 from app.services.face_dedupe_service import face_dedupe_service
+from app.services.review_service import record_approval
+from app.services.ukn_service import assign_ukn
+from app.services.face_model_service import face_model_service
 from app.services.liveness_service import liveness_service
 from app.services.transaction_analysis_service import transaction_analysis_service
 from app.services.validation_service import validation_service
+from app.services.cache_service import cache_service, kyc_summary_key, user_kyc_id_key
+
+# Document types accepted by /documents/upload
+VALID_DOC_TYPES = frozenset({
+    "PASSPORT",
+    "DRIVERS_LICENSE",
+    "DRIVING_LICENSE",  # Alternative name
+    "NATIONAL_ID",
+    "AADHAAR",
+    "AADHAR",  # Alternative spelling
+    "PAN_CARD",
+    "UTILITY_BILL",
+    "BANK_STATEMENT",
+    "MARRIAGE_CERTIFICATE",
+    "INCOME_PROOF",
+    "EDUCATION_PROOF",
+    "MEDICAL_CERTIFICATE",
+    "ADDRESS_PROOF",
+    "IDENTITY_DOC",  # Generic identity document
+    "SELFIE"
+})
+
+# Response adapters for the ETag-tagged list endpoints
+_DOCUMENTS_ADAPTER = TypeAdapter(List[DocumentResponse])
+_CONSENTS_ADAPTER = TypeAdapter(List[ConsentResponse])
 
 router = APIRouter()
 
 
 def generate_tx_hash() -> str:
     """Generate a mock blockchain transaction hash"""
-    return f"0x{hashlib.sha256(str(datetime.now()).encode()).hexdigest()[:40]}"
+    return f"0x{secrets.token_hex(20)}"
+
+
+def _current_kyc_id(db: Session, user_id: str) -> Optional[str]:
+    """Id of the user's KYC application, cached since user_id is unique on kyc_applications"""
+    key = user_kyc_id_key(user_id)
+    kyc_id = cache_service.get(key)
+    if kyc_id is not None:
+        return kyc_id
+    
+    kyc_id = db.query(KYCApplication.id).filter(KYCApplication.user_id == user_id).scalar()
+    if kyc_id is not None:
+        # Not cached while missing, so a newly created application is picked up straight away
+        cache_service.set(key, kyc_id, settings.USER_KYC_ID_CACHE_TTL_SECONDS)
+    return kyc_id
 
 
 @router.post("/applications", response_model=KYCApplicationResponse)
-async def create_kyc_application(
-    current_user: User = Depends(get_current_active_user),
+def create_kyc_application(
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Create a new KYC application for the current user"""
@@ -57,18 +102,18 @@ async def create_kyc_application(
     db.commit()
     db.refresh(kyc_app)
     
-    return KYCApplicationResponse.from_orm(kyc_app)
+    return KYCApplicationResponse.model_validate(kyc_app)
 
 
 @router.get("/applications/me", response_model=KYCApplicationResponse)
-async def get_my_kyc_application(
-    current_user: User = Depends(get_current_active_user),
+def get_my_kyc_application(
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Get current user's KYC application"""
     kyc_app = db.query(KYCApplication).filter(
         KYCApplication.user_id == current_user.id
-    ).order_by(desc(KYCApplication.created_at)).first()
+    ).one_or_none()
     
     if not kyc_app:
         raise HTTPException(
@@ -77,20 +122,23 @@ async def get_my_kyc_application(
         )
     
     # Add user email
-    kyc_response = KYCApplicationResponse.from_orm(kyc_app)
+    kyc_response = KYCApplicationResponse.model_validate(kyc_app)
     kyc_response.user_email = current_user.email
     
     return kyc_response
 
 
 @router.post("/documents/upload")
-async def upload_document(
+def upload_document(
     file: UploadFile = File(...),
     doc_type: str = Form(...),
-    current_user: User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Upload a document for KYC verification"""
+    """
+    Upload a document for KYC verification
+    Plain def: OCR and liveness detection are blocking, so FastAPI runs this in its threadpool
+    """
     # Validate file type (images or videos for selfie)
     is_video = file.content_type.startswith('video/')
     is_image = file.content_type.startswith('image/')
@@ -109,34 +157,16 @@ async def upload_document(
         )
     
     # Validate document type
-    valid_types = [
-        "PASSPORT", 
-        "DRIVERS_LICENSE", 
-        "DRIVING_LICENSE",  # Alternative name
-        "NATIONAL_ID", 
-        "AADHAAR",
-        "AADHAR",  # Alternative spelling
-        "PAN_CARD",
-        "UTILITY_BILL",
-        "BANK_STATEMENT",
-        "MARRIAGE_CERTIFICATE",
-        "INCOME_PROOF",
-        "EDUCATION_PROOF",
-        "MEDICAL_CERTIFICATE",
-        "ADDRESS_PROOF",
-        "IDENTITY_DOC",  # Generic identity document
-        "SELFIE"
-    ]
-    if doc_type not in valid_types:
+    if doc_type not in VALID_DOC_TYPES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid document type. Must be one of: {', '.join(valid_types)}"
+            detail=f"Invalid document type. Must be one of: {', '.join(sorted(VALID_DOC_TYPES))}"
         )
     
     # Get or create KYC application
     kyc_app = db.query(KYCApplication).filter(
         KYCApplication.user_id == current_user.id
-    ).order_by(desc(KYCApplication.created_at)).first()
+    ).one_or_none()
     
     if not kyc_app:
         kyc_app = KYCApplication(user_id=current_user.id, status="REGISTERED")
@@ -144,28 +174,23 @@ async def upload_document(
         db.commit()
         db.refresh(kyc_app)
     
-    # Read file content
-    file_content = await file.read()
-    
     # Determine file extension
     file_ext = ".mp4" if is_video else ".jpg"
     filename = f"{doc_type.lower()}_{datetime.now().timestamp()}{file_ext}"
-    file_path, file_hash = document_service.save_uploaded_file(
-        file_content, filename, kyc_app.id
-    )
+    
+    # Stream the upload to disk (hashing as it goes)
+    file_path, file_hash = document_service.save_uploaded_file(file.file, filename, kyc_app.id)
+    abs_path = document_service.resolve_upload_path(file_path)
     
     # Extract data from document (OCR)
     extracted_data = {}
+    image_hash = None
     liveness_result = None
     transaction_analysis = None
     
     if doc_type == "SELFIE":
         # For selfie video, perform liveness detection and auto-capture
         if is_video:
-            abs_path = file_path.lstrip('/')
-            if not os.path.exists(abs_path):
-                abs_path = os.path.join("uploads", kyc_app.id, filename)
-            
             # Detect liveness from video
             liveness_result = liveness_service.detect_liveness_from_video(abs_path)
             
@@ -173,7 +198,7 @@ async def upload_document(
             captured_image_path = liveness_service.auto_capture_on_blink(abs_path)
             if captured_image_path:
                 # Update file_path to use captured image
-                file_path = captured_image_path
+                file_path = document_service.upload_url(kyc_app.id, os.path.basename(captured_image_path))
                 extracted_data['liveness_detected'] = liveness_result.get('is_live', False)
                 extracted_data['blink_count'] = liveness_result.get('blink_count', 0)
                 extracted_data['liveness_confidence'] = liveness_result.get('confidence', 0.0)
@@ -185,21 +210,16 @@ async def upload_document(
                 extracted_data['liveness_error'] = 'Could not auto-capture image'
         else:
             # For image selfie, check for blink in single image
-            abs_path = file_path.lstrip('/')
-            if not os.path.exists(abs_path):
-                abs_path = os.path.join("uploads", kyc_app.id, filename)
-            
             blink_result = liveness_service.detect_eye_blink(abs_path)
             extracted_data['liveness_detected'] = blink_result.get('blink_detected', False)
             extracted_data['eye_aspect_ratio'] = blink_result.get('eye_aspect_ratio', 0.0)
             extracted_data['liveness_confidence'] = blink_result.get('confidence', 0.0)
     else:
         # For non-selfie documents, perform OCR
-        abs_path = file_path.lstrip('/')
-        if not os.path.exists(abs_path):
-            abs_path = os.path.join("uploads", kyc_app.id, filename)
-        
-        extracted_data = document_service.extract_text_from_image(abs_path)
+        # Only byte-identical retries reuse an earlier result (cached by SHA-256); a near-identical
+        # image can be a corrected document or another month's statement on the same template
+        image_hash = document_service.compute_image_hash(abs_path) if is_image else None
+        extracted_data = document_service.extract_text_cached(abs_path, file_hash)
         
         # For transactional documents, analyze for malicious intent
         if doc_type in ["BANK_STATEMENT", "UTILITY_BILL"]:
@@ -238,13 +258,15 @@ async def upload_document(
             # User can still upload, but reviewer will see the mismatch
             pass
     
-    # Create document record
+    # Create document record (id assigned up front so events can reference it)
     document = Document(
+        id=generate_id(),
         kyc_id=kyc_app.id,
         doc_type=doc_type,
         file_path=file_path,
         file_hash=file_hash,
         extracted_data=extracted_data,
+        image_hash=image_hash,
         verified=is_valid  # Mark as verified only if validation passes
     )
     
@@ -262,6 +284,7 @@ async def upload_document(
     tx_hash = generate_tx_hash()
     verification_details = {
         "doc_type": doc_type,
+        "document_id": document.id,
         "filename": filename,
         "is_video": is_video
     }
@@ -274,9 +297,10 @@ async def upload_document(
     if liveness_result:
         verification_details['liveness'] = liveness_result
     
-    # Add transaction analysis if available
+    # Reference the transaction analysis (the full result is kept in the document's extracted_data)
     if transaction_analysis:
-        verification_details['transaction_analysis'] = transaction_analysis
+        verification_details['transaction_analysis_hash'] = payload_hash(transaction_analysis)
+        verification_details['is_suspicious'] = bool(transaction_analysis.get('is_suspicious'))
     
     verification = Verification(
         kyc_id=kyc_app.id,
@@ -301,22 +325,31 @@ async def upload_document(
         else:
             kyc_app.reviewer_comment += "\nLiveness check failed: No eye blink detected in video"
     
-    # Log to audit trail
+    # Log to audit trail (hashes only - the full results are on the document and verification rows)
     audit_service.log_event(
         db=db,
         entity_type="kyc_application",
         entity_id=kyc_app.id,
         event_type="document_upload",
-        details={"doc_type": doc_type, "file_hash": file_hash, "liveness": liveness_result, "transaction_analysis": transaction_analysis},
+        details={
+            "doc_type": doc_type,
+            "document_id": document.id,
+            "file_hash": file_hash,
+            "liveness_hash": payload_hash(liveness_result),
+            "transaction_analysis_hash": payload_hash(transaction_analysis)
+        },
         performed_by=current_user.id,
-        tx_hash=tx_hash
+        tx_hash=tx_hash,
+        commit=False
     )
     
     db.commit()
     db.refresh(document)
+    if kyc_app.ukn:
+        # Extracted details or status of an issued KYC may have changed
+        cache_service.delete(kyc_summary_key(kyc_app.ukn))
     
     # Create response with validation result
-    from app.schemas.kyc import DocumentResponse, ValidationResult
     response_dict = {
         "id": document.id,
         "kyc_id": document.kyc_id,
@@ -332,15 +365,35 @@ async def upload_document(
     return DocumentResponse(**response_dict)
 
 
-@router.post("/process")
-async def process_kyc_application(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    """Process KYC application (OCR, face matching, risk scoring)"""
-    kyc_app = db.query(KYCApplication).filter(
-        KYCApplication.user_id == current_user.id
-    ).order_by(desc(KYCApplication.created_at)).first()
+def _document_snapshot(doc: Document) -> Dict[str, Any]:
+    """Plain copy of the document fields the processing models need"""
+    return {
+        "id": doc.id,
+        "doc_type": doc.doc_type,
+        "file_hash": doc.file_hash,
+        "extracted_data": doc.extracted_data or {},
+        "path": document_service.resolve_upload_path(doc.file_path)
+    }
+
+
+def _flagged_only_for_liveness(documents: List[Document], liveness_passed: bool) -> bool:
+    """Whether a FLAGGED application's only flag is a failed selfie liveness check (not a suspicious transaction document)"""
+    return not liveness_passed and not any(
+        ((doc.extracted_data or {}).get('transaction_analysis') or {}).get('is_suspicious')
+        for doc in documents
+    )
+
+
+def _begin_processing(db: Session, user_id: str) -> Dict[str, Any]:
+    """
+    Phase 1: load the latest application, mark it PROCESSING and commit
+    Returns a plain snapshot, so the models can run without touching the session
+    """
+    kyc_app = db.query(KYCApplication).options(
+        selectinload(KYCApplication.documents)
+    ).filter(
+        KYCApplication.user_id == user_id
+    ).one_or_none()
     
     if not kyc_app:
         raise HTTPException(
@@ -348,246 +401,138 @@ async def process_kyc_application(
             detail="No KYC application found"
         )
     
-    if kyc_app.status not in ["UPLOADED", "DRAFT", "REGISTERED"]:
+    # Get documents (loaded with the application)
+    documents = kyc_app.documents
+    
+    # Find identity document (non-selfie) and selfie
+    id_doc = next((d for d in documents if d.doc_type != "SELFIE"), None)
+    selfie = next((d for d in documents if d.doc_type == "SELFIE"), None)
+    
+    # A selfie that failed liveness goes to manual review, so face inference would be wasted on it
+    liveness_passed = selfie is None or (selfie.extracted_data or {}).get('liveness_detected', True)
+    
+    # Upload flags a failed liveness check as FLAGGED; processing routes it to IN_REVIEW
+    if kyc_app.status not in ["UPLOADED", "DRAFT", "REGISTERED"] and not (
+        kyc_app.status == "FLAGGED" and _flagged_only_for_liveness(documents, liveness_passed)
+    ):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Application already processed or in review"
         )
     
-    # Get documents
-    documents = db.query(Document).filter(Document.kyc_id == kyc_app.id).all()
-    
     if not documents:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No documents uploaded"
         )
     
-    # Validate user details against extracted document data
-    from app.services.validation_service import validation_service
+    id_snapshot = _document_snapshot(id_doc) if id_doc else None
+    job = {
+        "kyc_id": kyc_app.id,
+        "previous_status": kyc_app.status,
+        "user_details": kyc_app.user_details or {},
+        "id_doc": id_snapshot,
+        "selfie_path": document_service.resolve_upload_path(selfie.file_path) if selfie else None,
+        "liveness_passed": liveness_passed,
+        # Risk features come from the ID document (same dict, so re-extracted data is seen), else the first upload
+        "risk_doc": id_snapshot or _document_snapshot(documents[0]),
+        "document_hashes": {doc.doc_type: doc.file_hash for doc in documents}
+    }
     
-    user_details = kyc_app.user_details or {}
-    validation_errors = []
+    # Committing releases the connection back to the pool while the models run
+    kyc_app.status = "PROCESSING"
+    db.commit()
     
-    # Find identity document (non-selfie) for validation
-    id_doc = next((d for d in documents if d.doc_type != "SELFIE"), None)
+    return job
+
+
+def _run_processing_models(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Phase 2: OCR, validation, face matching and risk scoring - no database access"""
+    results = {
+        "extracted_data": None,
+        "rejection_reasons": None,
+        "face_match_score": None,
+        "face_embedding_hash": None,
+        "dedupe_matches": [],
+        "risk_score": 0.5,
+        "shap_features": None,
+        "feature_vector": None
+    }
     
+    id_doc = job["id_doc"]
+    user_details = job["user_details"]
+    
+    # Validate user details against extracted document data
     if id_doc and user_details:
-        # Re-extract data if not already extracted or empty
-        extracted_data = id_doc.extracted_data or {}
-        if not extracted_data or len(extracted_data) == 0:
-            id_path = id_doc.file_path.lstrip('/')
-            if not os.path.exists(id_path):
-                id_path = os.path.join("uploads", kyc_app.id, os.path.basename(id_doc.file_path))
-            
-            # Extract data using OCR
-            extracted_data = document_service.extract_text_from_image(id_path)
-            id_doc.extracted_data = extracted_data
-            db.commit()
+        # Re-extract data only if upload-time extraction came back empty
+        if not id_doc["extracted_data"]:
+            id_doc["extracted_data"] = document_service.extract_text_cached(id_doc["path"], id_doc["file_hash"])
+            results["extracted_data"] = id_doc["extracted_data"]
         
-        # Validate user details against extracted data
         is_valid, rejection_reasons = validation_service.validate_user_details(
             user_details=user_details,
-            extracted_data=extracted_data,
-            doc_type=id_doc.doc_type
+            extracted_data=id_doc["extracted_data"],
+            doc_type=id_doc["doc_type"]
         )
         
         if not is_valid:
-            # Reject application immediately
-            kyc_app.status = "REJECTED"
-            kyc_app.reviewer_comment = "Application rejected: Details do not match uploaded documents.\n\nReasons:\n" + "\n".join(f"- {reason}" for reason in rejection_reasons)
-            db.commit()
-            
-            # Log rejection
-            tx_hash = generate_tx_hash()
-            verification = Verification(
-                kyc_id=kyc_app.id,
-                event_type="rejection",
-                details={
-                    "reason": "details_mismatch",
-                    "rejection_reasons": rejection_reasons,
-                    "user_details": user_details,
-                    "extracted_data": id_doc.extracted_data
-                },
-                performed_by="system",
-                tx_hash=tx_hash
-            )
-            db.add(verification)
-            db.commit()
-            
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail={
-                    "message": "Application rejected: Details do not match uploaded documents",
-                    "reasons": rejection_reasons
-                }
-            )
-    
-    # Find selfie and ID document
-    selfie = next((d for d in documents if d.doc_type == "SELFIE"), None)
-    
-    kyc_app.status = "PROCESSING"
-    db.commit()
+            # Rejected - skip the remaining models
+            results["rejection_reasons"] = rejection_reasons
+            return results
     
     # Perform face matching and deduplication if both selfie and ID are available
-    face_match_score = None
-    face_embedding_hash = None
-    duplicate_ukn = None
-    
-    if selfie and id_doc:
+    selfie_path = job["selfie_path"]
+    if selfie_path and id_doc and job["liveness_passed"]:
         try:
-            # Get absolute paths
-            selfie_path = selfie.file_path.lstrip('/')
-            id_path = id_doc.file_path.lstrip('/')
-            
-            if not os.path.exists(selfie_path):
-                selfie_path = os.path.join("uploads", kyc_app.id, os.path.basename(selfie.file_path))
-            if not os.path.exists(id_path):
-                id_path = os.path.join("uploads", kyc_app.id, os.path.basename(id_doc.file_path))
-            
             # Calculate face match between ID and selfie (using InsightFace if available)
-            face_match_score = document_service.calculate_face_match(
-                id_path, selfie_path, use_insightface=True
+            results["face_match_score"] = document_service.calculate_face_match(
+                id_doc["path"], selfie_path, use_insightface=True
             )
-            kyc_app.face_match_score = face_match_score
             
             # Extract face embedding from selfie for deduplication (prefer InsightFace, fallback to DeepFace)
             try:
-                import numpy as np
-                embedding = None
+                face_embedding = face_model_service.get_embedding(selfie_path)  # numpy vector or None
                 
-                # Try InsightFace first
-                try:
-                    from insightface import app as insightface_app
-                    model_path = 'buffalo_l'
-                    model = insightface_app.FaceAnalysis(name=model_path, providers=['CPUExecutionProvider'])
-                    model.prepare(ctx_id=-1, det_size=(640, 640))
-                    
-                    faces = model.get(selfie_path)
-                    if faces and len(faces) > 0:
-                        embedding = faces[0].embedding
-                except:
-                    # Fallback to DeepFace
-                    from deepface import DeepFace
-                    embedding_obj = DeepFace.represent(
-                        img_path=selfie_path,
-                        model_name='VGG-Face',
-                        detector_backend='opencv',
-                        enforce_detection=True
-                    )
-                    
-                    if embedding_obj and len(embedding_obj) > 0:
-                        embedding = np.array(embedding_obj[0]['embedding'])
-                
-                if embedding is not None:
-                    # Generate embedding hash
-                    face_embedding = np.array(embedding) if not isinstance(embedding, np.ndarray) else embedding
-                    face_embedding_hash = face_dedupe_service.generate_embedding_hash(face_embedding)
-                    kyc_app.face_embedding_hash = face_embedding_hash
+                if face_embedding is not None:
+                    results["face_embedding_hash"] = face_dedupe_service.generate_embedding_hash(face_embedding)
                     
                     # Store embedding for deduplication check
-                    face_dedupe_service.store_embedding(kyc_app.id, face_embedding)
+                    face_dedupe_service.store_embedding(job["kyc_id"], face_embedding)
                     
-                    # Check for duplicates - get all verified KYC applications with embeddings
-                    verified_apps = db.query(KYCApplication).filter(
-                        KYCApplication.status == "VERIFIED",
-                        KYCApplication.face_embedding_hash.isnot(None),
-                        KYCApplication.ukn.isnot(None),
-                        KYCApplication.id != kyc_app.id  # Exclude current application
-                    ).all()
-                    
-                    if verified_apps:
-                        # Check against existing embeddings using face_dedupe_service
-                        existing_ukns = [app.ukn for app in verified_apps if app.ukn]
-                        existing_embeddings = []
-                        
-                        for app in verified_apps:
-                            # Get stored embedding from face_dedupe_service
-                            stored_embedding = face_dedupe_service.get_embedding(app.ukn or app.id)
-                            if stored_embedding is not None:
-                                existing_embeddings.append(stored_embedding)
-                        
-                        # Check for duplicates using face_dedupe_service
-                        if existing_embeddings:
-                            is_duplicate, matched_ukn, similarity = face_dedupe_service.check_duplicate(
-                                new_embedding=face_embedding,
-                                existing_ukns=existing_ukns,
-                                existing_embeddings=existing_embeddings
-                            )
-                            
-                            if is_duplicate:
-                                duplicate_ukn = matched_ukn
-                    
-                    # Log face embedding extraction
-                    tx_hash = generate_tx_hash()
-                    verification = Verification(
-                        kyc_id=kyc_app.id,
-                        event_type="face_embedding_extracted",
-                        details={
-                            "embedding_hash": face_embedding_hash,
-                            "duplicate_check": duplicate_ukn is not None,
-                            "duplicate_ukn": duplicate_ukn
-                        },
-                        performed_by="system",
-                        tx_hash=tx_hash
+                    # Every stored face above the threshold, not a fixed top-k: the index also holds
+                    # unverified applications, which must not crowd out a verified match.
+                    # Whether a match belongs to a verified UKN is checked when persisting
+                    results["dedupe_matches"] = face_dedupe_service.search_similar(
+                        face_embedding,
+                        k=None,
+                        exclude=[job["kyc_id"]],  # Exclude current application
+                        min_similarity=face_dedupe_service.similarity_threshold
                     )
-                    db.add(verification)
-                    
             except Exception as e:
                 print(f"Face embedding extraction error: {e}")
-            
-            # Log face match event
-            tx_hash = generate_tx_hash()
-            verification = Verification(
-                kyc_id=kyc_app.id,
-                event_type="face_match",
-                details={"confidence": face_match_score, "threshold": 0.8},
-                performed_by="system",
-                tx_hash=tx_hash
-            )
-            db.add(verification)
-            
-            audit_service.log_event(
-                db=db,
-                entity_type="kyc_application",
-                entity_id=kyc_app.id,
-                event_type="face_match",
-                details={"confidence": face_match_score},
-                performed_by="system",
-                tx_hash=tx_hash
-            )
-            
-            # If duplicate found, set status to flag for review
-            if duplicate_ukn:
-                kyc_app.reviewer_comment = f"Potential duplicate detected. Existing UKN: {duplicate_ukn}"
         except Exception as e:
             print(f"Face matching error: {e}")
     
     # Calculate risk score using ML model
     try:
-        # Extract features for ML model
-        doc = id_doc if id_doc else documents[0]
+        doc = job["risk_doc"]
         
         # Get image quality
-        doc_path = doc.file_path.lstrip('/')
-        if not os.path.exists(doc_path):
-            doc_path = os.path.join("uploads", kyc_app.id, os.path.basename(doc.file_path))
-        
-        id_quality = document_service.calculate_image_quality(doc_path)
+        id_quality = document_service.calculate_image_quality(doc["path"])
         
         # Prepare features for ML model
+        face_match_score = results["face_match_score"]
         face_match_conf = face_match_score if face_match_score else 0.85
         doc_age_years = 1.5  # Default (could be calculated from expiry date)
         address_verification = 0.5  # Default (could be enhanced with address API)
         transaction_history_risk = 0.2  # Default
         doc_type_risk = {"PASSPORT": 0.1, "DRIVERS_LICENSE": 0.3, "NATIONAL_ID": 0.5}.get(
-            doc.doc_type, 0.3
+            doc["doc_type"], 0.3
         )
-        extraction_confidence = 0.9 if doc.extracted_data else 0.7
+        extraction_confidence = 0.9 if doc["extracted_data"] else 0.7
         name_match_score = 0.9  # Default
         
-        # Calculate risk score with SHAP
-        risk_score, shap_features = ml_service.calculate_risk_score(
+        features = dict(
             face_match_confidence=face_match_conf,
             document_age_years=doc_age_years,
             address_verification_score=address_verification,
@@ -598,33 +543,158 @@ async def process_kyc_application(
             name_match_score=name_match_score
         )
         
-        kyc_app.risk_score = risk_score
-        
-        # Store SHAP explanation (convert to dict for storage)
-        # For now, we'll store it in a computed property or fetch separately
-        # This would typically be stored in a separate table or JSON field
+        # Calculate risk score with SHAP
+        results["risk_score"], results["shap_features"] = ml_service.calculate_risk_score(**features)
         
+        # Model inputs in feature order, so /shap can explain this score without rebuilding them
+        results["feature_vector"] = [float(features[name]) for name in ml_service.feature_names]
     except Exception as e:
         print(f"Risk scoring error: {e}")
-        risk_score = 0.5  # Default risk score
+        results["risk_score"] = 0.5  # Default risk score
+    
+    return results
+
+
+def _persist_processing_results(
+    db: Session,
+    job: Dict[str, Any],
+    results: Dict[str, Any]
+) -> Tuple[KYCApplication, Optional[Dict[str, Any]]]:
+    """
+    Phase 3: write the model results and the next status in a single commit
+    Returns the application and the auto-approval record arguments (or None)
+    """
+    kyc_app = db.query(KYCApplication).filter(KYCApplication.id == job["kyc_id"]).first()
+    id_doc = job["id_doc"]
+    user_details = job["user_details"]
+    
+    if results["extracted_data"] is not None:
+        db.query(Document).filter(Document.id == id_doc["id"]).update(
+            {Document.extracted_data: results["extracted_data"]}, synchronize_session=False
+        )
+    
+    rejection_reasons = results["rejection_reasons"]
+    if rejection_reasons is not None:
+        # Reject application immediately
+        kyc_app.status = "REJECTED"
+        kyc_app.reviewer_comment = "Application rejected: Details do not match uploaded documents.\n\nReasons:\n" + "\n".join(f"- {reason}" for reason in rejection_reasons)
+        
+        # Log rejection
+        tx_hash = generate_tx_hash()
+        verification = Verification(
+            kyc_id=kyc_app.id,
+            event_type="rejection",
+            details={
+                "reason": "details_mismatch",
+                "rejection_reasons": rejection_reasons,
+                "user_details": user_details,
+                "document_id": id_doc["id"],
+                "extracted_data_hash": payload_hash(id_doc["extracted_data"])
+            },
+            performed_by="system",
+            tx_hash=tx_hash
+        )
+        db.add(verification)
+        db.commit()
+        
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "message": "Application rejected: Details do not match uploaded documents",
+                "reasons": rejection_reasons
+            }
+        )
+    
+    face_match_score = results["face_match_score"]
+    face_embedding_hash = results["face_embedding_hash"]
+    risk_score = results["risk_score"]
+    duplicate_ukn = None
+    
+    if face_match_score is not None:
+        kyc_app.face_match_score = face_match_score
+        
+        if face_embedding_hash:
+            kyc_app.face_embedding_hash = face_embedding_hash
+            
+            # Keep the nearest faces that belong to a verified UKN
+            matches = results["dedupe_matches"]
+            if matches:
+                verified_ukns = dict(
+                    db.query(KYCApplication.id, KYCApplication.ukn).filter(
+                        KYCApplication.id.in_([key for key, _ in matches]),
+                        KYCApplication.status == "VERIFIED",
+                        KYCApplication.ukn.isnot(None)
+                    ).all()
+                )
+                duplicate_ukn = next(
+                    (verified_ukns[key] for key, _ in matches if key in verified_ukns), None
+                )
+            
+            # Log face embedding extraction
+            tx_hash = generate_tx_hash()
+            verification = Verification(
+                kyc_id=kyc_app.id,
+                event_type="face_embedding_extracted",
+                details={
+                    "embedding_hash": face_embedding_hash,
+                    "duplicate_check": duplicate_ukn is not None,
+                    "duplicate_ukn": duplicate_ukn
+                },
+                performed_by="system",
+                tx_hash=tx_hash
+            )
+            db.add(verification)
+        
+        # Log face match event
+        tx_hash = generate_tx_hash()
+        verification = Verification(
+            kyc_id=kyc_app.id,
+            event_type="face_match",
+            details={"confidence": face_match_score, "threshold": 0.8},
+            performed_by="system",
+            tx_hash=tx_hash
+        )
+        db.add(verification)
+        
+        audit_service.log_event(
+            db=db,
+            entity_type="kyc_application",
+            entity_id=kyc_app.id,
+            event_type="face_match",
+            details={"confidence": face_match_score},
+            performed_by="system",
+            tx_hash=tx_hash,
+            commit=False
+        )
+        
+        # If duplicate found, set status to flag for review
+        if duplicate_ukn:
+            kyc_app.reviewer_comment = f"Potential duplicate detected. Existing UKN: {duplicate_ukn}"
+            kyc_app.flagged_duplicate = True
+    
+    kyc_app.risk_score = risk_score
+    kyc_app.feature_vector = results["feature_vector"]
+    shap_features = results["shap_features"]
+    kyc_app.shap_explanation = [feature.model_dump() for feature in shap_features] if shap_features else None
     
     # Determine next status based on risk score and duplicate check
     # Auto-approve very low risk applications (< 30%)
+    auto_approval = None
     if duplicate_ukn:
         # Flag for manual review if duplicate detected
         kyc_app.status = "IN_REVIEW"
+    elif not job["liveness_passed"]:
+        # Never auto-approve without a live selfie (face matching was skipped)
+        kyc_app.status = "IN_REVIEW"
+        # Keep earlier upload comments (e.g. the transaction document flag) for the reviewer
+        if not kyc_app.reviewer_comment:
+            kyc_app.reviewer_comment = "Liveness check failed: face matching skipped, manual review required"
+        else:
+            kyc_app.reviewer_comment += "\nLiveness check failed: face matching skipped, manual review required"
     elif risk_score < 0.3:
         # Very low risk - AUTO-APPROVE and issue UKN immediately
-        from app.services.ukn_service import generate_ukn
-        from app.services.blockchain_service import blockchain_service
-        from datetime import timedelta
-        
-        # Generate UKN
-        ukn = generate_ukn()
-        # Ensure uniqueness
-        while db.query(KYCApplication).filter(KYCApplication.ukn == ukn).first():
-            ukn = generate_ukn()
-        kyc_app.ukn = ukn
+        # Issue UKN (retried on the unique index in the unlikely event of a collision)
+        ukn = assign_ukn(db, kyc_app)
         
         # Update status to VERIFIED
         kyc_app.status = "VERIFIED"
@@ -632,11 +702,6 @@ async def process_kyc_application(
         kyc_app.expires_at = datetime.now() + timedelta(days=365)  # 1 year validity
         kyc_app.reviewer_comment = "Auto-approved: Low risk score"
         
-        # Create blockchain record
-        document_hashes = {}
-        for doc in kyc_app.documents:
-            document_hashes[doc.doc_type] = doc.file_hash
-        
         verification_data = {
             "risk_score": risk_score,
             "face_match_score": face_match_score,
@@ -645,46 +710,16 @@ async def process_kyc_application(
             "auto_approved": True
         }
         
-        blockchain_record = blockchain_service.create_block(
+        # Block, verification and audit records are written after the response is sent
+        auto_approval = dict(
+            kyc_id=kyc_app.id,
             ukn=ukn,
-            document_hashes=document_hashes,
+            document_hashes=job["document_hashes"],
             face_embedding_hash=kyc_app.face_embedding_hash or "",
             verification_data=verification_data,
-            issuer="system"
-        )
-        
-        kyc_app.blockchain_tx_hash = blockchain_record["tx_hash"]
-        
-        # Create verification record
-        verification = Verification(
-            kyc_id=kyc_app.id,
-            event_type="auto_verification",
-            details={
-                "reviewer_id": "system",
-                "comment": "Auto-approved: Low risk score",
-                "ukn": ukn,
-                "blockchain_tx_hash": blockchain_record["tx_hash"],
-                "risk_score": risk_score
-            },
-            performed_by="system",
-            tx_hash=blockchain_record["tx_hash"]
-        )
-        db.add(verification)
-        
-        # Log to audit trail
-        audit_service.log_event(
-            db=db,
-            entity_type="kyc_application",
-            entity_id=kyc_app.id,
-            event_type="auto_verification",
-            details={
-                "reviewer_id": "system",
-                "risk_score": risk_score,
-                "ukn": ukn,
-                "blockchain_tx_hash": blockchain_record["tx_hash"]
-            },
-            performed_by="system",
-            tx_hash=blockchain_record["tx_hash"]
+            reviewer_id="system",
+            comment=kyc_app.reviewer_comment,
+            event_type="auto_verification"
         )
         
         print(f"Auto-approved application {kyc_app.id} with UKN {ukn} (risk score: {risk_score})")
@@ -715,22 +750,57 @@ async def process_kyc_application(
     db.commit()
     db.refresh(kyc_app)
     
+    return kyc_app, auto_approval
+
+
+@router.post("/process")
+def process_kyc_application(
+    background_tasks: BackgroundTasks,
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Process KYC application (OCR, face matching, risk scoring)
+    Plain def: the ML work is blocking, so FastAPI runs this in its threadpool
+    The session only holds a connection while reading and writing, not during inference
+    """
+    job = _begin_processing(db, current_user.id)
+    
+    try:
+        results = _run_processing_models(job)
+    except Exception:
+        # Put the application back so it can be processed again
+        db.query(KYCApplication).filter(KYCApplication.id == job["kyc_id"]).update(
+            {KYCApplication.status: job["previous_status"]}, synchronize_session=False
+        )
+        db.commit()
+        raise
+    
+    kyc_app, auto_approval = _persist_processing_results(db, job, results)
+    
+    if auto_approval:
+        background_tasks.add_task(record_approval, **auto_approval)
+    
     # Return response with SHAP explanation
-    response = KYCApplicationResponse.from_orm(kyc_app)
+    response = KYCApplicationResponse.model_validate(kyc_app)
     response.user_email = current_user.email
-    response.shap_explanation = shap_features if 'shap_features' in locals() else None
+    response.shap_explanation = results["shap_features"]
     
     return response
 
 
 @router.get("/applications/{application_id}", response_model=KYCApplicationResponse)
-async def get_kyc_application(
+def get_kyc_application(
     application_id: str,
-    current_user: User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Get KYC application by ID"""
-    kyc_app = db.query(KYCApplication).filter(
+    kyc_app = db.query(KYCApplication).options(
+        joinedload(KYCApplication.user).load_only(User.email),
+        selectinload(KYCApplication.documents),
+        selectinload(KYCApplication.verifications)
+    ).filter(
         KYCApplication.id == application_id
     ).first()
     
@@ -747,7 +817,7 @@ async def get_kyc_application(
             detail="Not authorized to view this application"
         )
     
-    response = KYCApplicationResponse.from_orm(kyc_app)
+    response = KYCApplicationResponse.model_validate(kyc_app)
     if kyc_app.user:
         response.user_email = kyc_app.user.email
     
@@ -755,128 +825,116 @@ async def get_kyc_application(
 
 
 @router.get("/documents", response_model=List[DocumentResponse])
-async def get_my_documents(
-    current_user: User = Depends(get_current_active_user),
+def get_my_documents(
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Get all documents for current user's KYC application"""
-    kyc_app = db.query(KYCApplication).filter(
-        KYCApplication.user_id == current_user.id
-    ).order_by(desc(KYCApplication.created_at)).first()
+    kyc_id = _current_kyc_id(db, current_user.id)
     
-    if not kyc_app:
+    if not kyc_id:
         return []
     
-    documents = db.query(Document).filter(Document.kyc_id == kyc_app.id).all()
+    # Plain rows named as DocumentResponse fields - no ORM instances for a read-only list
+    documents = db.execute(
+        select(
+            Document.id,
+            Document.kyc_id,
+            Document.doc_type,
+            Document.file_path,
+            Document.file_hash,
+            Document.extracted_data,
+            Document.verified,
+            Document.uploaded_at
+        ).where(
+            Document.kyc_id == kyc_id
+        )
+    ).mappings().all()
     
-    return [DocumentResponse.from_orm(doc) for doc in documents]
+    # Serialized once; an unchanged list is answered with 304
+    return etag_json_response(request, _DOCUMENTS_ADAPTER, documents)
 
 
-@router.get("/consents", response_model=List[dict])
-async def get_my_consents(
-    current_user: User = Depends(get_current_active_user),
+@router.get("/consents", response_model=List[ConsentResponse])
+def get_my_consents(
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Get all consent records for current user's KYC"""
-    kyc_app = db.query(KYCApplication).filter(
-        KYCApplication.user_id == current_user.id
-    ).order_by(desc(KYCApplication.created_at)).first()
+    kyc_id = _current_kyc_id(db, current_user.id)
     
-    if not kyc_app:
+    if not kyc_id:
         return []
     
-    from app.db.models import ConsentRecord
-    consents = db.query(ConsentRecord).filter(
-        ConsentRecord.kyc_id == kyc_app.id
-    ).all()
-    
-    # Get institution names
-    result = []
-    for consent in consents:
-        institution = db.query(User).filter(User.id == consent.institution_id).first()
-        result.append({
-            "id": consent.id,
-            "institution_id": consent.institution_id,
-            "institution_name": institution.email if institution else "Unknown",
-            "purpose": consent.purpose,
-            "consent_given": consent.consent_given,
-            "accessed_at": consent.accessed_at.isoformat() if consent.accessed_at else None,
-            "expires_at": consent.expires_at.isoformat() if consent.expires_at else None,
-            "created_at": consent.created_at.isoformat() if consent.created_at else None
-        })
-    
-    return result
-
-
-@router.post("/consents/{consent_id}/grant")
-async def grant_consent(
-    consent_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    """User grants consent to an institution"""
-    from app.db.models import ConsentRecord
-    
-    kyc_app = db.query(KYCApplication).filter(
-        KYCApplication.user_id == current_user.id
-    ).order_by(desc(KYCApplication.created_at)).first()
-    
-    if not kyc_app:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="No KYC application found"
+    # Institution names are stored on the consents, so this reads one table; columns are named as ConsentResponse fields
+    consents = db.execute(
+        select(
+            ConsentRecord.id,
+            ConsentRecord.institution_id,
+            func.coalesce(ConsentRecord.institution_email, "Unknown").label("institution_name"),
+            ConsentRecord.purpose,
+            ConsentRecord.consent_given,
+            ConsentRecord.accessed_at,
+            ConsentRecord.expires_at,
+            ConsentRecord.created_at
+        ).where(
+            ConsentRecord.kyc_id == kyc_id
         )
+    ).mappings().all()
     
-    consent = db.query(ConsentRecord).filter(
-        ConsentRecord.id == consent_id,
-        ConsentRecord.kyc_id == kyc_app.id
-    ).first()
+    # Serialized once; an unchanged list is answered with 304
+    return etag_json_response(request, _CONSENTS_ADAPTER, consents)
+
+
+def _update_own_consent(db: Session, consent_id: str, user_id: str, values: Dict[str, Any]) -> str:
+    """Update a consent on the user's KYC application in one UPDATE ... RETURNING, 404 if none matches"""
+    
+    updated_id = db.execute(
+        update(ConsentRecord).where(
+            ConsentRecord.id == consent_id,
+            ConsentRecord.kyc_id.in_(
+                select(KYCApplication.id).where(KYCApplication.user_id == user_id)
+            )
+        ).values(**values).returning(ConsentRecord.id)
+    ).scalar_one_or_none()
     
-    if not consent:
+    if updated_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Consent record not found"
         )
     
-    consent.consent_given = True
-    consent.accessed_at = datetime.utcnow()
     db.commit()
+    return updated_id
+
+
+@router.post("/consents/{consent_id}/grant")
+def grant_consent(
+    consent_id: str,
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """User grants consent to an institution"""
+    consent_id = _update_own_consent(
+        db, consent_id, current_user.id,
+        {"consent_given": True, "accessed_at": datetime.utcnow()}
+    )
     
-    return {"message": "Consent granted successfully", "consent_id": consent.id}
+    return {"message": "Consent granted successfully", "consent_id": consent_id}
 
 
 @router.post("/consents/{consent_id}/revoke")
-async def revoke_consent(
+def revoke_consent(
     consent_id: str,
-    current_user: User = Depends(get_current_active_user),
+    current_user: CurrentUser = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """User revokes consent from an institution"""
-    from app.db.models import ConsentRecord
-    
-    kyc_app = db.query(KYCApplication).filter(
-        KYCApplication.user_id == current_user.id
-    ).order_by(desc(KYCApplication.created_at)).first()
-    
-    if not kyc_app:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="No KYC application found"
-        )
-    
-    consent = db.query(ConsentRecord).filter(
-        ConsentRecord.id == consent_id,
-        ConsentRecord.kyc_id == kyc_app.id
-    ).first()
-    
-    if not consent:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Consent record not found"
-        )
-    
-    consent.consent_given = False
-    consent.expires_at = datetime.utcnow()  # Immediately expire
-    db.commit()
+    consent_id = _update_own_consent(
+        db, consent_id, current_user.id,
+        {"consent_given": False, "expires_at": datetime.utcnow()}  # Immediately expire
+    )
     
-    return {"message": "Consent revoked successfully", "consent_id": consent.id}
+    return {"message": "Consent revoked successfully", "consent_id": consent_id}
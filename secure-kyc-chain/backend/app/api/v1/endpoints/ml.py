@@ -1,20 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from typing import List
+import numpy as np
 
 from app.db.database import get_db
-from app.db.models import User, KYCApplication
+from app.db.models import KYCApplication
 from app.schemas.kyc import ShapFeature
-from app.core.security import require_role
+from app.core.http_cache import etag_json_response
+from app.core.security import CurrentUser, require_role
 from app.services.ml_service import ml_service
 
+_SHAP_ADAPTER = TypeAdapter(List[ShapFeature])
+
 router = APIRouter()
 
 
 @router.get("/applications/{application_id}/shap", response_model=List[ShapFeature])
-async def get_shap_explanation(
+def get_shap_explanation(
     application_id: str,
-    current_user: User = Depends(require_role(["admin", "reviewer"])),
+    request: Request,
+    current_user: CurrentUser = Depends(require_role(["admin", "reviewer"])),
     db: Session = Depends(get_db)
 ):
     """Get SHAP explanation for a KYC application's risk score"""
@@ -34,23 +40,28 @@ async def get_shap_explanation(
             detail="Risk score not calculated for this application"
         )
     
-    # Recalculate SHAP explanation
-    # In production, you'd store feature values and recalculate or store SHAP values
-    # For now, we'll use default feature values
+    # Stored when the application was scored
+    if kyc_app.shap_explanation is not None:
+        return etag_json_response(request, _SHAP_ADAPTER, kyc_app.shap_explanation)
+    
     try:
-        # This is a simplified version - in production, store actual feature values
-        risk_score, shap_features = ml_service.calculate_risk_score(
-            face_match_confidence=kyc_app.face_match_score or 0.85,
-            document_age_years=1.5,
-            address_verification_score=0.5,
-            transaction_history_risk=0.2,
-            id_quality_score=0.9,
-            document_type_risk=0.3,
-            extraction_confidence=0.9,
-            name_match_score=0.9
-        )
+        if kyc_app.feature_vector:
+            # Inputs stored when the application was scored
+            features = np.asarray(kyc_app.feature_vector, dtype=np.float64).reshape(1, -1)
+        else:
+            # Scored before feature vectors were stored - fall back to default feature values
+            features = ml_service.build_feature_vector(
+                face_match_confidence=kyc_app.face_match_score or 0.85,
+                document_age_years=1.5,
+                address_verification_score=0.5,
+                transaction_history_risk=0.2,
+                id_quality_score=0.9,
+                document_type_risk=0.3,
+                extraction_confidence=0.9,
+                name_match_score=0.9
+            )
         
-        return shap_features
+        return etag_json_response(request, _SHAP_ADAPTER, ml_service.explain(features))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
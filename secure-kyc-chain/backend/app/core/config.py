@@ -1,22 +1,39 @@
+from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import Optional, Tuple
 
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./kyc.db"
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 3600  # seconds
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_USE_NULL_POOL: bool = False  # Set when fronted by PgBouncer
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-this-in-production-use-random-string"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    BCRYPT_ROUNDS: int = 12  # Lower (min 4) only in test environments
+    
+    # Cache (falls back to an in-process cache when unset)
+    REDIS_URL: Optional[str] = None
+    LOCAL_CACHE_MAX_ENTRIES: int = 10000  # In-process fallback: least recently used entries are evicted
+    METRICS_CACHE_TTL_SECONDS: int = 30
+    USER_CACHE_TTL_SECONDS: int = 60  # Authenticated user lookups, per token, when cached in Redis
+    USER_CACHE_LOCAL_TTL_SECONDS: int = 5  # Same, in-process fallback: invalidation cannot reach other workers, so a deleted or demoted user keeps access there this long
+    KYC_SUMMARY_CACHE_TTL_SECONDS: int = 300  # Institution UKN lookups (capped at KYC expiry)
+    USER_KYC_ID_CACHE_TTL_SECONDS: int = 300  # Current user's KYC application id
+    OCR_CACHE_TTL_SECONDS: int = 86400  # OCR results by file hash (file content never changes)
     
     # File Upload
     UPLOAD_DIR: str = "./uploads"
     MAX_FILE_SIZE: int = 10485760  # 10MB
     
     # CORS
-    CORS_ORIGINS: List[str] = [
+    CORS_ORIGINS: Tuple[str, ...] = (
         "http://localhost:5173", 
         "http://localhost:3000", 
         "http://localhost:8080",
@@ -25,7 +42,7 @@ class Settings(BaseSettings):
         "http://127.0.0.1:3000",
         "http://localhost:8000",  # Allow same origin
         "http://127.0.0.1:8000"   # Allow same origin
-    ]
+    )
     
     # Pydantic v2 configuration
     model_config = SettingsConfigDict(
@@ -34,5 +51,11 @@ class Settings(BaseSettings):
     )
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Parse the environment once per process"""
+    return Settings()
+
+
+settings = get_settings()
 
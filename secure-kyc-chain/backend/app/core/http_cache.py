@@ -0,0 +1,30 @@
+"""ETag / If-None-Match support for idempotent GET endpoints"""
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header lists this ETag (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def etag_json_response(request: Request, adapter: TypeAdapter, data: Any) -> Response:
+    """
+    Serialize data with its response adapter and tag it with a hash of the body
+    Returns 304 Not Modified (no body) when the client already holds this version
+    """
+    body = adapter.dump_json(adapter.validate_python(data))
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    # Clients may reuse the body, but must revalidate it on every request
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -9,8 +10,13 @@ from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.db.database import get_db
 from app.db.models import User
+from app.services.cache_service import cache_service
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
@@ -32,27 +38,65 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
-def verify_token(token: str, credentials_exception):
-    """Verify and decode a JWT token"""
+def _decode_token(token: str, credentials_exception) -> dict:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        return email
     except JWTError:
         raise credentials_exception
+    if payload.get("sub") is None:
+        raise credentials_exception
+    return payload
+
+
+def verify_token(token: str, credentials_exception):
+    """Verify and decode a JWT token"""
+    return _decode_token(token, credentials_exception)["sub"]
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    The authenticated user as seen by handlers: plain values, not a session-bound User row
+    Handlers query User by id when they need other columns or an ORM instance
+    """
+    id: str
+    email: str
+    phone: Optional[str]
+    role: str
+    created_at: Optional[datetime]
+
+
+def _user_cache_prefix(email: str) -> str:
+    return f"user:{email}:"
 
 
-async def get_current_user(
+def _user_cache_key(payload: dict) -> str:
+    # Per token, so a newly issued token never reads a principal cached for an older one
+    return f"{_user_cache_prefix(payload['sub'])}{payload.get('iat', '')}"
+
+
+def _user_cache_ttl() -> int:
+    return settings.USER_CACHE_TTL_SECONDS if cache_service.redis else settings.USER_CACHE_LOCAL_TTL_SECONDS
+
+
+def invalidate_cached_user(email: str):
+    """
+    Drop every cached entry for a user's tokens (call after deleting or changing the user)
+    Only reaches other worker processes when REDIS_URL is set; with the in-process
+    fallback, their copies live until USER_CACHE_LOCAL_TTL_SECONDS expires
+    """
+    cache_service.delete_prefix(_user_cache_prefix(email))
+
+
+def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> User:
+) -> CurrentUser:
     """Get current authenticated user"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -60,25 +104,58 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    email = verify_token(token, credentials_exception)
+    # Signature and expiry are always checked; only the user lookup is cached
+    payload = _decode_token(token, credentials_exception)
+    email = payload["sub"]
+    cache_key = _user_cache_key(payload)
+    
+    cached = cache_service.get(cache_key)
+    if cached is not None:
+        return CurrentUser(
+            id=cached["id"],
+            email=cached["email"],
+            phone=cached["phone"],
+            role=cached["role"],
+            created_at=datetime.fromisoformat(cached["created_at"]) if cached["created_at"] else None
+        )
+    
     user = db.query(User).filter(User.email == email).first()
     
     if user is None:
         raise credentials_exception
     
-    return user
+    cache_service.set(
+        cache_key,
+        {
+            "id": user.id,
+            "email": user.email,
+            "phone": user.phone,
+            "role": user.role,
+            "created_at": user.created_at.isoformat() if user.created_at else None
+        },
+        _user_cache_ttl()
+    )
+    
+    # Same shape on a cache miss, so handlers never depend on which path ran
+    return CurrentUser(
+        id=user.id,
+        email=user.email,
+        phone=user.phone,
+        role=user.role,
+        created_at=user.created_at
+    )
 
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: CurrentUser = Depends(get_current_user)
+) -> CurrentUser:
     """Get current active user"""
     return current_user
 
 
 def require_role(allowed_roles: list[str]):
     """Dependency to check if user has required role"""
-    async def role_checker(current_user: User = Depends(get_current_active_user)) -> User:
+    async def role_checker(current_user: CurrentUser = Depends(get_current_active_user)) -> CurrentUser:
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -1,13 +1,45 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+import orjson
 
 from app.core.config import settings
 
+
+def json_serializer(value) -> str:
+    """Serialize JSON columns with orjson (numpy scalars and non-str keys allowed, as with json.dumps)"""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def json_deserializer(value):
+    """Deserialize JSON columns with orjson"""
+    return orjson.loads(value)
+
+
+engine_options = {
+    "pool_pre_ping": True,
+    "json_serializer": json_serializer,
+    "json_deserializer": json_deserializer
+}
+if "sqlite" in settings.DATABASE_URL:
+    engine_options["connect_args"] = {"check_same_thread": False}
+elif settings.DB_USE_NULL_POOL:
+    # An external pooler (e.g. PgBouncer in transaction mode) owns the connections
+    engine_options["poolclass"] = NullPool
+else:
+    # Size the pool for the threadpool that runs sync handlers
+    engine_options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT
+    )
+
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    echo=True  # Set to False in production
+    echo=True,  # Set to False in production
+    **engine_options
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
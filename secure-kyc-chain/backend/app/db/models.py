@@ -1,14 +1,23 @@
-from sqlalchemy import Column, String, Float, Boolean, DateTime, Text, ForeignKey, Integer, JSON
+from sqlalchemy import Column, String, Float, Boolean, DateTime, Text, ForeignKey, Integer, BigInteger, JSON, Index, false
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime, timedelta
+import os
+import time
 import uuid
 
 from app.db.database import Base
 
 
 def generate_id():
-    return str(uuid.uuid4())
+    """
+    Time-ordered UUID (version 7 layout): 48-bit millisecond timestamp, then random bits
+    New rows land at the end of the primary key index instead of splitting random pages
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
 
 
 class User(Base):
@@ -22,6 +31,11 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     kyc_applications = relationship("KYCApplication", back_populates="user")
+    
+    __table_args__ = (
+        # Admin user listing filters by role and sorts by newest first
+        Index("idx_users_role_created", "role", "created_at"),
+    )
 
 
 class KYCApplication(Base):
@@ -32,9 +46,12 @@ class KYCApplication(Base):
     ukn = Column(String, unique=True, index=True, nullable=True)  # Unique KYC Number (issued after verification)
     status = Column(String, nullable=False, default="DRAFT")  # DRAFT, REGISTERED, PROCESSING, IN_REVIEW, VERIFIED, REJECTED, SUSPENDED, EXPIRED
     risk_score = Column(Float, nullable=True)
+    feature_vector = Column(JSON, nullable=True)  # Risk model inputs, in ml_service.feature_names order
+    shap_explanation = Column(JSON, nullable=True)  # SHAP features computed with the risk score
     face_match_score = Column(Float, nullable=True)
     face_embedding_hash = Column(String, nullable=True)  # Hash of face embedding for deduplication
     reviewer_comment = Column(Text, nullable=True)
+    flagged_duplicate = Column(Boolean, nullable=False, default=False, server_default=false())  # Face dedupe found a matching UKN
     user_details = Column(JSON, nullable=True)  # Store user-entered details (name, DOB, gender, etc.)
     blockchain_tx_hash = Column(String, nullable=True)  # Blockchain transaction hash
     verified_at = Column(DateTime(timezone=True), nullable=True)  # When UKN was issued
@@ -46,6 +63,15 @@ class KYCApplication(Base):
     documents = relationship("Document", back_populates="kyc_application", cascade="all, delete-orphan")
     verifications = relationship("Verification", back_populates="kyc_application", cascade="all, delete-orphan")
     consent_records = relationship("ConsentRecord", back_populates="kyc_application", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Partial index: only the (rare) flagged rows are indexed
+        Index(
+            "idx_kyc_flagged_dup", "flagged_duplicate",
+            sqlite_where=flagged_duplicate == True,
+            postgresql_where=flagged_duplicate == True
+        ),
+    )
 
 
 class Document(Base):
@@ -57,10 +83,16 @@ class Document(Base):
     file_path = Column(String, nullable=False)
     file_hash = Column(String, nullable=False)
     extracted_data = Column(JSON, nullable=True)  # Store extracted OCR data as JSON
+    image_hash = Column(BigInteger, nullable=True)  # 64-bit perceptual (difference) hash, for re-upload detection
     verified = Column(Boolean, default=False)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     
     kyc_application = relationship("KYCApplication", back_populates="documents")
+    
+    __table_args__ = (
+        # Documents are always fetched per application (and re-uploads matched by type)
+        Index("idx_documents_kyc_type", "kyc_id", "doc_type"),
+    )
 
 
 class Verification(Base):
@@ -75,6 +107,10 @@ class Verification(Base):
     tx_hash = Column(String, nullable=True)  # Blockchain transaction hash
     
     kyc_application = relationship("KYCApplication", back_populates="verifications")
+    
+    __table_args__ = (
+        Index("idx_verifications_kyc", "kyc_id"),
+    )
 
 
 class ConsentRecord(Base):
@@ -84,6 +120,7 @@ class ConsentRecord(Base):
     id = Column(String, primary_key=True, default=generate_id)
     kyc_id = Column(String, ForeignKey("kyc_applications.id"), nullable=False)
     institution_id = Column(String, ForeignKey("users.id"), nullable=False)  # Institution user ID
+    institution_email = Column(String, nullable=True)  # Snapshot of the institution's email, so listings skip the users join
     purpose = Column(String, nullable=False)  # e.g., "bank_account_opening", "loan_application"
     consent_given = Column(Boolean, default=False)
     access_token = Column(String, nullable=True)  # Temporary access token
@@ -93,6 +130,12 @@ class ConsentRecord(Base):
     
     kyc_application = relationship("KYCApplication", back_populates="consent_records")
     institution = relationship("User")
+    
+    __table_args__ = (
+        # Institution endpoints look up consent by this exact triple; one record per triple,
+        # so concurrent requests cannot both insert one
+        Index("idx_consent_kyc_inst_purpose", "kyc_id", "institution_id", "purpose", unique=True),
+    )
 
 
 class AuditRecord(Base):
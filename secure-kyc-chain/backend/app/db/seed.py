@@ -1,4 +1,6 @@
 """Database seeding script to create initial users"""
+from concurrent.futures import ThreadPoolExecutor
+
 from sqlalchemy.orm import Session
 
 from app.db.database import SessionLocal, engine, Base
@@ -39,13 +41,18 @@ def seed_users():
             }
         ]
         
-        for user_data in users:
-            user = User(
+        # bcrypt releases the GIL, so the hashes are computed in parallel
+        with ThreadPoolExecutor(max_workers=len(users)) as executor:
+            hashed_passwords = list(executor.map(get_password_hash, [u["password"] for u in users]))
+        
+        db.add_all([
+            User(
                 email=user_data["email"],
-                hashed_password=get_password_hash(user_data["password"]),
+                hashed_password=hashed_password,
                 role=user_data["role"]
             )
-            db.add(user)
+            for user_data, hashed_password in zip(users, hashed_passwords)
+        ])
         
         db.commit()
         print("Successfully seeded users")
@@ -1,6 +1,7 @@
 from .auth import Token, TokenData, UserCreate, UserResponse, LoginRequest
 from .kyc import (
     KYCApplicationCreate, KYCApplicationResponse, KYCApplicationUpdate,
+    KYCApplicationDuplicateInfo, KYCApplicationBlockchainRecord,
     DocumentCreate, DocumentResponse, VerificationCreate, VerificationResponse,
     ShapFeature, RiskMetrics, AuditRecordResponse
 )
@@ -8,6 +9,7 @@ from .kyc import (
 __all__ = [
     "Token", "TokenData", "UserCreate", "UserResponse", "LoginRequest",
     "KYCApplicationCreate", "KYCApplicationResponse", "KYCApplicationUpdate",
+    "KYCApplicationDuplicateInfo", "KYCApplicationBlockchainRecord",
     "DocumentCreate", "DocumentResponse", "VerificationCreate", "VerificationResponse",
     "ShapFeature", "RiskMetrics", "AuditRecordResponse",
 ]
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -42,8 +42,21 @@ class DocumentResponse(BaseModel):
     uploaded_at: datetime
     validation_result: Optional[ValidationResult] = None  # Validation result if available
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ConsentResponse(BaseModel):
+    """A user's consent record, with the institution's email as its name"""
+    id: str
+    institution_id: str
+    institution_name: str
+    purpose: str
+    consent_given: Optional[bool] = None
+    accessed_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(from_attributes=True)
 
 
 class VerificationCreate(BaseModel):
@@ -62,8 +75,7 @@ class VerificationResponse(BaseModel):
     timestamp: datetime
     tx_hash: Optional[str] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class KYCApplicationCreate(BaseModel):
@@ -96,8 +108,19 @@ class KYCApplicationResponse(BaseModel):
     documents: List[DocumentResponse] = []
     verifications: List[VerificationResponse] = []
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class KYCApplicationDuplicateInfo(KYCApplicationResponse):
+    """Face-dedupe queue entry"""
+    duplicate_count: int = 0
+    existing_ukn: Optional[str] = None
+    face_embedding_hash: Optional[str] = None
+
+
+class KYCApplicationBlockchainRecord(KYCApplicationResponse):
+    """Verified application with its blockchain block"""
+    blockchain_block: Optional[Dict[str, Any]] = None
 
 
 class RiskMetrics(BaseModel):
@@ -118,6 +141,5 @@ class AuditRecordResponse(BaseModel):
     timestamp: datetime
     details: Optional[Dict[str, Any]] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
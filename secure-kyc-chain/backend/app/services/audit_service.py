@@ -1,11 +1,23 @@
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from datetime import datetime
 import hashlib
-from typing import Optional, Dict, Any
+import orjson
+from typing import Optional, Dict, Any, List
 
 from app.db.models import AuditRecord
 
 
+def payload_hash(payload: Any) -> Optional[str]:
+    """SHA-256 of a JSON payload (canonical key order), used to reference large blobs stored elsewhere"""
+    if payload is None:
+        return None
+    canonical = orjson.dumps(
+        payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY, default=str
+    )
+    return f"sha256:{hashlib.sha256(canonical).hexdigest()}"
+
+
 class AuditService:
     """Service for logging audit trail events"""
     
@@ -17,33 +29,69 @@ class AuditService:
         event_type: str,
         details: Optional[Dict[str, Any]] = None,
         performed_by: str = "system",
-        tx_hash: Optional[str] = None
+        tx_hash: Optional[str] = None,
+        commit: bool = True
     ) -> AuditRecord:
-        """Log an event to the audit trail"""
-        
-        # Generate event hash
-        event_data = f"{entity_type}:{entity_id}:{event_type}:{datetime.now().isoformat()}"
-        event_hash = f"sha256:{hashlib.sha256(event_data.encode()).hexdigest()}"
-        
-        # Generate transaction hash if not provided
-        if not tx_hash:
-            tx_data = f"{event_hash}:{datetime.now().isoformat()}"
-            tx_hash = f"0x{hashlib.sha256(tx_data.encode()).hexdigest()[:40]}"
-        
-        # Create audit record
+        """
+        Log an event to the audit trail
+        Pass commit=False to leave the record in the caller's open transaction
+        """
         audit_record = AuditRecord(
-            entity_type=entity_type,
-            entity_id=entity_id,
-            event_hash=event_hash,
-            tx_hash=tx_hash,
-            details=details or {}
+            **self.build_event(entity_type, entity_id, event_type, details, tx_hash)
         )
         
         db.add(audit_record)
-        db.commit()
-        db.refresh(audit_record)
+        if commit:
+            # No refresh: only the server-side timestamp would change, and callers don't read it back
+            db.commit()
         
         return audit_record
+    
+    def build_event(
+        self,
+        entity_type: str,
+        entity_id: str,
+        event_type: str,
+        details: Optional[Dict[str, Any]] = None,
+        tx_hash: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Build the column values for an audit record"""
+        
+        # One timestamp for both hashes
+        timestamp = datetime.now().isoformat().encode()
+        
+        # Generate event hash (entity_type:entity_id:event_type:timestamp, fed piecewise)
+        event_digest = hashlib.sha256()
+        for part in (entity_type.encode(), entity_id.encode(), event_type.encode()):
+            event_digest.update(part)
+            event_digest.update(b":")
+        event_digest.update(timestamp)
+        event_hash = f"sha256:{event_digest.hexdigest()}"
+        
+        # Generate transaction hash if not provided
+        if not tx_hash:
+            tx_digest = hashlib.sha256(event_hash.encode())
+            tx_digest.update(b":")
+            tx_digest.update(timestamp)
+            tx_hash = f"0x{tx_digest.hexdigest()[:40]}"
+        
+        return {
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "event_hash": event_hash,
+            "tx_hash": tx_hash,
+            "details": details or {}
+        }
+    
+    def log_events_bulk(self, db: Session, events: List[Dict[str, Any]]) -> int:
+        """
+        Log several events (built with build_event) in a single multi-row INSERT
+        Commits the session, so rows added to it earlier are written in the same transaction
+        """
+        if events:
+            db.execute(insert(AuditRecord), events)
+        db.commit()
+        return len(events)
 
 
 # Global instance
@@ -1,8 +1,11 @@
 """Blockchain Service for storing KYC records immutably"""
 import hashlib
 from datetime import datetime
-from typing import Dict, Optional, Any
-import json
+from typing import Dict, Iterable, Optional, Any
+import orjson
+
+# Canonical block encoding: sorted keys, compact, numpy scalars allowed
+_CANONICAL_JSON = orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY
 
 class BlockchainService:
     """
@@ -12,6 +15,9 @@ class BlockchainService:
     
     def __init__(self):
         self.chain = []  # In production, this would be a blockchain connection
+        # Lookup indexes over the chain (first block wins, as with a scan from the start)
+        self._by_tx: Dict[str, Dict[str, Any]] = {}
+        self._by_ukn: Dict[str, Dict[str, Any]] = {}
     
     def create_block(
         self,
@@ -59,29 +65,31 @@ class BlockchainService:
         # In production, this would write to actual blockchain
         # For now, we'll store the hash in the database
         self.chain.append(block)
+        self._by_tx.setdefault(tx_hash, block)
+        self._by_ukn.setdefault(ukn, block)
         
         return block
     
     def _generate_tx_hash(self, data: Dict[str, Any]) -> str:
         """Generate a transaction hash from block data"""
-        data_str = json.dumps(data, sort_keys=True)
-        hash_obj = hashlib.sha256(data_str.encode())
-        return f"0x{hash_obj.hexdigest()}"
+        return f"0x{hashlib.sha256(orjson.dumps(data, option=_CANONICAL_JSON)).hexdigest()}"
     
     def verify_record(self, tx_hash: str) -> Optional[Dict[str, Any]]:
         """Verify a blockchain record by transaction hash"""
         # In production, this would query the blockchain
-        for block in self.chain:
-            if block["tx_hash"] == tx_hash:
-                return block
-        return None
+        return self._by_tx.get(tx_hash)
     
     def get_ukn_record(self, ukn: str) -> Optional[Dict[str, Any]]:
         """Get blockchain record for a UKN"""
-        for block in self.chain:
-            if block["data"]["ukn"] == ukn:
-                return block
-        return None
+        return self._by_ukn.get(ukn)
+    
+    def verify_records_batch(self, tx_hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Verify many blockchain records, keyed by transaction hash"""
+        return {tx_hash: self._by_tx[tx_hash] for tx_hash in set(tx_hashes) if tx_hash in self._by_tx}
+    
+    def get_ukn_records_batch(self, ukns: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Get blockchain records for many UKNs, keyed by UKN"""
+        return {ukn: self._by_ukn[ukn] for ukn in set(ukns) if ukn in self._by_ukn}
 
 
 # Singleton instance
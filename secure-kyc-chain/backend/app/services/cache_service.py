@@ -0,0 +1,123 @@
+"""Cache Service for short-lived API response caching"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from app.core.config import settings
+
+
+class CacheService:
+    """
+    Key/value cache with per-key TTL
+    Uses Redis when REDIS_URL is configured, otherwise falls back to an in-process LRU
+    bounded at LOCAL_CACHE_MAX_ENTRIES (expired entries are also dropped when read)
+    """
+
+    def __init__(self):
+        self.redis = None
+        self._store: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # key -> (expires_at, json payload), oldest use first
+        self._lock = threading.Lock()
+        self._initialize_client()
+
+    def _initialize_client(self):
+        """Connect to Redis if configured"""
+        if not settings.REDIS_URL:
+            return
+
+        try:
+            import redis
+            self.redis = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+            self.redis.ping()
+        except Exception as e:
+            print(f"Warning: Could not connect to Redis, using in-memory cache: {e}")
+            self.redis = None
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached value, or None on miss/expiry"""
+        if self.redis:
+            try:
+                payload = self.redis.get(key)
+            except Exception as e:
+                print(f"Cache get error: {e}")
+                return None
+        else:
+            with self._lock:
+                entry = self._store.get(key)
+                if entry is None:
+                    return None
+                expires_at, payload = entry
+                if expires_at <= time.monotonic():
+                    del self._store[key]
+                    return None
+                self._store.move_to_end(key)
+
+        return json.loads(payload) if payload is not None else None
+
+    def set(self, key: str, value: Any, ttl: int):
+        """Cache a JSON-serializable value for ttl seconds"""
+        payload = json.dumps(value)
+        if self.redis:
+            try:
+                self.redis.setex(key, ttl, payload)
+            except Exception as e:
+                print(f"Cache set error: {e}")
+        else:
+            with self._lock:
+                self._store[key] = (time.monotonic() + ttl, payload)
+                self._store.move_to_end(key)
+                while len(self._store) > settings.LOCAL_CACHE_MAX_ENTRIES:
+                    self._store.popitem(last=False)
+
+    def delete(self, *keys: str):
+        """Invalidate cached keys"""
+        if not keys:
+            return
+        if self.redis:
+            try:
+                self.redis.delete(*keys)
+            except Exception as e:
+                print(f"Cache delete error: {e}")
+        else:
+            with self._lock:
+                for key in keys:
+                    self._store.pop(key, None)
+
+    def delete_prefix(self, prefix: str):
+        """Invalidate every cached key starting with prefix"""
+        if self.redis:
+            try:
+                keys = list(self.redis.scan_iter(match=f"{prefix}*"))
+                if keys:
+                    self.redis.delete(*keys)
+            except Exception as e:
+                print(f"Cache delete error: {e}")
+        else:
+            with self._lock:
+                for key in [key for key in self._store if key.startswith(prefix)]:
+                    del self._store[key]
+
+    def clear(self):
+        """Drop every in-process entry (Redis keys expire on their own)"""
+        with self._lock:
+            self._store.clear()
+
+
+def kyc_summary_key(ukn: str) -> str:
+    """Cache key for the institution-facing KYC summary of a UKN"""
+    return f"kyc:{ukn}"
+
+
+def user_kyc_id_key(user_id: str) -> str:
+    """Cache key for the id of a user's KYC application (one per user, so it never changes)"""
+    return f"kyc:user:{user_id}"
+
+
+def ocr_result_key(file_hash: str) -> str:
+    """Cache key for the OCR extraction of a file, by its SHA-256"""
+    return f"ocr:{file_hash}"
+
+
+# Singleton instance
+cache_service = CacheService()
@@ -1,11 +1,45 @@
 import os
 import hashlib
-from typing import Dict, Any, Optional, Tuple
+import math
+import re
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Dict, Any, Optional, Tuple
 from PIL import Image
 import cv2
 import numpy as np
 
 from app.core.config import settings
+from app.services.cache_service import cache_service, ocr_result_key
+from app.services.face_model_service import face_model_service, DEEPFACE_MODEL
+
+UPLOAD_CHUNK_SIZE = 256 * 1024  # 256 KiB, the buffer size hashlib.file_digest uses
+IMAGE_HASH_SIZE = 8  # 8x8 gradient bits -> 64-bit hash
+
+# OCR field patterns, compiled once; each field takes the first pattern that matches
+_NAME_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
+    r'full name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)'
+))
+_DOB_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'date of birth[:\s]+(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})',
+    r'dob[:\s]+(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})',
+    r'born[:\s]+(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})'
+))
+_DOC_NUMBER_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'passport[:\s]+no[\.]?[:\s]+([A-Z0-9]+)',
+    r'document[:\s]+no[\.]?[:\s]+([A-Z0-9]+)',
+    r'number[:\s]+([A-Z0-9]{6,})'
+))
+_ADDRESS_PATTERNS = tuple(re.compile(p, re.IGNORECASE | re.DOTALL) for p in (
+    r'address[:\s]+(.+?)(?:date|dob|born|name|number)',
+    r'residence[:\s]+(.+?)(?:date|dob|born|name|number)'
+))
+# All nationality keywords in one alternation, so the text is scanned once
+_NATIONALITY_PATTERN = re.compile(
+    r'\b(?:(?P<us>united states|u\.?s\.?a)|(?P<uk>united kingdom|uk))\b', re.IGNORECASE
+)
+# In precedence order: United States wins when both appear
+_NATIONALITIES = {'us': 'United States', 'uk': 'United Kingdom'}
 
 
 class DocumentProcessingService:
@@ -21,8 +55,11 @@ class DocumentProcessingService:
             print(f"Warning: Could not initialize PaddleOCR: {e}")
             self.ocr_reader = None
     
-    def save_uploaded_file(self, file_content: bytes, filename: str, kyc_id: str) -> Tuple[str, str]:
-        """Save uploaded file and return file path and hash"""
+    def save_uploaded_file(self, file_obj: BinaryIO, filename: str, kyc_id: str) -> Tuple[str, str]:
+        """
+        Stream an uploaded file to disk and return file path and hash
+        Reads in UPLOAD_CHUNK_SIZE chunks, hashing as it writes, so the upload is never held in memory
+        """
         # Create directory for this KYC application
         kyc_dir = os.path.join(settings.UPLOAD_DIR, kyc_id)
         os.makedirs(kyc_dir, exist_ok=True)
@@ -30,17 +67,60 @@ class DocumentProcessingService:
         # Generate file path
         file_path = os.path.join(kyc_dir, filename)
         
-        # Save file
+        # Save file and calculate hash in one pass
+        file_hash = hashlib.sha256()
         with open(file_path, 'wb') as f:
-            f.write(file_content)
+            while chunk := file_obj.read(UPLOAD_CHUNK_SIZE):
+                file_hash.update(chunk)
+                f.write(chunk)
         
-        # Calculate file hash
-        file_hash = hashlib.sha256(file_content).hexdigest()
+        return self.upload_url(kyc_id, filename), file_hash.hexdigest()
+    
+    @staticmethod
+    def upload_url(kyc_id: str, filename: str) -> str:
+        """Stored document path: the URL the uploads mount serves the file at"""
+        return f"/uploads/{kyc_id}/{filename}"
+    
+    @staticmethod
+    def resolve_upload_path(file_path: str) -> str:
+        """
+        Filesystem path of a stored document path, under UPLOAD_DIR
+        Accepts the /uploads/<kyc_id>/<filename> URL form as well as older uploads/... paths
+        """
+        relative = PurePosixPath(file_path.lstrip('/'))
+        if relative.parts and relative.parts[0] == "uploads":
+            relative = relative.relative_to("uploads")
+        return os.fspath(Path(settings.UPLOAD_DIR, relative))
+    
+    def compute_image_hash(self, image_path: str) -> Optional[int]:
+        """
+        64-bit difference hash (dHash) of an image, stored as a signed int to fit a BIGINT column
+        Near-identical images (re-saves, recompression) differ by only a few bits
+        """
+        try:
+            with Image.open(image_path) as img:
+                pixels = np.asarray(img.convert('L').resize((IMAGE_HASH_SIZE + 1, IMAGE_HASH_SIZE)), dtype=np.int16)
+        except Exception as e:
+            print(f"Image hash error: {e}")
+            return None
         
-        # Return relative path for storage
-        relative_path = f"/uploads/{kyc_id}/{filename}"
+        bits = np.packbits(pixels[:, 1:] > pixels[:, :-1])
+        return int(bits.view('>i8')[0])
+    
+    def extract_text_cached(self, image_path: str, file_hash: str) -> Dict[str, Any]:
+        """
+        extract_text_from_image memoized by the file's SHA-256 (computed at upload)
+        Identical files only go through OCR once; failed (empty) extractions are not cached
+        """
+        key = ocr_result_key(file_hash)
+        cached = cache_service.get(key)
+        if cached is not None:
+            return cached
         
-        return relative_path, file_hash
+        extracted_data = self.extract_text_from_image(image_path)
+        if extracted_data:
+            cache_service.set(key, extracted_data, settings.OCR_CACHE_TTL_SECONDS)
+        return extracted_data
     
     def extract_text_from_image(self, image_path: str) -> Dict[str, Any]:
         """Extract text from document image using PaddleOCR"""
@@ -91,62 +171,32 @@ class DocumentProcessingService:
     def _parse_extracted_text(self, text: str, ocr_results: list) -> Dict[str, Any]:
         """Parse OCR results to extract structured data"""
         extracted = {}
-        text_lower = text.lower()
         
         # Try to extract common fields
-        import re
-        
-        # Name patterns
-        name_patterns = [
-            r'name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
-            r'full name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)'
-        ]
-        for pattern in name_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                extracted['name'] = match.group(1).strip()
-                break
-        
-        # Date of birth patterns
-        dob_patterns = [
-            r'date of birth[:\s]+(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})',
-            r'dob[:\s]+(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})',
-            r'born[:\s]+(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})'
-        ]
-        for pattern in dob_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                extracted['dob'] = match.group(1).strip()
-                break
-        
-        # Document number patterns
-        doc_patterns = [
-            r'passport[:\s]+no[\.]?[:\s]+([A-Z0-9]+)',
-            r'document[:\s]+no[\.]?[:\s]+([A-Z0-9]+)',
-            r'number[:\s]+([A-Z0-9]{6,})'
-        ]
-        for pattern in doc_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                extracted['documentNumber'] = match.group(1).strip()
-                break
+        for field, patterns in (
+            ('name', _NAME_PATTERNS),
+            ('dob', _DOB_PATTERNS),
+            ('documentNumber', _DOC_NUMBER_PATTERNS),
+        ):
+            for pattern in patterns:
+                match = pattern.search(text)
+                if match:
+                    extracted[field] = match.group(1).strip()
+                    break
         
         # Address patterns (simplified)
-        address_patterns = [
-            r'address[:\s]+(.+?)(?:date|dob|born|name|number)',
-            r'residence[:\s]+(.+?)(?:date|dob|born|name|number)'
-        ]
-        for pattern in address_patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+        for pattern in _ADDRESS_PATTERNS:
+            match = pattern.search(text)
             if match:
                 extracted['address'] = match.group(1).strip()[:100]  # Limit length
                 break
         
         # Nationality
-        if 'united states' in text_lower or 'usa' in text_lower or 'u.s.a' in text_lower:
-            extracted['nationality'] = 'United States'
-        elif 'united kingdom' in text_lower or 'uk' in text_lower:
-            extracted['nationality'] = 'United Kingdom'
+        found = {match.lastgroup for match in _NATIONALITY_PATTERN.finditer(text)}
+        for group, nationality in _NATIONALITIES.items():
+            if group in found:
+                extracted['nationality'] = nationality
+                break
         
         return extracted
     
@@ -166,54 +216,39 @@ class DocumentProcessingService:
         Uses InsightFace (preferred) or DeepFace as fallback
         """
         try:
-            # Try InsightFace first (more accurate)
-            if use_insightface:
+            # Try InsightFace first (more accurate), using the model cached at startup
+            face_model_service.load()
+            if use_insightface and face_model_service.insightface_model is not None:
                 try:
-                    from insightface import app as insightface_app
-                    from insightface.model_zoo import model_zoo
-                    import onnxruntime as ort
+                    # Extract embeddings
+                    doc_faces = face_model_service.get_faces(document_image_path)
+                    selfie_faces = face_model_service.get_faces(selfie_image_path)
                     
-                    # Initialize InsightFace model
-                    model_path = 'buffalo_l'  # or 'buffalo_s', 'buffalo_m'
-                    try:
-                        model = insightface_app.FaceAnalysis(name=model_path, providers=['CPUExecutionProvider'])
-                        model.prepare(ctx_id=-1, det_size=(640, 640))
+                    if doc_faces and selfie_faces:
+                        # Get first face from each
+                        doc_embedding = doc_faces[0].embedding
+                        selfie_embedding = selfie_faces[0].embedding
                         
-                        # Extract embeddings
-                        doc_faces = model.get(document_image_path)
-                        selfie_faces = model.get(selfie_image_path)
+                        # Calculate cosine similarity (one sqrt over both squared norms)
+                        dot_product = float(np.vdot(doc_embedding, selfie_embedding))
+                        norms_squared = float(np.vdot(doc_embedding, doc_embedding) * np.vdot(selfie_embedding, selfie_embedding))
                         
-                        if doc_faces and selfie_faces and len(doc_faces) > 0 and len(selfie_faces) > 0:
-                            # Get first face from each
-                            doc_embedding = doc_faces[0].embedding
-                            selfie_embedding = selfie_faces[0].embedding
-                            
-                            # Calculate cosine similarity
-                            import numpy as np
-                            dot_product = np.dot(doc_embedding, selfie_embedding)
-                            norm1 = np.linalg.norm(doc_embedding)
-                            norm2 = np.linalg.norm(selfie_embedding)
-                            
-                            if norm1 > 0 and norm2 > 0:
-                                similarity = dot_product / (norm1 * norm2)
-                                # InsightFace similarity is already 0-1, higher is better
-                                return float(max(0, min(1, similarity)))
-                    except Exception as e:
-                        print(f"InsightFace not available, falling back to DeepFace: {e}")
-                        use_insightface = False
-                except ImportError:
-                    print("InsightFace not installed, using DeepFace")
-                    use_insightface = False
+                        if norms_squared > 0:
+                            similarity = dot_product / math.sqrt(norms_squared)
+                            # InsightFace similarity is already 0-1, higher is better
+                            return float(max(0, min(1, similarity)))
+                except Exception as e:
+                    print(f"InsightFace face matching failed, falling back to DeepFace: {e}")
             
             # Fallback to DeepFace
             from deepface import DeepFace
             
-            # Verify faces using DeepFace
+            # Verify faces using DeepFace (the VGG-Face model is built once by face_model_service)
             # DeepFace.verify returns: {'verified': bool, 'distance': float, 'threshold': float, 'model': str, 'detector_backend': str, 'similarity_metric': str}
             result = DeepFace.verify(
                 img1_path=document_image_path,
                 img2_path=selfie_image_path,
-                model_name='VGG-Face',  # or 'Facenet', 'OpenFace', 'DeepFace', 'ArcFace'
+                model_name=DEEPFACE_MODEL,
                 detector_backend='opencv',  # or 'ssd', 'dlib', 'mtcnn', 'retinaface'
                 enforce_detection=True,
                 distance_metric='cosine'
@@ -1,8 +1,12 @@
 """Face Embedding Deduplication Service"""
 import numpy as np
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 import hashlib
 import json
+import threading
+
+INDEX_DTYPE = np.float16  # Unit vectors lose <1e-3 cosine accuracy in fp16 at half the memory
+SEARCH_BLOCK_ROWS = 4096  # Rows upcast to float32 per matrix-vector product (stays cache-sized)
 
 class FaceDedupeService:
     """
@@ -11,8 +15,15 @@ class FaceDedupeService:
     """
     
     def __init__(self):
-        self.embeddings_cache = {}  # In production, use a vector database (Pinecone, Weaviate, etc.)
         self.similarity_threshold = 0.85  # Threshold for considering faces as the same person
+        
+        # Similarity index: L2-normalized embeddings stacked in one matrix so a lookup
+        # is a single matrix-vector product instead of a Python loop over every identity.
+        # It is the only copy kept (in production, use a vector database: Pinecone, Weaviate, etc.)
+        self._index_lock = threading.Lock()
+        self._index_keys: List[str] = []
+        self._index_rows: Dict[str, int] = {}
+        self._index_matrix: Optional[np.ndarray] = None  # capacity x dim (INDEX_DTYPE), first len(_index_keys) rows used
     
     def generate_embedding_hash(self, embedding: np.ndarray) -> str:
         """Generate a hash from face embedding"""
@@ -23,62 +34,140 @@ class FaceDedupeService:
     def check_duplicate(
         self,
         new_embedding: np.ndarray,
-        existing_ukns: List[str],
-        existing_embeddings: List[np.ndarray]
+        existing_ukns: Optional[List[str]] = None,
+        existing_embeddings: Optional[List[np.ndarray]] = None
     ) -> Tuple[bool, Optional[str], float]:
         """
         Check if face embedding matches any existing UKN
         
         Args:
             new_embedding: New face embedding to check
-            existing_ukns: List of existing UKNs
+            existing_ukns: List of existing UKNs (omit both lists to check the stored index)
             existing_embeddings: List of corresponding embeddings
         
         Returns:
             (is_duplicate, matched_ukn, similarity_score)
         """
-        if not existing_embeddings:
-            return False, None, 0.0
-        
-        # Calculate cosine similarity with all existing embeddings
-        similarities = []
-        for emb in existing_embeddings:
-            similarity = self._cosine_similarity(new_embedding, emb)
-            similarities.append(similarity)
-        
-        max_similarity = max(similarities) if similarities else 0.0
-        max_index = similarities.index(max_similarity) if similarities else -1
+        if existing_embeddings is None:
+            nearest = self.search_similar(new_embedding, k=1)
+            if not nearest:
+                return False, None, 0.0
+            matched_ukn, max_similarity = nearest[0]
+        else:
+            if not existing_embeddings:
+                return False, None, 0.0
+            
+            # Cosine similarity with all existing embeddings in one matrix-vector product
+            matrix = np.asarray(existing_embeddings, dtype=np.float32).reshape(len(existing_embeddings), -1)
+            query = np.asarray(new_embedding, dtype=np.float32).ravel()
+            norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+            similarities = np.divide(matrix @ query, norms, out=np.zeros(len(matrix), dtype=np.float32), where=norms > 0)
+            
+            max_index = int(similarities.argmax())
+            matched_ukn, max_similarity = existing_ukns[max_index], float(similarities[max_index])
         
         if max_similarity >= self.similarity_threshold:
-            matched_ukn = existing_ukns[max_index] if max_index >= 0 else None
             return True, matched_ukn, max_similarity
         
         return False, None, max_similarity
     
-    def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
-        """Calculate cosine similarity between two vectors"""
-        dot_product = np.dot(vec1, vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
-        
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        
-        return dot_product / (norm1 * norm2)
-    
     def store_embedding(self, ukn: str, embedding: np.ndarray):
         """Store face embedding for a UKN"""
-        embedding_hash = self.generate_embedding_hash(embedding)
-        self.embeddings_cache[ukn] = {
-            "embedding": embedding,
-            "hash": embedding_hash
-        }
+        self._index_embedding(ukn, embedding)
+    
+    def _index_embedding(self, key: str, embedding: np.ndarray):
+        """Add (or replace) a normalized embedding in the similarity index"""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return
+        vector = vector / norm
+        
+        with self._index_lock:
+            if self._index_matrix is not None and self._index_matrix.shape[1] != vector.shape[0]:
+                # Embedding from a different model (e.g. DeepFace fallback) - not comparable
+                print(f"Warning: Skipping face index for {key}: embedding size {vector.shape[0]} does not match index")
+                return
+            
+            row = self._index_rows.get(key)
+            if row is not None:
+                self._index_matrix[row] = vector
+                return
+            
+            row = len(self._index_keys)
+            if self._index_matrix is None:
+                self._index_matrix = np.empty((64, vector.shape[0]), dtype=INDEX_DTYPE)
+            elif row == self._index_matrix.shape[0]:
+                # Grow geometrically so inserts stay amortized O(1)
+                grown = np.empty((row * 2, vector.shape[0]), dtype=INDEX_DTYPE)
+                grown[:row] = self._index_matrix
+                self._index_matrix = grown
+            
+            self._index_matrix[row] = vector
+            self._index_rows[key] = row
+            self._index_keys.append(key)
+    
+    def search_similar(
+        self,
+        embedding: np.ndarray,
+        k: Optional[int] = 5,
+        exclude: Iterable[str] = (),
+        min_similarity: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the stored embeddings most similar to a face
+        
+        Args:
+            k: Maximum number of results (None for no limit)
+            min_similarity: Only return embeddings at least this similar; with k=None every
+                match is returned, so a fixed k cannot hide one behind closer faces
+        
+        Returns:
+            (key, cosine_similarity) pairs, most similar first
+        """
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        
+        with self._index_lock:
+            count = len(self._index_keys)
+            if norm == 0 or count == 0 or self._index_matrix.shape[1] != vector.shape[0]:
+                return []
+            query = vector / norm
+            similarities = np.empty(count, dtype=np.float32)
+            # numpy has no fp16 BLAS, so upcast one block at a time and keep the float32 GEMV
+            for start in range(0, count, SEARCH_BLOCK_ROWS):
+                block = self._index_matrix[start:min(start + SEARCH_BLOCK_ROWS, count)]
+                similarities[start:start + len(block)] = block.astype(np.float32) @ query
+            keys = list(self._index_keys)
+        
+        excluded = set(exclude)
+        if min_similarity is not None:
+            candidates = np.flatnonzero(similarities >= min_similarity)
+        elif k is None:
+            candidates = np.arange(count)
+        else:
+            # Over-fetch by the number of exclusions so they cannot crowd out real matches
+            top = min(count, k + len(excluded))
+            candidates = np.argpartition(-similarities, top - 1)[:top]
+        candidates = candidates[np.argsort(-similarities[candidates])]
+        
+        results = [
+            (keys[i], float(similarities[i]))
+            for i in candidates
+            if keys[i] not in excluded
+        ]
+        return results if k is None else results[:k]
     
     def get_embedding(self, ukn: str) -> Optional[np.ndarray]:
-        """Get stored embedding for a UKN"""
-        if ukn in self.embeddings_cache:
-            return self.embeddings_cache[ukn]["embedding"]
-        return None
+        """
+        Get stored embedding for a UKN, read back from the index
+        L2-normalized float32 (cosine similarity ignores magnitude, so it is not kept)
+        """
+        with self._index_lock:
+            row = self._index_rows.get(ukn)
+            if row is None:
+                return None
+            return self._index_matrix[row].astype(np.float32)
 
 
 # Singleton instance
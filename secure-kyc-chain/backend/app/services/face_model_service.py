@@ -0,0 +1,82 @@
+"""Face Model Service - loads the face recognition models once per process"""
+import threading
+from typing import Any, List, Optional
+
+import numpy as np
+
+INSIGHTFACE_MODEL = 'buffalo_l'  # or 'buffalo_s', 'buffalo_m'
+DEEPFACE_MODEL = 'VGG-Face'
+
+
+class FaceModelService:
+    """
+    Holds the InsightFace FaceAnalysis model (and DeepFace fallback) for the whole process
+    Loading buffalo_l reads ~300 MB of ONNX weights, so it is done once at startup instead of per request
+    """
+
+    def __init__(self):
+        self.insightface_model = None
+        self.deepface = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load the models (idempotent, safe to call from the startup hook and request threads)"""
+        if self._loaded:
+            return
+
+        with self._lock:
+            if self._loaded:
+                return
+
+            try:
+                from insightface import app as insightface_app
+                model = insightface_app.FaceAnalysis(name=INSIGHTFACE_MODEL, providers=['CPUExecutionProvider'])
+                model.prepare(ctx_id=-1, det_size=(640, 640))
+                self.insightface_model = model
+                print("InsightFace model loaded successfully")
+            except Exception as e:
+                print(f"Warning: Could not load InsightFace, falling back to DeepFace: {e}")
+                self.insightface_model = None
+
+            if self.insightface_model is None:
+                try:
+                    from deepface import DeepFace
+                    DeepFace.build_model(DEEPFACE_MODEL)  # DeepFace caches built models internally
+                    self.deepface = DeepFace
+                except Exception as e:
+                    print(f"Warning: Could not load DeepFace: {e}")
+                    self.deepface = None
+
+            self._loaded = True
+
+    def get_faces(self, image_path: str) -> List[Any]:
+        """Detect faces with the cached InsightFace model (empty list if unavailable)"""
+        self.load()
+        if self.insightface_model is None:
+            return []
+        return self.insightface_model.get(image_path) or []
+
+    def get_embedding(self, image_path: str) -> Optional[np.ndarray]:
+        """Face embedding (contiguous float32) of the first face in an image, via InsightFace or the DeepFace fallback"""
+        self.load()
+
+        if self.insightface_model is not None:
+            faces = self.get_faces(image_path)
+            return np.ascontiguousarray(faces[0].embedding, dtype=np.float32) if faces else None
+
+        if self.deepface is not None:
+            embedding_obj = self.deepface.represent(
+                img_path=image_path,
+                model_name=DEEPFACE_MODEL,
+                detector_backend='opencv',
+                enforce_detection=True
+            )
+            if embedding_obj:
+                return np.ascontiguousarray(embedding_obj[0]['embedding'], dtype=np.float32)
+
+        return None
+
+
+# Singleton instance
+face_model_service = FaceModelService()
@@ -1,10 +1,14 @@
 """Liveness Detection Service using Eye Blink Detection"""
 import cv2
 import numpy as np
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Iterator, Optional, Tuple
 import dlib
 import os
 
+LIVENESS_SAMPLE_FPS = 10  # Blinks last 100-400 ms, so ~10 sampled frames per second still catch them
+LIVENESS_MAX_FRAMES = 30  # Frames analyzed per video (about 3 s at the sample rate)
+FACE_DETECT_WIDTH = 320  # Frames are downscaled to this width for dlib's HOG face detector
+
 class LivenessService:
     """
     Service for detecting liveness in selfie videos/images
@@ -69,13 +73,30 @@ class LivenessService:
                     'face_detected': False,
                     'error': 'Could not read image'
                 }
-            
+        except Exception as e:
+            print(f"Eye blink detection error: {e}")
+            return {
+                'blink_detected': False,
+                'eye_aspect_ratio': 0.0,
+                'confidence': 0.0,
+                'face_detected': False,
+                'error': str(e)
+            }
+        
+        return self._detect_eye_blink_array(image)
+    
+    def _detect_eye_blink_array(self, image: np.ndarray) -> Dict[str, Any]:
+        """
+        Detect eye blink in an already decoded BGR image (same result dict as detect_eye_blink)
+        Video frames are passed straight in, without a round trip through an image file
+        """
+        try:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
             # Detect face
             if self.detector and self.predictor:
                 # Use dlib for more accurate detection
-                faces = self.detector(gray)
+                faces = self._detect_faces(gray)
                 if len(faces) == 0:
                     return {
                         'blink_detected': False,
@@ -90,12 +111,11 @@ class LivenessService:
                 
                 # Extract eye landmarks (indices for 68-point model)
                 # Left eye: 36-41, Right eye: 42-47
-                left_eye_points = [(landmarks.part(i).x, landmarks.part(i).y) for i in range(36, 42)]
-                right_eye_points = [(landmarks.part(i).x, landmarks.part(i).y) for i in range(42, 48)]
+                eye_points = np.array([(landmarks.part(i).x, landmarks.part(i).y) for i in range(36, 48)], dtype=np.float64)
                 
                 # Calculate Eye Aspect Ratio (EAR)
-                left_ear = self._calculate_ear(left_eye_points)
-                right_ear = self._calculate_ear(right_eye_points)
+                left_ear = self._calculate_ear(eye_points[:6])
+                right_ear = self._calculate_ear(eye_points[6:])
                 ear = (left_ear + right_ear) / 2.0
                 
                 # EAR threshold: below 0.25 typically indicates closed eyes (blink)
@@ -154,25 +174,57 @@ class LivenessService:
                 'error': str(e)
             }
     
-    def _calculate_ear(self, eye_points: list) -> float:
-        """Calculate Eye Aspect Ratio (EAR)"""
-        # Convert to numpy array
-        points = np.array(eye_points)
+    def _detect_faces(self, gray: np.ndarray) -> list:
+        """
+        Run the dlib face detector on a copy of the frame at most FACE_DETECT_WIDTH wide
+        HOG detection cost grows with pixel count; the face rectangles are mapped back to
+        full resolution so landmarks are still predicted on the original frame
+        """
+        width = gray.shape[1]
+        if width <= FACE_DETECT_WIDTH:
+            return list(self.detector(gray))
         
-        # Calculate distances
-        # Vertical distances
-        v1 = np.linalg.norm(points[1] - points[5])
-        v2 = np.linalg.norm(points[2] - points[4])
+        scale = FACE_DETECT_WIDTH / width
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return [
+            dlib.rectangle(
+                int(face.left() / scale), int(face.top() / scale),
+                int(face.right() / scale), int(face.bottom() / scale)
+            )
+            for face in self.detector(small)
+        ]
+    
+    def _calculate_ear(self, eye_points: np.ndarray) -> float:
+        """Calculate Eye Aspect Ratio (EAR) from the 6 (x, y) landmarks of one eye"""
+        points = np.asarray(eye_points, dtype=np.float64)
         
-        # Horizontal distance
-        h = np.linalg.norm(points[0] - points[3])
+        # Vertical distances (1-5, 2-4), then the horizontal distance (0-3), in one pass
+        deltas = points[[1, 2, 0]] - points[[5, 4, 3]]
+        v1, v2, h = np.sqrt(np.einsum('ij,ij->i', deltas, deltas))
         
         # EAR formula
         if h == 0:
             return 0.0
-        ear = (v1 + v2) / (2.0 * h)
+        return float((v1 + v2) / (2.0 * h))
+    
+    def _sample_frames(self, cap: cv2.VideoCapture) -> Iterator[np.ndarray]:
+        """
+        Yield about LIVENESS_SAMPLE_FPS frames per second of video, up to LIVENESS_MAX_FRAMES
+        Skipped frames are only grabbed, never retrieved (no colour conversion or copy)
+        """
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0
+        stride = max(1, int(fps / LIVENESS_SAMPLE_FPS))
         
-        return ear
+        frame_index = 0
+        sampled = 0
+        while sampled < LIVENESS_MAX_FRAMES and cap.grab():
+            if frame_index % stride == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                sampled += 1
+                yield frame
+            frame_index += 1
     
     def detect_liveness_from_video(self, video_path: str) -> Dict[str, Any]:
         """
@@ -200,20 +252,12 @@ class LivenessService:
             consecutive_closed = 0
             was_blinking = False
             
-            # Process video frames
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
+            # Process sampled video frames
+            for frame in self._sample_frames(cap):
                 frames_analyzed += 1
                 
-                # Save frame temporarily
-                temp_frame_path = f"/tmp/frame_{frames_analyzed}.jpg"
-                cv2.imwrite(temp_frame_path, frame)
-                
                 # Detect blink in this frame
-                blink_result = self.detect_eye_blink(temp_frame_path)
+                blink_result = self._detect_eye_blink_array(frame)
                 
                 if blink_result.get('blink_detected'):
                     if not was_blinking:
@@ -224,14 +268,6 @@ class LivenessService:
                 else:
                     was_blinking = False
                     consecutive_closed = 0
-                
-                # Clean up temp file
-                if os.path.exists(temp_frame_path):
-                    os.remove(temp_frame_path)
-                
-                # Limit frames to analyze (for performance)
-                if frames_analyzed >= 30:  # Analyze first 30 frames
-                    break
             
             cap.release()
             
@@ -265,23 +301,12 @@ class LivenessService:
             if not cap.isOpened():
                 return None
             
-            frames_analyzed = 0
             best_frame = None
             best_ear = 0.0  # Higher EAR = eyes more open (better for photo)
             
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                frames_analyzed += 1
-                
-                # Save frame temporarily
-                temp_frame_path = f"/tmp/frame_{frames_analyzed}.jpg"
-                cv2.imwrite(temp_frame_path, frame)
-                
+            for frame in self._sample_frames(cap):
                 # Detect blink in this frame
-                blink_result = self.detect_eye_blink(temp_frame_path)
+                blink_result = self._detect_eye_blink_array(frame)
                 
                 if blink_result.get('face_detected'):
                     ear = blink_result.get('eye_aspect_ratio', 0.0)
@@ -290,14 +315,6 @@ class LivenessService:
                         if ear > best_ear:
                             best_ear = ear
                             best_frame = frame.copy()
-                
-                # Clean up temp file
-                if os.path.exists(temp_frame_path):
-                    os.remove(temp_frame_path)
-                
-                # Limit frames to analyze
-                if frames_analyzed >= 30:
-                    break
             
             cap.release()
             
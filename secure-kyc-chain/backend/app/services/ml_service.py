@@ -102,6 +102,33 @@ class MLRiskScoringService:
         )
         self.model.fit(X, y_binary)
     
+    def build_feature_vector(self, **features: float) -> np.ndarray:
+        """Feature row (1 x n_features) in feature_names order, as stored and fed to the model"""
+        return np.array([[features[name] for name in self.feature_names]], dtype=np.float64)
+    
+    def explain(self, features: np.ndarray) -> List[ShapFeature]:
+        """SHAP explanation for a prebuilt feature row (see build_feature_vector)"""
+        return self._explain(features, self.scaler.transform(features))
+    
+    def _explain(self, features: np.ndarray, features_scaled: np.ndarray) -> List[ShapFeature]:
+        # Calculate SHAP values
+        shap_values = self.explainer.shap_values(features_scaled)[1][0]  # Get values for class 1 (high risk)
+        
+        # Create SHAP feature list
+        shap_features = [
+            ShapFeature(
+                feature=self.feature_names[i],
+                shap_value=float(shap_values[i]),
+                feature_value=float(features[0][i])
+            )
+            for i in range(len(self.feature_names))
+        ]
+        
+        # Sort by absolute SHAP value (most impactful features first)
+        shap_features.sort(key=lambda x: abs(x.shap_value), reverse=True)
+        
+        return shap_features
+    
     def calculate_risk_score(
         self,
         face_match_confidence: float,
@@ -120,16 +147,16 @@ class MLRiskScoringService:
             Tuple of (risk_score, shap_features)
         """
         # Prepare feature vector
-        features = np.array([[
-            face_match_confidence,
-            document_age_years,
-            address_verification_score,
-            transaction_history_risk,
-            id_quality_score,
-            document_type_risk,
-            extraction_confidence,
-            name_match_score
-        ]])
+        features = self.build_feature_vector(
+            face_match_confidence=face_match_confidence,
+            document_age_years=document_age_years,
+            address_verification_score=address_verification_score,
+            transaction_history_risk=transaction_history_risk,
+            id_quality_score=id_quality_score,
+            document_type_risk=document_type_risk,
+            extraction_confidence=extraction_confidence,
+            name_match_score=name_match_score
+        )
         
         # Normalize features
         features_scaled = self.scaler.transform(features)
@@ -137,23 +164,7 @@ class MLRiskScoringService:
         # Predict risk score (probability of high risk)
         risk_score = self.model.predict_proba(features_scaled)[0][1]
         
-        # Calculate SHAP values
-        shap_values = self.explainer.shap_values(features_scaled)[1][0]  # Get values for class 1 (high risk)
-        
-        # Create SHAP feature list
-        shap_features = [
-            ShapFeature(
-                feature=self.feature_names[i],
-                shap_value=float(shap_values[i]),
-                feature_value=float(features[0][i])
-            )
-            for i in range(len(self.feature_names))
-        ]
-        
-        # Sort by absolute SHAP value (most impactful features first)
-        shap_features.sort(key=lambda x: abs(x.shap_value), reverse=True)
-        
-        return float(risk_score), shap_features
+        return float(risk_score), self._explain(features, features_scaled)
 
 
 # Global instance
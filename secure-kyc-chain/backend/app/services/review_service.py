@@ -0,0 +1,101 @@
+"""Review Service - records written when an application is approved"""
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.db.models import KYCApplication, Verification
+from app.services.audit_service import audit_service
+from app.services.blockchain_service import blockchain_service
+from app.services.cache_service import cache_service, kyc_summary_key
+
+
+def write_review_records(db: Session, verifications: List[dict], audit_events: List[dict]):
+    """Insert verification and audit rows with one multi-row INSERT per table, then commit"""
+    if verifications:
+        db.execute(insert(Verification), verifications)
+    audit_service.log_events_bulk(db, audit_events)
+
+
+def record_review_failure(db: Session, kyc_id: str, event_type: str, error: Exception, tx_hash: Optional[str] = None):
+    """
+    Leave an audit record when the background writes for a review decision fail,
+    so a VERIFIED/REJECTED application missing its records can be found and replayed
+    """
+    try:
+        audit_service.log_event(
+            db,
+            entity_type="kyc_application",
+            entity_id=kyc_id,
+            event_type="review_record_failed",
+            details={"failed_event": event_type, "error": str(error), "blockchain_tx_hash": tx_hash}
+        )
+    except Exception as e:
+        db.rollback()
+        print(f"Error recording {event_type} failure for {kyc_id}: {e}")
+
+
+def record_approval(
+    kyc_id: str,
+    ukn: str,
+    document_hashes: Dict[str, str],
+    face_embedding_hash: str,
+    verification_data: Dict[str, Any],
+    reviewer_id: str,
+    comment: Optional[str],
+    event_type: str = "verification"
+):
+    """
+    Write the blockchain block, verification and audit records for an approval
+    Runs as a background task after the response is sent, so it opens its own session
+    """
+    db = SessionLocal()
+    tx_hash = None
+    try:
+        blockchain_record = blockchain_service.create_block(
+            ukn=ukn,
+            document_hashes=document_hashes,
+            face_embedding_hash=face_embedding_hash,
+            verification_data=verification_data,
+            issuer=reviewer_id
+        )
+        tx_hash = blockchain_record["tx_hash"]
+        
+        db.query(KYCApplication).filter(KYCApplication.id == kyc_id).update(
+            {KYCApplication.blockchain_tx_hash: tx_hash}, synchronize_session=False
+        )
+        
+        verification = {
+            "kyc_id": kyc_id,
+            "event_type": event_type,
+            "details": {
+                "reviewer_id": reviewer_id,
+                "comment": comment,
+                "ukn": ukn,
+                "blockchain_tx_hash": tx_hash,
+                "risk_score": verification_data.get("risk_score")
+            },
+            "performed_by": reviewer_id,
+            "tx_hash": tx_hash
+        }
+        audit_event = audit_service.build_event(
+            entity_type="kyc_application",
+            entity_id=kyc_id,
+            event_type=event_type,
+            details={
+                "reviewer_id": reviewer_id,
+                "risk_score": verification_data.get("risk_score"),
+                "ukn": ukn,
+                "blockchain_tx_hash": tx_hash
+            },
+            tx_hash=tx_hash
+        )
+        write_review_records(db, [verification], [audit_event])
+        cache_service.delete(kyc_summary_key(ukn))
+    except Exception as e:
+        db.rollback()
+        print(f"Error recording approval for {kyc_id}: {e}")
+        record_review_failure(db, kyc_id, event_type, e, tx_hash)
+    finally:
+        db.close()
@@ -176,9 +176,10 @@ class TransactionAnalysisService:
     def _extract_transactions(self, text: str, doc_type: str) -> List[Dict[str, Any]]:
         """Extract transaction data from OCR text"""
         transactions = []
+        doc_type = doc_type.upper()
         
         # Common patterns for bank statements
-        if 'BANK' in doc_type.upper() or 'STATEMENT' in doc_type.upper():
+        if 'BANK' in doc_type or 'STATEMENT' in doc_type:
             # Pattern: Date | Description | Amount | Balance
             # Example: "01/01/2024 | ATM WITHDRAWAL | -5000.00 | 45000.00"
             date_pattern = r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}'
@@ -206,7 +207,7 @@ class TransactionAnalysisService:
                             pass
         
         # For utility bills, extract payment amount
-        elif 'UTILITY' in doc_type.upper() or 'BILL' in doc_type.upper():
+        elif 'UTILITY' in doc_type or 'BILL' in doc_type:
             # Look for amount due
             amount_pattern = r'(?:amount|total|due|payable)[:\s]+₹?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)'
             matches = re.findall(amount_pattern, text, re.IGNORECASE)
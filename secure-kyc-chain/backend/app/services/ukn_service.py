@@ -1,9 +1,17 @@
 """UKN (Unique KYC Number) Generation Service"""
 import hashlib
+import re
 import secrets
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+# KYC-XXXX-XXXX-XXXX, each X a hex digit
+_UKN_PATTERN = re.compile(r"KYC-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}")
+
+
 def generate_ukn() -> str:
     """
     Generate a unique KYC number in format: KYC-XXXX-XXXX-XXXX
@@ -18,21 +26,25 @@ def generate_ukn() -> str:
     return ukn
 
 
+def assign_ukn(db: Session, kyc_app, attempts: int = 5) -> str:
+    """
+    Issue a new UKN to an application, relying on the unique index on kyc_applications.ukn
+    Each attempt is flushed inside a SAVEPOINT, so a collision only rolls back the UKN itself
+    """
+    db.flush()  # Write pending changes first so a collision cannot discard them
+    for attempt in range(attempts):
+        try:
+            with db.begin_nested():
+                kyc_app.ukn = generate_ukn()
+            return kyc_app.ukn
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
+
+
 def validate_ukn_format(ukn: str) -> bool:
     """Validate UKN format"""
-    parts = ukn.split('-')
-    if len(parts) != 4:
-        return False
-    if parts[0] != 'KYC':
-        return False
-    if len(parts[1]) != 4 or len(parts[2]) != 4 or len(parts[3]) != 4:
-        return False
-    # Check if all parts are hex
-    try:
-        int(parts[1] + parts[2] + parts[3], 16)
-        return True
-    except ValueError:
-        return False
+    return _UKN_PATTERN.fullmatch(ukn) is not None
 
 
 def generate_ukn_hash(ukn: str, user_id: str, timestamp: datetime) -> str:
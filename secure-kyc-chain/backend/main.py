@@ -1,11 +1,14 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy import text
+from sqlalchemy.orm import Session
 import os
 
 from app.core.config import settings
 from app.api.v1.api import api_router
-from app.db.database import engine, Base
+from app.db.database import engine, Base, get_db
+from app.services.face_model_service import face_model_service
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -35,6 +38,11 @@ app.include_router(api_router, prefix="/api/v1")
 # Mount uploads directory for serving files
 app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
 
+@app.on_event("startup")
+def load_face_models():
+    """Load the face recognition models once, before the first /process request"""
+    face_model_service.load()
+
 @app.get("/")
 async def root():
     return {
@@ -48,6 +56,17 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/db")
+def db_health_check(db: Session = Depends(get_db)):
+    """Check a pooled connection can run a query"""
+    try:
+        db.execute(text("SELECT 1"))
+    except Exception as e:
+        # Driver errors can name the host, user or SQL; keep them in the server log
+        print(f"Database health check failed: {e}")
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return {"status": "healthy"}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
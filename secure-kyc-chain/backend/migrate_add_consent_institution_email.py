@@ -0,0 +1,50 @@
+"""Migration script to add institution_email column to consent_records table"""
+import sqlite3
+from pathlib import Path
+
+# Get database path
+db_path = Path(__file__).parent / "kyc.db"
+
+if not db_path.exists():
+    print(f"[ERROR] Database file not found: {db_path}")
+    exit(1)
+
+print(f"[INFO] Connecting to database: {db_path}")
+
+try:
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+    
+    # Check if column already exists
+    cursor.execute("PRAGMA table_info(consent_records)")
+    columns = [col[1] for col in cursor.fetchall()]
+    
+    if "institution_email" in columns:
+        print("[OK] Column 'institution_email' already exists in consent_records table")
+    else:
+        print("[INFO] Adding 'institution_email' column to consent_records table...")
+        cursor.execute("""
+            ALTER TABLE consent_records 
+            ADD COLUMN institution_email VARCHAR
+        """)
+        conn.commit()
+        print("[OK] Column 'institution_email' added")
+    
+    # Backfill from the institution's user row
+    cursor.execute("""
+        UPDATE consent_records
+        SET institution_email = (SELECT email FROM users WHERE users.id = consent_records.institution_id)
+        WHERE institution_email IS NULL
+          AND institution_id IN (SELECT id FROM users)
+    """)
+    conn.commit()
+    print(f"[OK] Backfilled institution_email on {cursor.rowcount} consent records")
+    
+    conn.close()
+    print("[OK] Migration completed successfully")
+    
+except Exception as e:
+    print(f"[ERROR] Migration failed: {e}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
@@ -0,0 +1,40 @@
+"""Migration script to add image_hash column to documents table"""
+import sqlite3
+from pathlib import Path
+
+# Get database path
+db_path = Path(__file__).parent / "kyc.db"
+
+if not db_path.exists():
+    print(f"[ERROR] Database file not found: {db_path}")
+    exit(1)
+
+print(f"[INFO] Connecting to database: {db_path}")
+
+try:
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+    
+    # Check if column already exists
+    cursor.execute("PRAGMA table_info(documents)")
+    columns = [col[1] for col in cursor.fetchall()]
+    
+    if "image_hash" in columns:
+        print("[OK] Column 'image_hash' already exists in documents table")
+    else:
+        print("[INFO] Adding 'image_hash' column to documents table...")
+        cursor.execute("""
+            ALTER TABLE documents 
+            ADD COLUMN image_hash BIGINT
+        """)
+        conn.commit()
+        print("[OK] Column 'image_hash' added (existing documents are hashed on their next upload)")
+    
+    conn.close()
+    print("[OK] Migration completed successfully")
+    
+except Exception as e:
+    print(f"[ERROR] Migration failed: {e}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
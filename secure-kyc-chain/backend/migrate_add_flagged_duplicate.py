@@ -0,0 +1,54 @@
+"""Migration script to add flagged_duplicate column to kyc_applications table"""
+import sqlite3
+from pathlib import Path
+
+# Get database path
+db_path = Path(__file__).parent / "kyc.db"
+
+if not db_path.exists():
+    print(f"[ERROR] Database file not found: {db_path}")
+    exit(1)
+
+print(f"[INFO] Connecting to database: {db_path}")
+
+try:
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+    
+    # Check if column already exists
+    cursor.execute("PRAGMA table_info(kyc_applications)")
+    columns = [col[1] for col in cursor.fetchall()]
+    
+    if "flagged_duplicate" in columns:
+        print("[OK] Column 'flagged_duplicate' already exists in kyc_applications table")
+    else:
+        print("[INFO] Adding 'flagged_duplicate' column to kyc_applications table...")
+        cursor.execute("""
+            ALTER TABLE kyc_applications 
+            ADD COLUMN flagged_duplicate BOOLEAN NOT NULL DEFAULT 0
+        """)
+        
+        # Backfill from the reviewer comments previously used to flag duplicates
+        cursor.execute("""
+            UPDATE kyc_applications 
+            SET flagged_duplicate = 1 
+            WHERE reviewer_comment LIKE '%duplicate%'
+        """)
+        print(f"[OK] Column 'flagged_duplicate' added, {cursor.rowcount} application(s) flagged")
+    
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_kyc_flagged_dup 
+        ON kyc_applications (flagged_duplicate) 
+        WHERE flagged_duplicate = 1
+    """)
+    conn.commit()
+    print("[OK] Index 'idx_kyc_flagged_dup' ready")
+    
+    conn.close()
+    print("[OK] Migration completed successfully")
+    
+except Exception as e:
+    print(f"[ERROR] Migration failed: {e}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
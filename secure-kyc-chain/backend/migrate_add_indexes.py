@@ -0,0 +1,39 @@
+"""Migration script to add composite indexes to existing tables"""
+import sqlite3
+from pathlib import Path
+
+# Get database path
+db_path = Path(__file__).parent / "kyc.db"
+
+# (index name, table, columns) - keep in sync with __table_args__ in app/db/models.py
+INDEXES = [
+    ("idx_users_role_created", "users", "role, created_at"),
+    ("idx_consent_kyc_inst_purpose", "consent_records", "kyc_id, institution_id, purpose"),  # made unique by migrate_unique_consent_records.py
+    ("idx_documents_kyc_type", "documents", "kyc_id, doc_type"),
+    ("idx_verifications_kyc", "verifications", "kyc_id"),
+]
+
+if not db_path.exists():
+    print(f"[ERROR] Database file not found: {db_path}")
+    exit(1)
+
+print(f"[INFO] Connecting to database: {db_path}")
+
+try:
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+    
+    for name, table, columns in INDEXES:
+        print(f"[INFO] Creating index '{name}' on {table} ({columns})...")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+        print(f"[OK] Index '{name}' ready")
+    
+    conn.commit()
+    conn.close()
+    print("[OK] Migration completed successfully")
+    
+except Exception as e:
+    print(f"[ERROR] Migration failed: {e}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
@@ -0,0 +1,43 @@
+"""Migration script to lowercase stored user emails (logins look up lowercased emails)"""
+import sqlite3
+from pathlib import Path
+
+# Get database path
+db_path = Path(__file__).parent / "kyc.db"
+
+if not db_path.exists():
+    print(f"[ERROR] Database file not found: {db_path}")
+    exit(1)
+
+print(f"[INFO] Connecting to database: {db_path}")
+
+try:
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+    
+    # Refuse to merge accounts that only differ by case
+    cursor.execute("""
+        SELECT LOWER(email) FROM users
+        GROUP BY LOWER(email) HAVING COUNT(*) > 1
+    """)
+    conflicts = [row[0] for row in cursor.fetchall()]
+    
+    if conflicts:
+        print("[ERROR] These emails exist in more than one letter case; resolve them manually:")
+        for email in conflicts:
+            print(f"  - {email}")
+        conn.close()
+        exit(1)
+    
+    cursor.execute("UPDATE users SET email = LOWER(email) WHERE email != LOWER(email)")
+    conn.commit()
+    print(f"[OK] Lowercased {cursor.rowcount} email(s)")
+    
+    conn.close()
+    print("[OK] Migration completed successfully")
+    
+except Exception as e:
+    print(f"[ERROR] Migration failed: {e}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
@@ -0,0 +1,51 @@
+"""Migration script to make consent records unique per (kyc_id, institution_id, purpose)"""
+import sqlite3
+from pathlib import Path
+
+# Get database path
+db_path = Path(__file__).parent / "kyc.db"
+
+if not db_path.exists():
+    print(f"[ERROR] Database file not found: {db_path}")
+    exit(1)
+
+print(f"[INFO] Connecting to database: {db_path}")
+
+try:
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+    
+    # Keep one record per triple: granted consent first, then the latest expiry, then the newest
+    print("[INFO] Removing duplicate consent records...")
+    cursor.execute("""
+        DELETE FROM consent_records
+        WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY kyc_id, institution_id, purpose
+                    ORDER BY consent_given DESC, expires_at DESC, created_at DESC
+                ) AS rank
+                FROM consent_records
+            )
+            WHERE rank = 1
+        )
+    """)
+    print(f"[OK] Removed {cursor.rowcount} duplicate consent records")
+    
+    print("[INFO] Recreating 'idx_consent_kyc_inst_purpose' as a unique index...")
+    cursor.execute("DROP INDEX IF EXISTS idx_consent_kyc_inst_purpose")
+    cursor.execute("""
+        CREATE UNIQUE INDEX idx_consent_kyc_inst_purpose
+        ON consent_records (kyc_id, institution_id, purpose)
+    """)
+    conn.commit()
+    print("[OK] Index 'idx_consent_kyc_inst_purpose' is unique")
+    
+    conn.close()
+    print("[OK] Migration completed successfully")
+    
+except Exception as e:
+    print(f"[ERROR] Migration failed: {e}")
+    import traceback
+    traceback.print_exc()
+    exit(1)
@@ -10,9 +10,13 @@ import sys
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.db.database import Base, get_db
+# Use the minimum bcrypt cost so password hashing doesn't dominate test time
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from app.db.database import Base, get_db, json_serializer, json_deserializer
 from app.db.models import User
 from app.core.security import get_password_hash
+from app.services.cache_service import cache_service
 from main import app
 
 # Use in-memory SQLite for testing
@@ -22,13 +26,16 @@ engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
+    json_serializer=json_serializer,
+    json_deserializer=json_deserializer,
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
 @pytest.fixture(scope="function")
 def db():
-    """Create a fresh database for each test"""
+    """Create a fresh database (and empty cache) for each test"""
+    cache_service.clear()
     Base.metadata.create_all(bind=engine)
     db = TestingSessionLocal()
     try:
@@ -38,16 +45,29 @@ def db():
         Base.metadata.drop_all(bind=engine)
 
 
+# Modules whose background tasks open their own session with SessionLocal
+TASK_SESSION_MODULES = (
+    "app.api.v1.endpoints.admin",
+    "app.api.v1.endpoints.institution",
+    "app.services.review_service",
+)
+
+
 @pytest.fixture(scope="function")
-def client(db):
+def client(db, monkeypatch):
     """Create a test client with database override"""
     def override_get_db():
+        # Each request sees rows committed by other sessions (e.g. background tasks),
+        # as it would with the fresh session get_db opens
+        db.expire_all()
         try:
             yield db
         finally:
             pass
     
     app.dependency_overrides[get_db] = override_get_db
+    for module in TASK_SESSION_MODULES:
+        monkeypatch.setattr(f"{module}.SessionLocal", TestingSessionLocal)
     test_client = TestClient(app)
     yield test_client
     app.dependency_overrides.clear()
@@ -1,7 +1,7 @@
 """Test admin application endpoints"""
 import pytest
 from fastapi import status
-from app.db.models import KYCApplication, Document
+from app.db.models import KYCApplication, Document, Verification
 from datetime import datetime
 
 
@@ -98,11 +98,41 @@ def test_approve_application_success(client, db, admin_headers, test_user):
         headers=admin_headers,
         json={"comment": "Approved by admin"}
     )
-    assert response.status_code == status.HTTP_200_OK
+    assert response.status_code == status.HTTP_202_ACCEPTED
     
-    # Verify status changed
+    # Verify status changed and the background task recorded the block
     db.refresh(kyc_app)
     assert kyc_app.status == "VERIFIED"
+    assert kyc_app.blockchain_tx_hash is not None
+
+
+def test_approve_application_retries_ukn_collision(client, db, admin_headers, test_user, monkeypatch):
+    """Test a generated UKN that is already issued is retried instead of failing the approval"""
+    from app.core.security import get_password_hash
+    from app.db.models import User
+    from app.services import ukn_service
+    other_user = User(email="holder@example.com", hashed_password=get_password_hash("pass123"), role="user")
+    db.add(other_user)
+    db.flush()
+    db.add(KYCApplication(user_id=other_user.id, status="VERIFIED", ukn="KYC-AAAA-AAAA-AAAA"))
+    kyc_app = KYCApplication(user_id=test_user.id, status="IN_REVIEW")
+    db.add(kyc_app)
+    db.commit()
+    
+    generated = iter(["KYC-AAAA-AAAA-AAAA", "KYC-BBBB-BBBB-BBBB"])
+    monkeypatch.setattr(ukn_service, "generate_ukn", lambda: next(generated))
+    
+    response = client.post(
+        f"/api/v1/admin/applications/{kyc_app.id}/approve",
+        headers=admin_headers,
+        json={"comment": "Approved by admin"}
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    
+    db.refresh(kyc_app)
+    assert kyc_app.status == "VERIFIED"
+    assert kyc_app.ukn == "KYC-BBBB-BBBB-BBBB"
+    assert kyc_app.reviewer_comment == "Approved by admin"
 
 
 def test_reject_application_success(client, db, admin_headers, test_user):
@@ -116,7 +146,7 @@ def test_reject_application_success(client, db, admin_headers, test_user):
         headers=admin_headers,
         json={"comment": "Rejected: Invalid documents"}
     )
-    assert response.status_code == status.HTTP_200_OK
+    assert response.status_code == status.HTTP_202_ACCEPTED
     
     # Verify status changed
     db.refresh(kyc_app)
@@ -124,6 +154,34 @@ def test_reject_application_success(client, db, admin_headers, test_user):
     assert "Invalid documents" in kyc_app.reviewer_comment
 
 
+@pytest.mark.parametrize("action,failed_event", [("approve", "verification"), ("reject", "rejection")])
+def test_review_record_failure_is_audited(client, db, admin_headers, test_user, monkeypatch, action, failed_event):
+    """Test a failed background write for a review decision leaves an audit record instead of only a log line"""
+    from app.db.models import AuditRecord
+    
+    def fail_write(db, verifications, audit_events):
+        raise RuntimeError("database unavailable")
+    
+    monkeypatch.setattr("app.services.review_service.write_review_records", fail_write)
+    monkeypatch.setattr("app.api.v1.endpoints.admin.write_review_records", fail_write)
+    
+    kyc_app = KYCApplication(user_id=test_user.id, status="IN_REVIEW")
+    db.add(kyc_app)
+    db.commit()
+    
+    response = client.post(
+        f"/api/v1/admin/applications/{kyc_app.id}/{action}",
+        headers=admin_headers,
+        json={"comment": "Reviewed"}
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    
+    assert db.query(Verification).filter(Verification.kyc_id == kyc_app.id).count() == 0
+    failure = db.query(AuditRecord).filter(AuditRecord.entity_id == kyc_app.id).one()
+    assert failure.details["failed_event"] == failed_event
+    assert failure.details["error"] == "database unavailable"
+
+
 def test_get_review_queue(client, db, admin_headers, test_user):
     """Test getting review queue"""
     # Create a second user for second application (user_id is unique)
@@ -209,3 +267,33 @@ def test_large_batch_insert(client, db, admin_headers, test_user):
     # Should handle large batch (may be paginated)
     assert isinstance(data, list)
 
+
+
+def test_get_audit_trail(client, db, admin_headers, test_user):
+    """Test audit trail lists logged events newest first"""
+    kyc_app = KYCApplication(user_id=test_user.id, status="IN_REVIEW")
+    db.add(kyc_app)
+    db.commit()
+    kyc_id = kyc_app.id
+    
+    response = client.post(
+        f"/api/v1/admin/applications/{kyc_id}/reject",
+        headers=admin_headers,
+        json={"comment": "Rejected: Blurry scan"}
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    
+    response = client.get("/api/v1/admin/audit-trail", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert isinstance(data, list)
+    assert len(data) == 1
+    assert data[0]["entity_id"] == kyc_id
+    assert data[0]["details"]["reason"] == "Rejected: Blurry scan"
+    
+    verification = db.query(Verification).filter(Verification.kyc_id == kyc_id).one()
+    assert verification.event_type == "rejection"
+    assert verification.tx_hash == data[0]["tx_hash"]
+    
+    response = client.get("/api/v1/admin/audit-trail?skip=1", headers=admin_headers)
+    assert response.json() == []
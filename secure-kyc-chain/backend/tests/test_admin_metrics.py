@@ -44,3 +44,35 @@ def test_get_metrics_success(client, db, admin_headers, test_user):
     assert isinstance(data["total_applications"], int)
     assert data["total_applications"] >= 3
 
+
+
+def test_get_metrics_counts(client, db, admin_headers, test_user):
+    """Test metrics count each status bucket and average the risk scores"""
+    from app.core.security import get_password_hash
+    users = [
+        User(
+            email=f"metrics_count{i}@example.com",
+            hashed_password=get_password_hash("pass123"),
+            role="user"
+        )
+        for i in range(3)
+    ]
+    db.add_all(users)
+    db.flush()
+    
+    db.add_all([
+        KYCApplication(user_id=test_user.id, status="VERIFIED", risk_score=0.1),
+        KYCApplication(user_id=users[0].id, status="VERIFIED", risk_score=0.5),
+        KYCApplication(user_id=users[1].id, status="IN_REVIEW", risk_score=0.6),
+        KYCApplication(user_id=users[2].id, status="REJECTED"),
+    ])
+    db.commit()
+    
+    response = client.get("/api/v1/admin/metrics", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["total_applications"] == 4
+    assert data["auto_approved"] == 1
+    assert data["manual_reviews"] == 1
+    assert data["rejected"] == 1
+    assert data["avg_risk_score"] == pytest.approx(0.4)
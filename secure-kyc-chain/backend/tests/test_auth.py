@@ -88,3 +88,106 @@ def test_get_me_invalid_token(client):
     response = client.get("/api/v1/auth/me", headers=headers)
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
+
+
+def test_current_user_same_on_cache_hit(db, test_user):
+    """Test the authenticated principal is the same plain value whether or not the user lookup is cached"""
+    from app.core.security import CurrentUser, create_access_token, get_current_user
+    
+    token = create_access_token(data={"sub": test_user.email})
+    uncached = get_current_user(token=token, db=db)
+    cached = get_current_user(token=token, db=db)
+    
+    assert isinstance(uncached, CurrentUser)
+    assert cached == uncached
+    assert (cached.id, cached.email, cached.role) == (test_user.id, test_user.email, "user")
+
+
+def test_new_token_not_served_cached_principal(db, test_user):
+    """Test the user lookup is cached per token, so a token issued after a role change sees the new role"""
+    from datetime import datetime, timedelta
+    from jose import jwt
+    from app.core.config import settings
+    from app.core.security import create_access_token, get_current_user
+    
+    old_token = create_access_token(data={"sub": test_user.email})
+    assert get_current_user(token=old_token, db=db).role == "user"
+    
+    test_user.role = "reviewer"
+    db.commit()
+    
+    new_token = jwt.encode(
+        {"sub": test_user.email, "iat": datetime.utcnow() + timedelta(seconds=1), "exp": datetime.utcnow() + timedelta(minutes=5)},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM
+    )
+    assert get_current_user(token=new_token, db=db).role == "reviewer"
+
+
+def test_login_email_case_insensitive(client, test_user):
+    """Test login matches the stored email regardless of input case"""
+    response = client.post("/api/v1/auth/login", json={
+        "email": test_user.email.upper(),
+        "password": "testpass123"
+    })
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["success"] == True
+
+
+def test_register_normalizes_email(client):
+    """Test registration stores the email lowercased"""
+    response = client.post("/api/v1/auth/register", json={
+        "email": "MixedCase@Example.com",
+        "password": "password123",
+        "role": "user"
+    })
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["email"] == "mixedcase@example.com"
+
+
+def test_deleted_user_token_rejected(client, auth_headers, admin_headers, test_user):
+    """Test a deleted user's token stops working even after a cached lookup"""
+    response = client.get("/api/v1/auth/me", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    
+    response = client.delete(f"/api/v1/admin/users/{test_user.id}", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    
+    response = client.get("/api/v1/auth/me", headers=auth_headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_admin_create_user(client, admin_headers):
+    """Test admin can create a reviewer account"""
+    response = client.post("/api/v1/admin/users", headers=admin_headers, json={
+        "email": "NewReviewer@example.com",
+        "password": "reviewpass123",
+        "role": "reviewer"
+    })
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["email"] == "newreviewer@example.com"
+    assert data["role"] == "reviewer"
+
+
+def test_admin_create_user_invalid_role(client, admin_headers):
+    """Test admin user creation rejects unknown roles"""
+    response = client.post("/api/v1/admin/users", headers=admin_headers, json={
+        "email": "someone@example.com",
+        "password": "password123",
+        "role": "superuser"
+    })
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_admin_list_users(client, admin_headers, test_user, test_reviewer):
+    """Test admin user listing filters by role and paginates"""
+    response = client.get("/api/v1/admin/users?role_filter=reviewer", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [user["email"] for user in data] == ["reviewer@example.com"]
+    assert "hashed_password" not in data[0]
+    
+    response = client.get("/api/v1/admin/users?limit=2", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 2
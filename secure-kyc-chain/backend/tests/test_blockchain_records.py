@@ -60,3 +60,25 @@ def test_blockchain_hash_mismatch(client, db, admin_headers, test_user):
     # May return 400 for invalid format or 404 for not found
     assert response.status_code in [status.HTTP_400_BAD_REQUEST, status.HTTP_404_NOT_FOUND]
 
+
+
+def test_blockchain_records_include_block(client, db, admin_headers, test_user):
+    """Test approved applications are listed with their blockchain block"""
+    kyc_app = KYCApplication(user_id=test_user.id, status="IN_REVIEW")
+    db.add(kyc_app)
+    db.commit()
+    
+    response = client.post(
+        f"/api/v1/admin/applications/{kyc_app.id}/approve",
+        headers=admin_headers,
+        json={"comment": "Approved"}
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    ukn = response.json()["ukn"]
+    
+    response = client.get("/api/v1/admin/blockchain-records", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["blockchain_block"]["data"]["ukn"] == ukn
+    assert data[0]["blockchain_block"]["tx_hash"] == data[0]["blockchain_tx_hash"]
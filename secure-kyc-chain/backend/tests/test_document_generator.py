@@ -0,0 +1,79 @@
+"""Test document list generator endpoints"""
+import pytest
+from fastapi import status
+from app.db.models import KYCApplication
+
+
+def test_generate_document_list_married_loan(client, db, auth_headers, test_user):
+    """Test married loan applicants get marriage and income proof requirements"""
+    response = client.post("/api/v1/documents/generate-document-list", headers=auth_headers, json={
+        "name": "Test User",
+        "date_of_birth": "1990-05-17",
+        "gender": "FEMALE",
+        "marital_status": "MARRIED",
+        "purpose": "LOAN"
+    })
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    doc_types = [doc["doc_type"] for doc in data["mandatory_documents"]]
+    assert doc_types == ["IDENTITY_DOC", "ADDRESS_PROOF", "MARRIAGE_CERTIFICATE", "INCOME_PROOF", "SELFIE"]
+    assert data["optional_documents"] == []
+    assert len(data["auto_extracted_details"]) == 6
+    assert data["user_inputs"]["date_of_birth"] == "1990-05-17"
+    
+    kyc_app = db.query(KYCApplication).filter(KYCApplication.user_id == test_user.id).one()
+    assert kyc_app.user_details["purpose"] == "LOAN"
+    assert kyc_app.user_details["date_of_birth"] == "1990-05-17"
+
+
+def test_generate_document_list_invalid_gender(client, auth_headers):
+    """Test unknown gender values are rejected"""
+    response = client.post("/api/v1/documents/generate-document-list", headers=auth_headers, json={
+        "name": "Test User",
+        "date_of_birth": "1990-05-17",
+        "gender": "UNKNOWN",
+        "marital_status": "SINGLE",
+        "purpose": "GENERAL"
+    })
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_generate_document_list_purpose_case_insensitive(client, auth_headers):
+    """Test purpose/marital lookups ignore case"""
+    response = client.post("/api/v1/documents/generate-document-list", headers=auth_headers, json={
+        "name": "Test User",
+        "date_of_birth": "1990-05-17",
+        "gender": "male",
+        "marital_status": "single",
+        "purpose": "health"
+    })
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    doc_types = [doc["doc_type"] for doc in data["mandatory_documents"]]
+    assert doc_types == ["IDENTITY_DOC", "ADDRESS_PROOF", "MEDICAL_CERTIFICATE", "SELFIE"]
+    assert data["user_inputs"]["gender"] == "MALE"
+
+
+def test_generate_document_list_invalid_date(client, auth_headers):
+    """Test malformed dates of birth fail request validation"""
+    response = client.post("/api/v1/documents/generate-document-list", headers=auth_headers, json={
+        "name": "Test User",
+        "date_of_birth": "17/05/1990",
+        "gender": "MALE",
+        "marital_status": "SINGLE",
+        "purpose": "GENERAL"
+    })
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_generate_document_list_unknown_field(client, auth_headers):
+    """Test unexpected input fields are rejected"""
+    response = client.post("/api/v1/documents/generate-document-list", headers=auth_headers, json={
+        "name": "Test User",
+        "date_of_birth": "1990-05-17",
+        "gender": "MALE",
+        "marital_status": "SINGLE",
+        "purpose": "GENERAL",
+        "nationality": "IN"
+    })
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
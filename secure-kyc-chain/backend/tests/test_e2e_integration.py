@@ -93,7 +93,7 @@ def test_full_kyc_workflow(client, db):
                 json={"comment": "E2E test approval"}
             )
             # Approval should work if admin auth works
-            if approve_response.status_code == status.HTTP_200_OK:
+            if approve_response.status_code == status.HTTP_202_ACCEPTED:
                 # Step 7: Verify blockchain hash stored
                 db.refresh(kyc_app)
                 assert kyc_app.status == "VERIFIED"
@@ -129,3 +129,30 @@ def test_full_kyc_workflow(client, db):
                         status.HTTP_403_FORBIDDEN
                     ]
 
+
+
+def test_db_health_check(client):
+    """Test the database health check runs a query"""
+    response = client.get("/health/db")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"status": "healthy"}
+
+
+def test_db_health_check_hides_driver_error(client):
+    """Test a failing database check does not leak the driver's error text"""
+    from main import app
+    from app.db.database import get_db
+    
+    class BrokenSession:
+        def execute(self, *args, **kwargs):
+            raise RuntimeError("could not connect to server at db.internal:5432 as kyc_admin")
+    
+    previous = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = lambda: BrokenSession()
+    try:
+        response = client.get("/health/db")
+    finally:
+        app.dependency_overrides[get_db] = previous
+    
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json() == {"detail": "Database unavailable"}
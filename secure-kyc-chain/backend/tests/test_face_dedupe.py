@@ -64,3 +64,129 @@ def test_face_dedupe_false_positive(client, db, admin_headers, test_user):
     # Should return both applications
     assert len(data) >= 2
 
+
+
+def test_face_dedupe_duplicate_count(client, db, admin_headers, test_user):
+    """Test queue entries report verified applications sharing their face hash"""
+    from app.core.security import get_password_hash
+    user2 = User(
+        email="dedupe_user2@example.com",
+        hashed_password=get_password_hash("pass123"),
+        role="user"
+    )
+    db.add(user2)
+    db.flush()
+    
+    verified_app = KYCApplication(
+        user_id=test_user.id,
+        status="VERIFIED",
+        face_embedding_hash="shared_hash",
+        ukn="KYC-AAAA-BBBB-CCCC"
+    )
+    pending_app = KYCApplication(
+        user_id=user2.id,
+        status="IN_REVIEW",
+        face_embedding_hash="shared_hash"
+    )
+    db.add_all([verified_app, pending_app])
+    db.commit()
+    
+    response = client.get("/api/v1/admin/face-dedupe-queue", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["id"] == pending_app.id
+    assert data[0]["duplicate_count"] == 1
+    assert data[0]["existing_ukn"] == "KYC-AAAA-BBBB-CCCC"
+
+
+def test_face_dedupe_queue_includes_flagged(client, db, admin_headers, test_user):
+    """Test applications flagged as duplicates are queued even without a face hash"""
+    kyc_app = KYCApplication(
+        user_id=test_user.id,
+        status="IN_REVIEW",
+        flagged_duplicate=True,
+        reviewer_comment="Potential duplicate detected. Existing UKN: KYC-1111-2222-3333"
+    )
+    db.add(kyc_app)
+    db.commit()
+    
+    response = client.get("/api/v1/admin/face-dedupe-queue", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [item["id"] for item in data] == [kyc_app.id]
+
+
+def test_search_similar_ranks_nearest_faces():
+    """Test the similarity index returns the closest stored embeddings first"""
+    import numpy as np
+    from app.services.face_dedupe_service import FaceDedupeService
+    
+    service = FaceDedupeService()
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=512)
+    service.store_embedding("same-person", base + rng.normal(scale=0.05, size=512))
+    for i in range(100):  # Enough to force the index to grow
+        service.store_embedding(f"other-{i}", rng.normal(size=512))
+    service.store_embedding("current", base)
+    
+    results = service.search_similar(base, k=3, exclude=["current"])
+    assert len(results) == 3
+    assert results[0][0] == "same-person"
+    assert results[0][1] >= service.similarity_threshold
+    assert results[1][1] < service.similarity_threshold
+    
+    # Re-storing a key replaces its vector rather than adding a second row
+    service.store_embedding("same-person", rng.normal(size=512))
+    assert service.search_similar(base, k=1, exclude=["current"])[0][0] != "same-person"
+    assert service.search_similar(np.zeros(512)) == []
+    
+    # With a threshold and no k, every match is returned, however many there are
+    for i in range(8):
+        service.store_embedding(f"copy-{i}", base + rng.normal(scale=0.01, size=512))
+    matches = service.search_similar(base, k=None, exclude=["current"], min_similarity=service.similarity_threshold)
+    assert {key for key, _ in matches} == {f"copy-{i}" for i in range(8)}
+    assert all(similarity >= service.similarity_threshold for _, similarity in matches)
+
+
+def test_check_duplicate_vectorized():
+    """Test check_duplicate finds the best match in explicit lists and in the stored index"""
+    import numpy as np
+    from app.services.face_dedupe_service import FaceDedupeService
+    
+    service = FaceDedupeService()
+    rng = np.random.default_rng(1)
+    base = rng.normal(size=512)
+    others = [rng.normal(size=512) for _ in range(20)]
+    
+    ukns = [f"KYC-{i}" for i in range(20)] + ["KYC-match", "KYC-empty"]
+    embeddings = others + [base * 3, np.zeros(512)]  # Scale must not matter; a zero vector never matches
+    is_duplicate, matched_ukn, similarity = service.check_duplicate(base, ukns, embeddings)
+    assert is_duplicate and matched_ukn == "KYC-match"
+    assert similarity == pytest.approx(1.0, abs=1e-5)
+    
+    assert service.check_duplicate(base, ukns[:20], others)[:2] == (False, None)
+    assert service.check_duplicate(base, [], []) == (False, None, 0.0)
+    
+    # Without lists, the stored index is searched
+    assert service.check_duplicate(base) == (False, None, 0.0)
+    service.store_embedding("KYC-stored", base + rng.normal(scale=0.05, size=512))
+    is_duplicate, matched_ukn, _ = service.check_duplicate(base)
+    assert is_duplicate and matched_ukn == "KYC-stored"
+
+
+def test_store_embedding_keeps_float32():
+    """Test stored embeddings read back as contiguous float32 unit vectors whatever the model returned"""
+    import numpy as np
+    from app.services.face_dedupe_service import FaceDedupeService
+    
+    service = FaceDedupeService()
+    embedding = np.arange(1024, dtype=np.float64)[::2]  # float64, non-contiguous view
+    service.store_embedding("KYC-1", embedding)
+    
+    stored = service.get_embedding("KYC-1")
+    assert stored.dtype == np.float32
+    assert stored.flags["C_CONTIGUOUS"]
+    expected = embedding / np.linalg.norm(embedding)
+    assert np.allclose(stored, expected, atol=1e-3)
+    assert service.get_embedding("KYC-missing") is None
@@ -1,7 +1,8 @@
 """Test KYC user workflow"""
 import pytest
 from fastapi import status
-from app.db.models import KYCApplication, Document
+from app.db.models import KYCApplication, Document, Verification, ConsentRecord
+import hashlib
 import io
 
 
@@ -39,6 +40,88 @@ def test_upload_document_success(client, db, auth_headers, test_user):
     assert response.status_code in [status.HTTP_200_OK, status.HTTP_400_BAD_REQUEST, status.HTTP_500_INTERNAL_SERVER_ERROR]
 
 
+
+def test_upload_document_hash(client, db, auth_headers, test_user, tmp_path, monkeypatch):
+    """Test a streamed upload is written to disk intact with its SHA-256 hash"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    kyc_app = KYCApplication(user_id=test_user.id, status="REGISTERED")
+    db.add(kyc_app)
+    db.commit()
+    
+    content = b"utility bill " * 60000  # spans several upload chunks
+    response = client.post(
+        "/api/v1/kyc/documents/upload",
+        headers=auth_headers,
+        files={"file": ("bill.jpg", io.BytesIO(content), "image/jpeg")},
+        data={"doc_type": "UTILITY_BILL"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["file_hash"] == hashlib.sha256(content).hexdigest()
+    saved = tmp_path / kyc_app.id / data["file_path"].rsplit("/", 1)[-1]
+    assert saved.read_bytes() == content
+    
+    # Upload events reference the document instead of copying its analysis
+    verification = db.query(Verification).filter(Verification.event_type == "document_upload").one()
+    assert verification.details["document_id"] == data["id"]
+    assert "transaction_analysis" not in verification.details
+    assert verification.details["transaction_analysis_hash"].startswith("sha256:")
+
+
+def test_upload_near_identical_image_runs_ocr_again(client, db, auth_headers, test_user, tmp_path, monkeypatch):
+    """Test a visually near-identical re-upload (e.g. a corrected document) is not given the earlier extraction"""
+    from PIL import Image
+    from app.core.config import settings
+    from app.services.document_service import document_service
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    ocr_results = iter([{"name": "Old Name"}, {"name": "Corrected Name"}])
+    monkeypatch.setattr(document_service, "extract_text_from_image", lambda path: next(ocr_results))
+    kyc_app = KYCApplication(user_id=test_user.id, status="REGISTERED")
+    db.add(kyc_app)
+    db.commit()
+    
+    gradient = Image.radial_gradient("L").resize((320, 200)).convert("RGB")
+    uploads = []
+    for quality in (95, 60):  # same picture, different bytes
+        buffer = io.BytesIO()
+        gradient.save(buffer, format="JPEG", quality=quality)
+        response = client.post(
+            "/api/v1/kyc/documents/upload",
+            headers=auth_headers,
+            files={"file": ("id.jpg", io.BytesIO(buffer.getvalue()), "image/jpeg")},
+            data={"doc_type": "PASSPORT"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        uploads.append(response.json())
+    
+    assert uploads[0]["file_hash"] != uploads[1]["file_hash"]
+    assert [upload["extracted_data"]["name"] for upload in uploads] == ["Old Name", "Corrected Name"]
+
+
+def test_ocr_cached_by_file_hash(client, db, auth_headers, test_user, tmp_path, monkeypatch):
+    """Test the same file uploaded as another document type is not run through OCR again"""
+    from app.core.config import settings
+    from app.services.document_service import document_service
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    ocr_calls = []
+    monkeypatch.setattr(
+        document_service, "extract_text_from_image",
+        lambda path: ocr_calls.append(path) or {"name": "Test User"}
+    )
+    
+    for doc_type in ("PASSPORT", "NATIONAL_ID"):
+        response = client.post(
+            "/api/v1/kyc/documents/upload",
+            headers=auth_headers,
+            files={"file": ("id.jpg", io.BytesIO(b"same scan bytes"), "image/jpeg")},
+            data={"doc_type": doc_type}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["extracted_data"] == {"name": "Test User"}
+    
+    assert len(ocr_calls) == 1
+
 def test_get_my_application(client, db, auth_headers, test_user):
     """Test user can get their own application"""
     kyc_app = KYCApplication(user_id=test_user.id, status="REGISTERED")
@@ -51,6 +134,21 @@ def test_get_my_application(client, db, auth_headers, test_user):
     assert data["user_id"] == test_user.id
 
 
+def test_get_application_by_id(client, db, auth_headers, test_user):
+    """Test fetching an application by ID includes its documents and owner email"""
+    kyc_app = KYCApplication(user_id=test_user.id, status="UPLOADED")
+    db.add(kyc_app)
+    db.flush()
+    db.add(Document(kyc_id=kyc_app.id, doc_type="PASSPORT", file_path="/uploads/passport.jpg", file_hash="abc"))
+    db.commit()
+    
+    response = client.get(f"/api/v1/kyc/applications/{kyc_app.id}", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["user_email"] == test_user.email
+    assert [doc["doc_type"] for doc in data["documents"]] == ["PASSPORT"]
+
+
 def test_process_application(client, db, auth_headers, test_user):
     """Test processing KYC application"""
     kyc_app = KYCApplication(user_id=test_user.id, status="UPLOADED")
@@ -71,3 +169,455 @@ def test_process_application(client, db, auth_headers, test_user):
     # Processing may take time or fail due to OCR/ML, but endpoint should be accessible
     assert response.status_code in [status.HTTP_200_OK, status.HTTP_400_BAD_REQUEST, status.HTTP_500_INTERNAL_SERVER_ERROR]
 
+
+
+def test_process_skips_face_match_without_liveness(client, db, auth_headers, test_user, monkeypatch):
+    """Test a selfie that failed liveness skips face inference and goes to manual review"""
+    from app.services.document_service import document_service
+    from app.services.face_model_service import face_model_service
+    
+    def fail(*args, **kwargs):
+        raise AssertionError("face inference should be skipped")
+    monkeypatch.setattr(document_service, "calculate_face_match", fail)
+    monkeypatch.setattr(face_model_service, "get_embedding", fail)
+    
+    kyc_app = KYCApplication(
+        user_id=test_user.id, status="UPLOADED", reviewer_comment="Transaction document flagged: large_cash_deposits"
+    )
+    db.add(kyc_app)
+    db.flush()
+    db.add_all([
+        Document(kyc_id=kyc_app.id, doc_type="PASSPORT", file_path="/uploads/passport.jpg", file_hash="a"),
+        Document(
+            kyc_id=kyc_app.id, doc_type="SELFIE", file_path="/uploads/selfie.jpg", file_hash="b",
+            extracted_data={"liveness_detected": False, "blink_count": 0}
+        )
+    ])
+    db.commit()
+    
+    response = client.post("/api/v1/kyc/process", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["status"] == "IN_REVIEW"
+    assert data["face_match_score"] is None
+    assert data["ukn"] is None
+    # The liveness note is added to the upload-time comments rather than replacing them
+    assert data["reviewer_comment"].startswith("Transaction document flagged: large_cash_deposits\n")
+    assert "Liveness check failed" in data["reviewer_comment"]
+
+
+def test_process_auto_approval_records_block(client, db, auth_headers, test_user, monkeypatch):
+    """Test a low-risk application is approved and its block is recorded after the response"""
+    from app.services.ml_service import ml_service
+    from tests.conftest import TestingSessionLocal
+    monkeypatch.setattr(ml_service, "calculate_risk_score", lambda **features: (0.1, []))
+    
+    task_sessions = []
+    
+    def tracking_session():
+        session = TestingSessionLocal()
+        task_sessions.append(session)
+        return session
+    
+    monkeypatch.setattr("app.services.review_service.SessionLocal", tracking_session)
+    
+    kyc_app = KYCApplication(user_id=test_user.id, status="UPLOADED")
+    db.add(kyc_app)
+    db.flush()
+    db.add(Document(kyc_id=kyc_app.id, doc_type="PASSPORT", file_path="/uploads/passport.jpg", file_hash="a"))
+    db.commit()
+    
+    response = client.post("/api/v1/kyc/process", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["status"] == "VERIFIED"
+    
+    db.refresh(kyc_app)
+    assert kyc_app.ukn is not None
+    assert kyc_app.blockchain_tx_hash is not None
+    verification = db.query(Verification).filter(Verification.event_type == "auto_verification").one()
+    assert verification.tx_hash == kyc_app.blockchain_tx_hash
+    assert verification.details["ukn"] == kyc_app.ukn
+    
+    # The block is recorded in the task's own session, which is closed afterwards
+    assert len(task_sessions) == 1 and task_sessions[0] is not db
+    assert not task_sessions[0].in_transaction()
+
+
+def _uploaded_application(db, test_user, **fields):
+    kyc_app = KYCApplication(user_id=test_user.id, status="UPLOADED", **fields)
+    db.add(kyc_app)
+    db.flush()
+    db.add(Document(kyc_id=kyc_app.id, doc_type="PASSPORT", file_path="/uploads/passport.jpg", file_hash="a"))
+    db.commit()
+    return kyc_app.id
+
+
+def test_process_commits_processing_before_models(client, db, auth_headers, test_user, monkeypatch):
+    """Test the application is committed as PROCESSING before the models run"""
+    from app.services.ml_service import ml_service
+    kyc_id = _uploaded_application(db, test_user)
+    
+    seen_statuses = []
+    
+    def risk_score(**features):
+        seen_statuses.append(db.query(KYCApplication.status).filter(KYCApplication.id == kyc_id).scalar())
+        return 0.6, []
+    
+    monkeypatch.setattr(ml_service, "calculate_risk_score", risk_score)
+    
+    response = client.post("/api/v1/kyc/process", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert seen_statuses == ["PROCESSING"]
+    assert response.json()["status"] == "IN_REVIEW"
+
+
+def test_process_restores_status_when_models_fail(client, db, auth_headers, test_user, monkeypatch):
+    """Test a crash during inference does not leave the application stuck in PROCESSING"""
+    from app.services.validation_service import validation_service
+    kyc_id = _uploaded_application(db, test_user, user_details={"full_name": "Test User"})
+    
+    def crash(**kwargs):
+        raise RuntimeError("model crashed")
+    
+    monkeypatch.setattr(validation_service, "validate_user_details", crash)
+    monkeypatch.setattr(
+        "app.api.v1.endpoints.kyc.document_service.extract_text_cached", lambda path, file_hash: {}
+    )
+    
+    with pytest.raises(RuntimeError):
+        client.post("/api/v1/kyc/process", headers=auth_headers)
+    
+    assert db.query(KYCApplication.status).filter(KYCApplication.id == kyc_id).scalar() == "UPLOADED"
+
+
+def test_get_my_consents(client, db, auth_headers, test_user, test_institution):
+    """Test consents are listed with the institution's email stored on the record"""
+    kyc_app = KYCApplication(user_id=test_user.id, status="VERIFIED")
+    db.add(kyc_app)
+    db.flush()
+    db.add(ConsentRecord(
+        kyc_id=kyc_app.id, institution_id=test_institution.id,
+        institution_email=test_institution.email, purpose="loan_application"
+    ))
+    # Recorded before institution emails were stored on consents
+    db.add(ConsentRecord(kyc_id=kyc_app.id, institution_id="deleted-institution", purpose="bank_account_opening"))
+    db.commit()
+    
+    response = client.get("/api/v1/kyc/consents", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    names = {consent["purpose"]: consent["institution_name"] for consent in response.json()}
+    assert names == {"loan_application": test_institution.email, "bank_account_opening": "Unknown"}
+
+
+def test_grant_and_revoke_consent(client, db, auth_headers, test_user, test_institution):
+    """Test the user can grant and revoke only their own consents"""
+    kyc_app = KYCApplication(user_id=test_user.id, status="VERIFIED")
+    other_app = KYCApplication(user_id=test_institution.id, status="VERIFIED")
+    db.add_all([kyc_app, other_app])
+    db.flush()
+    consent = ConsentRecord(kyc_id=kyc_app.id, institution_id=test_institution.id, purpose="loan_application")
+    other_consent = ConsentRecord(kyc_id=other_app.id, institution_id=test_institution.id, purpose="loan_application")
+    db.add_all([consent, other_consent])
+    db.commit()
+    
+    response = client.post(f"/api/v1/kyc/consents/{consent.id}/grant", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["consent_id"] == consent.id
+    db.refresh(consent)
+    assert consent.consent_given is True
+    assert consent.accessed_at is not None
+    
+    response = client.post(f"/api/v1/kyc/consents/{consent.id}/revoke", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    db.refresh(consent)
+    assert consent.consent_given is False
+    assert consent.expires_at is not None
+    
+    response = client.post(f"/api/v1/kyc/consents/{other_consent.id}/grant", headers=auth_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_get_my_documents_caches_kyc_id(client, db, auth_headers, test_user):
+    """Test the user's KYC application id is cached after the first lookup"""
+    from app.services.cache_service import cache_service, user_kyc_id_key
+    
+    response = client.get("/api/v1/kyc/documents", headers=auth_headers)
+    assert response.json() == []
+    assert cache_service.get(user_kyc_id_key(test_user.id)) is None
+    
+    kyc_app = KYCApplication(user_id=test_user.id, status="UPLOADED")
+    db.add(kyc_app)
+    db.flush()
+    db.add(Document(kyc_id=kyc_app.id, doc_type="PASSPORT", file_path="/uploads/passport.jpg", file_hash="a"))
+    db.commit()
+    
+    response = client.get("/api/v1/kyc/documents", headers=auth_headers)
+    assert len(response.json()) == 1
+    assert cache_service.get(user_kyc_id_key(test_user.id)) == kyc_app.id
+
+
+def test_process_stores_feature_vector_for_shap(client, db, auth_headers, admin_headers, test_user, monkeypatch):
+    """Test the risk model inputs are stored at scoring time and reused by /shap"""
+    from app.services.ml_service import ml_service
+    kyc_id = _uploaded_application(db, test_user)
+    
+    monkeypatch.setattr(ml_service, "calculate_risk_score", lambda **features: (0.6, []))
+    monkeypatch.setattr(
+        "app.api.v1.endpoints.kyc.document_service.calculate_image_quality", lambda path: 0.75
+    )
+    
+    response = client.post("/api/v1/kyc/process", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    
+    kyc_app = db.query(KYCApplication).filter(KYCApplication.id == kyc_id).one()
+    assert len(kyc_app.feature_vector) == len(ml_service.feature_names)
+    assert kyc_app.feature_vector[ml_service.feature_names.index("id_quality_score")] == 0.75
+    
+    explained = []
+    monkeypatch.setattr(ml_service, "explain", lambda features: explained.append(features.tolist()) or [])
+    
+    response = client.get(f"/api/v1/ml/applications/{kyc_id}/shap", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert explained == [[kyc_app.feature_vector]]
+
+
+def test_shap_served_from_scoring_time(client, db, auth_headers, admin_headers, test_user, monkeypatch):
+    """Test the SHAP explanation is stored with the risk score and /shap does not recompute it"""
+    from app.schemas.kyc import ShapFeature
+    from app.services.ml_service import ml_service
+    kyc_id = _uploaded_application(db, test_user)
+    
+    shap_features = [ShapFeature(feature="id_quality_score", shap_value=0.2, feature_value=0.75)]
+    monkeypatch.setattr(ml_service, "calculate_risk_score", lambda **features: (0.6, shap_features))
+    
+    response = client.post("/api/v1/kyc/process", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    
+    def fail_explain(features):
+        raise AssertionError("SHAP recomputed")
+    
+    monkeypatch.setattr(ml_service, "explain", fail_explain)
+    
+    response = client.get(f"/api/v1/ml/applications/{kyc_id}/shap", headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [feature.model_dump() for feature in shap_features]
+
+
+def test_get_my_documents_etag(client, db, auth_headers, test_user):
+    """Test an unchanged document list is answered with 304 Not Modified"""
+    kyc_id = _uploaded_application(db, test_user)
+    
+    response = client.get("/api/v1/kyc/documents", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["etag"]
+    
+    response = client.get("/api/v1/kyc/documents", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    
+    db.add(Document(kyc_id=kyc_id, doc_type="SELFIE", file_path="/uploads/selfie.jpg", file_hash="b"))
+    db.commit()
+    
+    response = client.get("/api/v1/kyc/documents", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 2
+    assert response.headers["etag"] != etag
+
+
+def test_parse_extracted_text_fields():
+    """Test OCR text is parsed into structured fields"""
+    from app.services.document_service import document_service
+    
+    text = "Full Name: Jane Doe, Date of Birth: 01/02/1990, Passport No. X1234567 Nationality: USA"
+    assert document_service._parse_extracted_text(text, []) == {
+        "name": "Jane Doe",
+        "dob": "01/02/1990",
+        "documentNumber": "X1234567",
+        "nationality": "United States",
+    }
+    
+    assert document_service._parse_extracted_text("Issued in the United Kingdom", [])["nationality"] == "United Kingdom"
+    assert document_service._parse_extracted_text("UK visa, U.S.A. passport", [])["nationality"] == "United States"
+    # Nationality codes must be whole words
+    assert "nationality" not in document_service._parse_extracted_text("Residence: Ukraine", [])
+
+
+def test_liveness_analyzes_frames_in_memory(tmp_path, monkeypatch):
+    """Test video liveness passes decoded frames to blink detection without writing them to disk"""
+    import cv2
+    import numpy as np
+    from app.services.liveness_service import liveness_service
+    
+    video_path = str(tmp_path / "selfie.avi")
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for _ in range(6):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+    
+    ears = iter([0.3, 0.1, 0.1, 0.3, 0.1, 0.3])  # Two separate blinks
+    
+    def fake_blink(image):
+        assert isinstance(image, np.ndarray) and image.shape == (48, 64, 3)
+        ear = next(ears)
+        return {"blink_detected": ear < 0.25, "eye_aspect_ratio": ear, "face_detected": True}
+    
+    def fail_imwrite(*args, **kwargs):
+        raise AssertionError("frame written to disk")
+    
+    monkeypatch.setattr(liveness_service, "_detect_eye_blink_array", fake_blink)
+    monkeypatch.setattr(cv2, "imwrite", fail_imwrite)
+    
+    result = liveness_service.detect_liveness_from_video(video_path)
+    assert result["frames_analyzed"] == 6
+    assert result["blink_count"] == 2
+    assert result["is_live"] is True
+
+
+def test_liveness_detects_faces_on_downscaled_frame(monkeypatch):
+    """Test the dlib detector sees a downscaled frame and rectangles come back at full resolution"""
+    import dlib
+    import numpy as np
+    from app.services.liveness_service import liveness_service, FACE_DETECT_WIDTH
+    
+    seen_shapes = []
+    
+    def fake_detector(gray):
+        seen_shapes.append(gray.shape)
+        return [dlib.rectangle(80, 40, 160, 120)]
+    
+    monkeypatch.setattr(liveness_service, "detector", fake_detector)
+    
+    faces = liveness_service._detect_faces(np.zeros((720, 1280), dtype=np.uint8))
+    assert seen_shapes == [(180, FACE_DETECT_WIDTH)]
+    assert (faces[0].left(), faces[0].top(), faces[0].right(), faces[0].bottom()) == (320, 160, 640, 480)
+    
+    # Frames already small enough are not resized
+    liveness_service._detect_faces(np.zeros((240, 320), dtype=np.uint8))
+    assert seen_shapes[-1] == (240, 320)
+
+
+def test_calculate_ear():
+    """Test the eye aspect ratio of open, closed and degenerate eyes"""
+    import numpy as np
+    from app.services.liveness_service import liveness_service
+    
+    open_eye = np.array([(0, 0), (1, -1), (2, -1), (3, 0), (2, 1), (1, 1)])
+    assert liveness_service._calculate_ear(open_eye) == pytest.approx(2 / 3)
+    
+    closed_eye = [(0, 0), (1, 0), (2, 0), (3, 0), (2, 0), (1, 0)]
+    assert liveness_service._calculate_ear(closed_eye) == 0.0
+    assert liveness_service._calculate_ear([(0, 0)] * 6) == 0.0
+
+
+def test_local_cache_evicts_least_recently_used(monkeypatch):
+    """Test the in-process cache fallback stays bounded, evicting the least recently used entry"""
+    from app.core.config import settings
+    from app.services.cache_service import CacheService
+    
+    monkeypatch.setattr(settings, "LOCAL_CACHE_MAX_ENTRIES", 2)
+    cache = CacheService()
+    cache.set("ocr:a", {"name": "A"}, 60)
+    cache.set("ocr:b", {"name": "B"}, 60)
+    assert cache.get("ocr:a") == {"name": "A"}  # a is now more recent than b
+    
+    cache.set("ocr:c", {"name": "C"}, 60)
+    assert len(cache._store) == 2
+    assert cache.get("ocr:b") is None
+    assert cache.get("ocr:a") == {"name": "A"}
+    assert cache.get("ocr:c") == {"name": "C"}
+
+
+def test_process_finds_verified_duplicate_behind_unverified_faces(client, db, auth_headers, test_user, monkeypatch):
+    """Test a verified duplicate is found even when more than k unverified uploads of the face are closer"""
+    import numpy as np
+    from app.core.security import get_password_hash
+    from app.db.models import User
+    from app.services.document_service import document_service
+    from app.services.face_dedupe_service import FaceDedupeService
+    from app.services.face_model_service import face_model_service
+    from app.services.ml_service import ml_service
+    
+    dedupe = FaceDedupeService()
+    monkeypatch.setattr("app.api.v1.endpoints.kyc.face_dedupe_service", dedupe)
+    
+    rng = np.random.default_rng(2)
+    face = rng.normal(size=512).astype(np.float32)
+    monkeypatch.setattr(face_model_service, "get_embedding", lambda path: face)
+    monkeypatch.setattr(document_service, "calculate_face_match", lambda *args, **kwargs: 0.95)
+    monkeypatch.setattr(ml_service, "calculate_risk_score", lambda **features: (0.1, []))
+    
+    other = User(email="verified@example.com", hashed_password=get_password_hash("pass123"), role="user")
+    db.add(other)
+    db.flush()
+    verified_app = KYCApplication(user_id=other.id, status="VERIFIED", ukn="KYC-AAAA-BBBB-CCCC")
+    db.add(verified_app)
+    db.flush()
+    dedupe.store_embedding(verified_app.id, face + rng.normal(scale=0.2, size=512))
+    for i in range(10):  # Unverified uploads of the same face, all closer than the verified one
+        dedupe.store_embedding(f"draft-{i}", face + rng.normal(scale=0.01, size=512))
+    
+    kyc_id = _uploaded_application(db, test_user)
+    db.add(Document(
+        kyc_id=kyc_id, doc_type="SELFIE", file_path="/uploads/selfie.jpg", file_hash="b",
+        extracted_data={"liveness_detected": True, "blink_count": 1}
+    ))
+    db.commit()
+    
+    response = client.post("/api/v1/kyc/process", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["status"] == "IN_REVIEW"
+    assert data["ukn"] is None
+    assert "KYC-AAAA-BBBB-CCCC" in data["reviewer_comment"]
+    assert db.get(KYCApplication, kyc_id).flagged_duplicate is True
+
+
+def test_liveness_failed_upload_processes_to_review(client, db, auth_headers, test_user, tmp_path, monkeypatch):
+    """Test a selfie video that fails liveness is FLAGGED at upload, then processed into manual review"""
+    from app.core.config import settings
+    from app.services.document_service import document_service
+    from app.services.liveness_service import liveness_service
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(document_service, "extract_text_from_image", lambda path: {"name": "Test User"})
+    monkeypatch.setattr(
+        liveness_service, "detect_liveness_from_video",
+        lambda path: {"is_live": False, "blink_count": 0, "confidence": 0.0, "frames_analyzed": 30}
+    )
+    monkeypatch.setattr(liveness_service, "auto_capture_on_blink", lambda path: None)
+    
+    def fail(*args, **kwargs):
+        raise AssertionError("face inference should be skipped")
+    monkeypatch.setattr(document_service, "calculate_face_match", fail)
+    
+    for doc_type, upload in (
+        ("PASSPORT", ("id.jpg", io.BytesIO(b"passport scan"), "image/jpeg")),
+        ("SELFIE", ("selfie.mp4", io.BytesIO(b"selfie video"), "video/mp4")),
+    ):
+        response = client.post(
+            "/api/v1/kyc/documents/upload", headers=auth_headers, files={"file": upload}, data={"doc_type": doc_type}
+        )
+        assert response.status_code == status.HTTP_200_OK
+    assert db.query(KYCApplication.status).filter(KYCApplication.user_id == test_user.id).scalar() == "FLAGGED"
+    
+    response = client.post("/api/v1/kyc/process", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["status"] == "IN_REVIEW"
+    assert data["face_match_score"] is None
+    assert data["reviewer_comment"].startswith("Liveness check failed: No eye blink detected in video\n")
+    assert data["reviewer_comment"].endswith("Liveness check failed: face matching skipped, manual review required")
+
+
+def test_process_rejects_transaction_flagged_application(client, db, auth_headers, test_user):
+    """Test an application FLAGGED for a suspicious transaction document is not reprocessed"""
+    kyc_app = KYCApplication(user_id=test_user.id, status="FLAGGED")
+    db.add(kyc_app)
+    db.flush()
+    db.add(Document(
+        kyc_id=kyc_app.id, doc_type="BANK_STATEMENT", file_path="/uploads/statement.jpg", file_hash="a",
+        extracted_data={"transaction_analysis": {"is_suspicious": True}}
+    ))
+    db.commit()
+    
+    response = client.post("/api/v1/kyc/process", headers=auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
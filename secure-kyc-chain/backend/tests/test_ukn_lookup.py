@@ -1,7 +1,7 @@
 """Test UKN lookup endpoints"""
 import pytest
 from fastapi import status
-from app.db.models import KYCApplication, User, ConsentRecord
+from app.db.models import KYCApplication, User, ConsentRecord, Document
 from datetime import datetime, timedelta
 
 
@@ -74,7 +74,7 @@ def test_resolve_kyc_expired(client, db, institution_headers, test_user):
     assert response.status_code == status.HTTP_410_GONE
 
 
-def test_request_consent(client, db, institution_headers, test_user):
+def test_request_consent(client, db, institution_headers, test_user, test_institution):
     """Test requesting consent"""
     ukn = "KYC-1234-5678-9012"
     kyc_app = KYCApplication(
@@ -93,6 +93,11 @@ def test_request_consent(client, db, institution_headers, test_user):
     assert response.status_code == status.HTTP_200_OK
     data = response.json()
     assert "consent_id" in data or "message" in data
+    
+    consent = db.query(ConsentRecord).filter(ConsentRecord.id == data["consent_id"]).one()
+    assert consent.consent_given == False
+    assert consent.purpose == "loan_application"
+    assert consent.institution_email == test_institution.email
 
 
 def test_ukn_lookup_without_institution_role(client, auth_headers):
@@ -103,3 +108,208 @@ def test_ukn_lookup_without_institution_role(client, auth_headers):
     )
     assert response.status_code == status.HTTP_403_FORBIDDEN
 
+
+
+def test_validate_consent_after_resolve(client, db, institution_headers, test_user):
+    """Test resolving a UKN grants consent once, which validate-consent then reports"""
+    ukn = "KYC-1234-5678-9012"
+    kyc_app = KYCApplication(
+        user_id=test_user.id,
+        status="VERIFIED",
+        ukn=ukn,
+        verified_at=datetime.utcnow(),
+        expires_at=datetime.utcnow() + timedelta(days=365)
+    )
+    db.add(kyc_app)
+    db.commit()
+    
+    response = client.get(
+        f"/api/v1/institution/validate-consent/{ukn}?purpose=bank_account",
+        headers=institution_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["has_consent"] == False
+    
+    for _ in range(2):
+        response = client.get(
+            f"/api/v1/institution/resolve-kyc/{ukn}?purpose=bank_account",
+            headers=institution_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+    assert db.query(ConsentRecord).filter(ConsentRecord.kyc_id == kyc_app.id).count() == 1
+    
+    response = client.get(
+        f"/api/v1/institution/validate-consent/{ukn}?purpose=bank_account",
+        headers=institution_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["has_consent"] == True
+
+
+def test_resolve_kyc_cached_records_consent_per_purpose(client, db, institution_headers, test_user):
+    """Test a cached UKN summary still records consent for each new purpose"""
+    ukn = "KYC-1234-5678-9012"
+    kyc_app = KYCApplication(
+        user_id=test_user.id,
+        status="VERIFIED",
+        ukn=ukn,
+        verified_at=datetime.utcnow(),
+        expires_at=datetime.utcnow() + timedelta(days=365)
+    )
+    db.add(kyc_app)
+    db.commit()
+    
+    for purpose in ["bank_account", "loan_application"]:
+        response = client.get(
+            f"/api/v1/institution/resolve-kyc/{ukn}?purpose={purpose}",
+            headers=institution_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["ukn"] == ukn
+    
+    purposes = {consent.purpose for consent in db.query(ConsentRecord).filter(ConsentRecord.kyc_id == kyc_app.id)}
+    assert purposes == {"bank_account", "loan_application"}
+
+
+def test_resolve_kyc_verified_details(client, db, institution_headers, test_user):
+    """Test verified name, age and address are taken from the extracted document data"""
+    ukn = "KYC-1234-5678-9012"
+    kyc_app = KYCApplication(
+        user_id=test_user.id,
+        status="VERIFIED",
+        ukn=ukn,
+        verified_at=datetime.utcnow(),
+        expires_at=datetime.utcnow() + timedelta(days=365)
+    )
+    db.add(kyc_app)
+    db.commit()
+    dob = (datetime.utcnow() - timedelta(days=30 * 365 + 30)).strftime("%Y-%m-%d")
+    db.add_all([
+        Document(kyc_id=kyc_app.id, doc_type="SELFIE", file_path="selfie.mp4", file_hash="a",
+                 extracted_data={"name": "Selfie Name"}),
+        Document(kyc_id=kyc_app.id, doc_type="PAN_CARD", file_path="pan.jpg", file_hash="b",
+                 extracted_data={"name": "Asha Rao", "dob": dob}),
+        Document(kyc_id=kyc_app.id, doc_type="UTILITY_BILL", file_path="bill.jpg", file_hash="c",
+                 extracted_data={"name": "Other Name", "address": "12 MG Road, Pune"}),
+    ])
+    db.commit()
+    
+    response = client.get(
+        f"/api/v1/institution/resolve-kyc/{ukn}?purpose=bank_account",
+        headers=institution_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["verified_name"] == "Asha Rao"
+    assert data["verified_age"] == 30
+    assert data["verified_address"] == "12 MG Road, Pune"
+
+
+def test_get_kyc_summary_does_not_create_consent(client, db, institution_headers, test_user):
+    """Test the read-only summary endpoint leaves no consent record behind"""
+    ukn = "KYC-1234-5678-9012"
+    kyc_app = KYCApplication(
+        user_id=test_user.id,
+        status="VERIFIED",
+        ukn=ukn,
+        verified_at=datetime.utcnow(),
+        expires_at=datetime.utcnow() + timedelta(days=365)
+    )
+    db.add(kyc_app)
+    db.commit()
+    
+    response = client.get(f"/api/v1/institution/get-kyc-summary/{ukn}", headers=institution_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["ukn"] == ukn
+    assert db.query(ConsentRecord).filter(ConsentRecord.kyc_id == kyc_app.id).count() == 0
+
+
+def test_request_consent_already_granted(client, db, institution_headers, test_user, test_institution):
+    """Test requesting consent that is already granted returns the existing consent"""
+    ukn = "KYC-1234-5678-9012"
+    kyc_app = KYCApplication(user_id=test_user.id, status="VERIFIED", ukn=ukn, verified_at=datetime.utcnow())
+    db.add(kyc_app)
+    db.commit()
+    consent = ConsentRecord(
+        kyc_id=kyc_app.id,
+        institution_id=test_institution.id,
+        purpose="loan_application",
+        consent_given=True,
+        expires_at=datetime.utcnow() + timedelta(days=30)
+    )
+    db.add(consent)
+    db.commit()
+    
+    response = client.post(
+        f"/api/v1/institution/request-consent/{ukn}?purpose=loan_application",
+        headers=institution_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["message"] == "Consent already granted"
+    assert data["consent_id"] == consent.id
+
+
+def test_resolve_kyc_repeat_lookup_releases_session(client, db, institution_headers, test_user, monkeypatch):
+    """Test repeated lookups don't duplicate consent and each background session is closed"""
+    from tests.conftest import TestingSessionLocal
+    
+    sessions = []
+    
+    def tracking_session():
+        session = TestingSessionLocal()
+        sessions.append(session)
+        return session
+    
+    monkeypatch.setattr("app.api.v1.endpoints.institution.SessionLocal", tracking_session)
+    
+    ukn = "KYC-1234-5678-9012"
+    kyc_app = KYCApplication(user_id=test_user.id, status="VERIFIED", ukn=ukn, verified_at=datetime.utcnow())
+    db.add(kyc_app)
+    db.commit()
+    
+    for _ in range(3):
+        response = client.get(f"/api/v1/institution/resolve-kyc/{ukn}?purpose=bank_account", headers=institution_headers)
+        assert response.status_code == status.HTTP_200_OK
+    
+    assert db.query(ConsentRecord).filter(ConsentRecord.kyc_id == kyc_app.id).count() == 1
+    assert sessions and not any(session.in_transaction() for session in sessions)
+
+
+def test_request_consent_persisted_before_response(client, db, auth_headers, institution_headers, test_user):
+    """Test a requested consent can be granted at once, repeats reuse it, and a revoked one is reopened"""
+    ukn = "KYC-1234-5678-9012"
+    kyc_app = KYCApplication(user_id=test_user.id, status="VERIFIED", ukn=ukn, verified_at=datetime.utcnow())
+    db.add(kyc_app)
+    db.commit()
+    url = f"/api/v1/institution/request-consent/{ukn}?purpose=loan_application"
+    
+    consent_id = client.post(url, headers=institution_headers).json()["consent_id"]
+    assert client.post(url, headers=institution_headers).json()["consent_id"] == consent_id
+    
+    response = client.post(f"/api/v1/kyc/consents/{consent_id}/grant", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert client.post(url, headers=institution_headers).json()["message"] == "Consent already granted"
+    
+    client.post(f"/api/v1/kyc/consents/{consent_id}/revoke", headers=auth_headers)
+    data = client.post(url, headers=institution_headers).json()
+    assert data["message"].startswith("Consent request created")
+    assert data["consent_id"] == consent_id
+    
+    consent = db.query(ConsentRecord).filter(ConsentRecord.kyc_id == kyc_app.id).one()
+    assert consent.consent_given is False
+    assert consent.expires_at > datetime.utcnow()
+
+
+def test_consent_records_unique_per_purpose(db, test_user, test_institution):
+    """Test the database rejects a second consent record for the same application, institution and purpose"""
+    from sqlalchemy.exc import IntegrityError
+    
+    kyc_app = KYCApplication(user_id=test_user.id, status="VERIFIED", ukn="KYC-1234-5678-9012")
+    db.add(kyc_app)
+    db.commit()
+    for _ in range(2):
+        db.add(ConsentRecord(kyc_id=kyc_app.id, institution_id=test_institution.id, purpose="loan_application"))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()